@@ -0,0 +1,59 @@
+import os
+import sys
+import timeit
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import settings as s
+import synthetic as sy
+import variants as v
+
+'''
+Benchmark the arrow binning of variants.annotate_track_with_variants (variants.get_variant_annotation_df) against the previous
+per-row implementation, on synthetic variant sets of increasing size on a 10 kb transcript.
+'''
+
+def get_variant_annotation_df_loop(variant_track, variant_df, transcript_len, setting_dict):
+
+    '''The previous implementation of the arrow binning, with a row-wise apply, 1 transform per variant, a Python loop over the rows
+    and 3 grouped applies.'''
+
+    variant_df["id"] = pd.Series([str(i) for i in range(1,variant_df.shape[0]+1)], index=variant_df.index)
+    variant_df["top"] = variant_df.apply(lambda x: 1 if setting_dict["v_track_vars_t_or_b"][x["effect"]] == "T" else 0, axis=1)
+    variant_df["trans_pos_pc"] = variant_df["tp"]/transcript_len
+    get_display_from_axes_coords = lambda axes_x_coord: variant_track.transAxes.transform((axes_x_coord,0))[0] - variant_track.transAxes.transform((0,0))[0]
+    variant_df["num_pixels_diff"] = variant_df["trans_pos_pc"].diff().apply(get_display_from_axes_coords)
+    variant_df["merge_wt_prev"] = variant_df["num_pixels_diff"] <= setting_dict["v_track_merge_pixel_thresh"]
+    variant_df["arrow_bin"] = [0]*len(variant_df.index)
+    arrow_bin = 1
+    variant_df.at[0,"arrow_bin"] = arrow_bin
+    for i in range(1,len(variant_df.index)):
+        if variant_df.iloc[i]["merge_wt_prev"] == False or variant_df.iloc[i]["top"] != variant_df.iloc[i-1]["top"]:
+            arrow_bin += 1
+        variant_df.at[i,"arrow_bin"] = arrow_bin
+    x_pos_s = variant_df.groupby("arrow_bin")["trans_pos_pc"].mean()
+    text_s = variant_df.groupby("arrow_bin").apply(lambda x: ",".join(x["id"].tolist()))
+    top_s = variant_df.groupby("arrow_bin").apply(lambda x: x["top"].tolist()[0])
+    heights_s = v.get_arrow_height_s(top_s, setting_dict)
+    variant_annotation_df = pd.concat([x_pos_s, text_s, top_s, heights_s],axis=1)
+    variant_annotation_df.columns = ["x","text","top","height"]
+    return variant_annotation_df
+
+
+if __name__ == "__main__":
+    setting_dict = s.get_setting_dict()
+    setting_dict["v_track_arrow_height_mode"] = "cycle"
+    fig = Figure(figsize=(setting_dict["fig_width_inches"], setting_dict["fig_height_inches"]))
+    FigureCanvasAgg(fig)
+    variant_track = fig.add_subplot(1, 1, 1)
+    transcript_len, repeats = 10000, 3
+    for num_variants in [100, 1000, 10000]:
+        variant_df = sy.get_synthetic_variant_df(num_variants, transcript_len, sorted(setting_dict["v_track_vars_t_or_b"].keys()))
+        pd.testing.assert_frame_equal(get_variant_annotation_df_loop(variant_track, variant_df.copy(), transcript_len, setting_dict),
+                                      v.get_variant_annotation_df(variant_track, variant_df.copy(), transcript_len, setting_dict), check_dtype=False)
+        loop_secs = min(timeit.repeat(lambda: get_variant_annotation_df_loop(variant_track, variant_df.copy(), transcript_len, setting_dict), number=1, repeat=repeats))
+        vector_secs = min(timeit.repeat(lambda: v.get_variant_annotation_df(variant_track, variant_df.copy(), transcript_len, setting_dict), number=1, repeat=repeats))
+        print("{0} variants: loop {1:.4f}s, vectorized {2:.4f}s, speedup {3:.1f}x".format(num_variants, loop_secs, vector_secs, loop_secs/vector_secs))
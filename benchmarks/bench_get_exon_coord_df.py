@@ -0,0 +1,38 @@
+import os
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import coverage as c
+import synthetic as sy
+
+'''
+Benchmark coverage.get_exon_coord_df against the previous per-exon lookup on a synthetic 100 kb, 350-exon transcript, taking the
+best of 3 runs on each strand. The grouped lookup is about 6-7x faster on both strands (0.26-0.27s down to 0.04s with Python 3.11,
+pandas 1.5 and numpy 1.26 on a single core).
+'''
+
+def get_exon_coord_df_apply(cov_df):
+
+    '''The previous implementation of get_exon_coord_df, which scans cov_df once for every exon start and end.'''
+
+    exon_coord_df = cov_df.groupby("exon")["bp"].agg([np.min,np.max])
+    exon_coord_df.columns = ["start_bp","end_bp"]
+    get_tp_from_cov_df = lambda bp, cov_df: cov_df[cov_df["bp"] == bp].iloc[0]["tp"]
+    exon_coord_df["start_tp"] = exon_coord_df["start_bp"].apply(func=get_tp_from_cov_df, cov_df=cov_df)
+    exon_coord_df["end_tp"] = exon_coord_df["end_bp"].apply(func=get_tp_from_cov_df, cov_df=cov_df)
+    exon_coord_df.sort_values(by="start_tp", inplace=True)
+    if cov_df.iloc[0]["strand"] == "-":
+        exon_coord_df.rename(columns={"start_bp":"end_bp", "end_bp":"start_bp", "start_tp":"end_tp", "end_tp":"start_tp"}, inplace=True)
+    return exon_coord_df
+
+
+if __name__ == "__main__":
+    transcript_len, num_exons, repeats = 100000, 350, 3
+    for strand in ["+","-"]:
+        cov_df = sy.get_synthetic_cov_df(transcript_len, num_exons, strand)
+        pd.testing.assert_frame_equal(get_exon_coord_df_apply(cov_df), c.get_exon_coord_df(cov_df), check_dtype=False)
+        apply_secs = min(timeit.repeat(lambda: get_exon_coord_df_apply(cov_df), number=1, repeat=repeats))
+        grouped_secs = min(timeit.repeat(lambda: c.get_exon_coord_df(cov_df), number=1, repeat=repeats))
+        print("strand {0}: apply {1:.4f}s, grouped {2:.4f}s, speedup {3:.1f}x".format(strand, apply_secs, grouped_secs, apply_secs/grouped_secs))
@@ -0,0 +1,50 @@
+import os
+import sys
+import timeit
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.gridspec import GridSpec
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import settings as s
+import synthetic as sy
+import variants as v
+
+'''
+Benchmark variants.make_track, drawn and saved, with 1 arrow per variant bin and in the variant density mode, on synthetic variant
+sets of increasing size on a 10 kb transcript. The time of the density mode should stay flat as the number of variants grows.
+'''
+
+def draw_variant_track(variant_df, transcript_len, setting_dict):
+
+    '''Make a variants track with its key on its own Agg figure, and draw the figure.'''
+
+    fig = Figure(figsize=(setting_dict["fig_width_inches"], setting_dict["fig_height_inches"]))
+    canvas = FigureCanvasAgg(fig)
+    grid_spec = GridSpec(setting_dict["fig_num_rows"], 1)
+    v.make_track(fig.add_subplot(grid_spec[2,0]), transcript_len, [0,transcript_len], ["grey"], ["black"], variant_df.copy(), setting_dict,
+                 fig.add_subplot(grid_spec[5:7,0]))
+    canvas.draw()
+
+
+if __name__ == "__main__":
+    setting_dict = s.get_setting_dict()
+    setting_dict["text_mode"], setting_dict["fig_dpi"] = "mathtext", 100
+    transcript_len, repeats = 10000, 3
+    stdout = sys.stdout
+    for num_variants in [100, 1000, 10000, 100000]:
+        variant_df = sy.get_synthetic_variant_df(num_variants, transcript_len, sorted(setting_dict["v_track_vars_t_or_b"].keys()))
+        seconds_dict = {}
+        for mode, density_min_variants in [("arrows", None), ("density", 0)]:
+            if mode == "arrows" and num_variants > 10000:
+                continue
+            mode_setting_dict = dict(setting_dict, v_track_density_min_variants=density_min_variants)
+            sys.stdout = open(os.devnull, "w")
+            try:
+                seconds_dict[mode] = min(timeit.repeat(lambda: draw_variant_track(variant_df, transcript_len, mode_setting_dict), number=1, repeat=repeats))
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+        print("{0} variants: {1}".format(num_variants, ", ".join(["{0} {1:.4f}s".format(mode, seconds_dict[mode]) for mode in ["arrows","density"]
+                                                                  if mode in seconds_dict])))
@@ -0,0 +1,208 @@
+import argparse
+import itertools
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import matplotlib
+matplotlib.use("Agg")
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.gridspec import GridSpec
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import coverage as c
+import protdomains as pds
+import settings as s
+import synthetic as sy
+import transcript as ts
+import transplotter as ngstp
+import utrs as u
+import variants as v
+
+'''
+Benchmark suite: times each loader, get_exon_coord_df, get_exon_bound_color_l, get_bound_color_ls_for_cb, each track's make_track
+and end-to-end make_png on synthetic inputs, across every combination of the numbers of transcripts in the input files (so the
+loaders' scaling with file size is measured), transcript lengths, exons per transcript, sample counts, variant and domain densities,
+and fractions of overlapping domains. The results are written to a csv file labelled with the version (by default the git description
+of the checkout), and can be compared with the results of another version with --compare, e.g.
+
+    python benchmarks/run_benchmarks.py --label before --num-exons 10 100 --domain-overlap-frac 0 0.5
+    (make changes)
+    python benchmarks/run_benchmarks.py --label after --num-exons 10 100 --domain-overlap-frac 0 0.5 --compare benchmarks/results/before.csv
+'''
+
+config_col_l = ["num_transcripts","transcript_len","num_exons","num_samples","variants_per_kb","domains_per_kb","domain_overlap_frac"]
+
+
+def get_version_label():
+
+    '''Get the git description of the checkout, or "current" if it is not a git checkout.'''
+
+    try:
+        return subprocess.check_output(["git","describe","--always","--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "current"
+
+
+def get_seconds(func, repeats):
+
+    '''Get the fastest of several timings of a function, with its progress output suppressed.'''
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        seconds = min(timeit.repeat(func, number=1, repeat=repeats))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return seconds
+
+
+def get_track_axes():
+
+    '''Get a new axes on its own Agg figure, for timing a make_track function.'''
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+
+    return fig.add_subplot(GridSpec(1, 1)[0,0])
+
+
+def get_config_result_l(config_dict, setting_dict, repeats, work_dir):
+
+    '''Time every benchmark on the synthetic inputs for 1 configuration.
+
+    Args:
+        | config_dict (dict): the num_transcripts, transcript_len, num_exons, num_samples, variants_per_kb, domains_per_kb and
+          domain_overlap_frac. The benchmarks are run on the first transcript.
+        | setting_dict (dict): settings for making the png.
+        | repeats (int): number of timings of each benchmark, of which the fastest is kept.
+        | work_dir (str): directory to write the synthetic inputs to.
+
+    Returns:
+        result_l (list of dicts): the configuration, benchmark name and seconds of each benchmark.
+    '''
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        input_dict = sy.make_synthetic_inputs(work_dir, **config_dict)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    transcript, sample_l = input_dict["transcript_l"][0], input_dict["sample_l"]
+    exon_coord_file, chunksize = input_dict["exon_coord_file_l"][0], setting_dict["read_chunksize"]
+    time_func = lambda func: get_seconds(func, repeats)
+    seconds_dict = {}
+
+    #Loaders.
+    seconds_dict["get_utr_df"] = time_func(lambda: u.get_utr_df(input_dict["utr_file"], "+", transcript, chunksize))
+    seconds_dict["get_variant_df"] = time_func(lambda: v.get_variant_df(transcript, input_dict["variant_file"], chunksize))
+    seconds_dict["get_protein_domain_df"] = time_func(lambda: pds.get_protein_domain_df(input_dict["protein_domain_file"], [transcript], "Pfam",
+                                                                                         ["Start","End"], chunksize))
+    seconds_dict["get_cov_df"] = time_func(lambda: c.get_cov_df(input_dict["cov_file"], transcript, None, None, sample_l, False, chunksize))
+
+    #Transcript model.
+    cov_df = c.get_cov_df(input_dict["cov_file"], transcript, None, None, sample_l, False, chunksize)
+    seconds_dict["get_exon_coord_df"] = time_func(lambda: c.get_exon_coord_df(cov_df))
+    transcript_model_record = ngstp.get_transcript_model_record(transcript, exon_coord_file, input_dict["utr_file"], chunksize)
+    utr_df, transcript_model_dict = transcript_model_record["utr_df"], transcript_model_record["transcript_model_dict"]
+    seconds_dict["get_exon_bound_color_l"] = time_func(lambda: ngstp.get_exon_bound_color_l(transcript_model_record["exon_coord_df"], utr_df, "+"))
+    [bound_l, color_l, edge_color_l] = transcript_model_record["exon_bound_color_ll"]
+
+    #Tracks.
+    seconds_dict["coverage.make_track"] = time_func(lambda: c.make_track(get_track_axes(), cov_df, bound_l, color_l, edge_color_l, setting_dict))
+    variant_df = v.get_variant_df(transcript, input_dict["variant_file"], chunksize).rename(columns={"pos":"bp"})
+    variant_df["tp"] = ts.get_tp_arr(transcript_model_dict, variant_df["bp"].values)
+    variant_df = variant_df[~variant_df["tp"].isnull()]
+    variant_df["tp"] = variant_df["tp"].astype(int)
+    variant_df = variant_df.sort_values(by="tp")
+    variant_df.index = range(len(variant_df.index))
+    seconds_dict["variants.make_track"] = time_func(lambda: v.make_track(get_track_axes(), bound_l[-1], bound_l, color_l, edge_color_l,
+                                                                         variant_df.copy(), setting_dict, get_track_axes()))
+    protein_domain_df = pds.get_protein_domain_df(input_dict["protein_domain_file"], [transcript], "Pfam", ["Start","End"], chunksize)
+    protein_domain_color_s = pds.get_protein_domain_color_s_from_file(input_dict["protein_domain_color_file"])
+    seconds_dict["protdomains.make_track"] = time_func(lambda: pds.make_track(get_track_axes(), protein_domain_df.copy(), utr_df, protein_domain_color_s,
+                                                                              setting_dict, None))
+    #make_track adds the domains' transcript positions, which get_bound_color_ls_for_cb needs.
+    pds.make_track(get_track_axes(), protein_domain_df, utr_df, protein_domain_color_s, setting_dict, None)
+    seconds_dict["get_bound_color_ls_for_cb"] = time_func(lambda: pds.get_bound_color_ls_for_cb(protein_domain_df, utr_df, protein_domain_color_s,
+                                                                                                 setting_dict["pd_track_stripe_min_bases"]))
+
+    #End to end, with the input cache bypassed so that the inputs are read every time.
+    png_file = os.path.join(work_dir, "benchmark.png")
+    png_setting_dict = dict(setting_dict, input_cache_max_mb=0)
+    seconds_dict["make_png"] = time_func(lambda: ngstp.make_png([transcript], ["Benchmark"], ["111"], [sample_l], [input_dict["utr_file"]],
+                                                                [exon_coord_file], [input_dict["cov_file"]], [input_dict["variant_file"]],
+                                                                [input_dict["protein_domain_file"]], input_dict["protein_domain_color_file"],
+                                                                png_setting_dict, png_file))
+
+    result_l = [dict(config_dict, benchmark=benchmark, seconds=round(seconds, 6)) for benchmark, seconds in seconds_dict.items()]
+
+    return result_l
+
+
+def print_comparison(result_df, compare_file):
+
+    '''Print the timings next to those of another version, with the speedup of this version.'''
+
+    compare_df = pd.read_csv(compare_file)
+    #Results from before a configuration column was added are matched on the other columns.
+    merge_col_l = [col for col in config_col_l if col in compare_df.columns]
+    merge_df = pd.merge(compare_df, result_df, on=merge_col_l + ["benchmark"], suffixes=("_old","_new"))
+    merge_df["speedup"] = (merge_df["seconds_old"]/merge_df["seconds_new"]).round(2)
+    print("Comparison with {0} ({1}):".format(compare_df["label"].iloc[0], compare_file))
+    print(merge_df[merge_col_l + ["benchmark","seconds_old","seconds_new","speedup"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark transplot on synthetic inputs.")
+    parser.add_argument("--num-transcripts", type=int, nargs="+", default=[1, 10], help="numbers of transcripts in the input files")
+    parser.add_argument("--transcript-len", type=int, nargs="+", default=[10000, 50000], help="transcript lengths")
+    parser.add_argument("--num-exons", type=int, nargs="+", default=[30], help="numbers of exons per transcript")
+    parser.add_argument("--num-samples", type=int, nargs="+", default=[6, 50], help="numbers of samples")
+    parser.add_argument("--variants-per-kb", type=float, nargs="+", default=[1.0, 10.0], help="variant densities")
+    parser.add_argument("--domains-per-kb", type=float, nargs="+", default=[0.5], help="protein domain densities")
+    parser.add_argument("--domain-overlap-frac", type=float, nargs="+", default=[0.25], help="fractions of protein domains which overlap the previous one")
+    parser.add_argument("--repeats", type=int, default=3, help="timings per benchmark, of which the fastest is kept")
+    parser.add_argument("--text-mode", default="mathtext", help="text_mode setting (latex timings depend on the state of the LaTeX cache)")
+    parser.add_argument("--label", default=None, help="version label, defaults to the git description of the checkout")
+    parser.add_argument("--out", default=None, help="results csv, defaults to benchmarks/results/<label>.csv")
+    parser.add_argument("--compare", default=None, help="results csv of another version to compare with")
+    args = parser.parse_args()
+
+    label = args.label if args.label != None else get_version_label()
+    out_path = args.out if args.out != None else os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "{0}.csv".format(label))
+    setting_dict = s.get_setting_dict()
+    setting_dict["text_mode"] = args.text_mode
+    setting_dict["fig_dpi"] = 100
+
+    result_l = []
+    for config_value_l in itertools.product(args.num_transcripts, args.transcript_len, args.num_exons, args.num_samples, args.variants_per_kb,
+                                            args.domains_per_kb, args.domain_overlap_frac):
+        config_dict = dict(zip(config_col_l, config_value_l))
+        print("Benchmarking {0}...".format(", ".join(["{0}={1}".format(col, config_dict[col]) for col in config_col_l])))
+        work_dir = tempfile.mkdtemp(prefix="transplot_bench_")
+        try:
+            result_l.extend(get_config_result_l(config_dict, setting_dict, args.repeats, work_dir))
+        finally:
+            shutil.rmtree(work_dir)
+
+    result_df = pd.DataFrame(result_l, columns=config_col_l + ["benchmark","seconds"])
+    result_df.insert(0, "label", label)
+    result_df["python"] = platform.python_version()
+    result_df["pandas"] = pd.__version__
+    result_df["matplotlib"] = matplotlib.__version__
+    if not os.path.exists(os.path.dirname(os.path.abspath(out_path))):
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)))
+    result_df.to_csv(out_path, index=False)
+    print(result_df[config_col_l + ["benchmark","seconds"]].to_string(index=False))
+    print("Written benchmark results to {0}".format(out_path))
+    if args.compare != None:
+        print_comparison(result_df, args.compare)
@@ -0,0 +1,117 @@
+import os
+import sys
+import shutil
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import batch as b
+import settings as s
+
+'''
+Tests of the fingerprints which decide which pngs an incremental batch rebuilds.
+'''
+
+in_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "data", "input")
+
+
+def write_manifest(tmp_path, tracks="110", png_name_l=["a.png"], cov_name="APC_ENST00000457016_small.csv"):
+
+    '''Write a manifest with 1 row per png, whose inputs are copies of the example files.'''
+
+    for name in ["APC_utrs.txt","APC_exon_coord.csv","APC_ENST00000457016_small.csv","APC_variants_CASES.txt","APC_exoplot_domains_wt_overlaps.txt"]:
+        shutil.copy(os.path.join(in_dir, name), str(tmp_path / name))
+    manifest_file = str(tmp_path / "manifest.tsv")
+    with open(manifest_file, "w") as manifest_fh:
+        manifest_fh.write("png_file\ttranscript\ttitle\ttracks\tsamples\tutr_file\texon_coord_file\tcov_file\tvariant_file\tprotein_domain_file\n")
+        for png_name in png_name_l:
+            row_l = [str(tmp_path / png_name), "ENST00000457016", "APC", tracks, "543_A03,543_A06"] + \
+                    [str(tmp_path / name) for name in ["APC_utrs.txt","APC_exon_coord.csv",cov_name,"APC_variants_CASES.txt",
+                                                       "APC_exoplot_domains_wt_overlaps.txt"]]
+            manifest_fh.write("\t".join(row_l) + "\n")
+
+    return manifest_file
+
+
+def make_job(tmp_path, tracks="110"):
+
+    '''Write a 1 row manifest (see write_manifest) and read it into a job.'''
+
+    return b.get_batch_job_l(write_manifest(tmp_path, tracks))[0]
+
+
+def get_fingerprint(job, setting_dict=None, hash_inputs=False):
+
+    '''Get the fingerprint of a job, with the default settings unless others are given.'''
+
+    return b.get_job_fingerprint(job, None, setting_dict if setting_dict != None else s.get_setting_dict(), None, hash_inputs)
+
+
+def test_fingerprint_changes_with_settings_and_job(tmp_path):
+    job = make_job(tmp_path)
+    fingerprint = get_fingerprint(job)
+    assert get_fingerprint(job) == fingerprint
+    setting_dict = s.get_setting_dict()
+    setting_dict["c_track_y_axis_label"] = "Depth"
+    assert get_fingerprint(job, setting_dict) != fingerprint
+    job["title_l"] = ["APC 2"]
+    assert get_fingerprint(job) != fingerprint
+
+
+def test_fingerprint_changes_with_enabled_inputs(tmp_path):
+    job = make_job(tmp_path)
+    fingerprint = get_fingerprint(job)
+    #The protein domain track is disabled, so its input is not part of the fingerprint.
+    with open(job["protein_domain_file_l"][0], "a") as in_fh:
+        in_fh.write("\n")
+    assert get_fingerprint(job) == fingerprint
+    with open(job["variant_file_l"][0], "a") as in_fh:
+        in_fh.write("\n")
+    assert get_fingerprint(job) != fingerprint
+
+
+def test_hashed_fingerprint_ignores_modification_time(tmp_path):
+    job = make_job(tmp_path)
+    fingerprint, hashed_fingerprint = get_fingerprint(job), get_fingerprint(job, hash_inputs=True)
+    cov_file = job["cov_file_l"][0]
+    os.utime(cov_file, (os.path.getatime(cov_file), os.path.getmtime(cov_file) + 10))
+    assert get_fingerprint(job) != fingerprint
+    assert get_fingerprint(job, hash_inputs=True) == hashed_fingerprint
+
+
+def test_rebuild_reason(tmp_path):
+    job = make_job(tmp_path)
+    fingerprint = get_fingerprint(job)
+    assert b.get_rebuild_reason(job["png_file"], fingerprint) == "no png"
+    open(job["png_file"], "w").close()
+    assert b.get_rebuild_reason(job["png_file"], fingerprint) == "no fingerprint"
+    with open(job["png_file"] + ".fingerprint", "w") as fingerprint_fh:
+        fingerprint_fh.write(fingerprint + "\n")
+    assert b.get_rebuild_reason(job["png_file"], fingerprint) == None
+    setting_dict = s.get_setting_dict()
+    setting_dict["c_track_y_axis_label"] = "Depth"
+    assert b.get_rebuild_reason(job["png_file"], get_fingerprint(job, setting_dict)) == "changed"
+
+
+def test_fingerprint_is_written_by_every_batch(tmp_path):
+    setting_dict = s.get_setting_dict()
+    setting_dict.update({"fig_dpi":20, "text_mode":"mathtext"})
+    manifest_file = write_manifest(tmp_path, "100", ["a.png","b.png"])
+    batch_report_df = b.make_pngs(manifest_file, None, setting_dict, num_workers=1)
+    assert (batch_report_df["status"] == "ok").all()
+    for job in b.get_batch_job_l(manifest_file):
+        assert b.get_rebuild_reason(job["png_file"], b.get_job_fingerprint(job, None, setting_dict, None)) == None
+    assert (b.make_pngs(manifest_file, None, setting_dict, num_workers=1, incremental=True)["status"] == "skipped").all()
+    #A png which fails keeps its earlier version, whose fingerprint is deleted so that it is rebuilt.
+    manifest_file = write_manifest(tmp_path, "100", ["a.png"], "missing.csv")
+    assert (b.make_pngs(manifest_file, None, setting_dict, num_workers=1)["status"] == "failed").all()
+    assert b.get_rebuild_reason(str(tmp_path / "a.png"), "") == "no fingerprint"
+
+
+def test_setting_file(tmp_path):
+    setting_file = str(tmp_path / "settings.json")
+    with open(setting_file, "w") as setting_fh:
+        setting_fh.write('{"fig_dpi": 50, "pd_track_legend_bbox": [0, 0, 1, 0.1]}')
+    setting_dict = s.get_setting_dict_from_file(setting_file)
+    assert setting_dict["fig_dpi"] == 50 and setting_dict["pd_track_legend_bbox"] == (0, 0, 1, 0.1)
+    assert setting_dict["text_mode"] == s.get_setting_dict()["text_mode"]
+    with open(setting_file, "w") as setting_fh:
+        setting_fh.write('{"fig_dpii": 50}')
+    assert s.get_setting_dict_from_file(setting_file) == False
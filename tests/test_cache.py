@@ -0,0 +1,77 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import cache as ch
+
+'''
+Tests of the in-process LRU cache of parsed inputs.
+'''
+
+def write_values(path, num_rows, value=0):
+
+    '''Write a CSV file with 1 integer column, which is read back as a DataFrame of about 8 bytes per row.'''
+
+    pd.DataFrame({"x":np.full(num_rows, value, dtype=np.int64)}).to_csv(path, index=False)
+
+
+def read_values(path):
+
+    '''Read a file written by write_values.'''
+
+    return pd.read_csv(path)
+
+
+def test_hit_returns_a_copy(tmp_path):
+    ch.clear_cache()
+    path = str(tmp_path / "a.csv")
+    write_values(path, 10)
+    value_df = ch.get_cached_input(1, [path], read_values, path)
+    value_df["x"] = 1
+    assert (ch.get_cached_input(1, [path], read_values, path)["x"] == 0).all()
+    assert ch.get_cache_info()["hits"] == 1 and ch.get_cache_info()["misses"] == 1
+
+
+def test_changed_file_is_read_again(tmp_path):
+    ch.clear_cache()
+    path = str(tmp_path / "a.csv")
+    write_values(path, 10)
+    ch.get_cached_input(1, [path], read_values, path)
+    write_values(path, 20, value=2)
+    value_df = ch.get_cached_input(1, [path], read_values, path)
+    assert len(value_df) == 20 and ch.get_cache_info()["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    ch.clear_cache()
+    path_l = [str(tmp_path / "{0}.csv".format(i)) for i in range(3)]
+    for path in path_l:
+        write_values(path, 50000)
+    #Each value uses about 0.4 MB, so 2 fit in 1 MB.
+    for path in [path_l[0], path_l[1], path_l[0], path_l[2]]:
+        ch.get_cached_input(1, [path], read_values, path)
+    cache_info_dict = ch.get_cache_info()
+    assert cache_info_dict["entries"] == 2 and cache_info_dict["mb"] <= 1
+    ch.get_cached_input(1, [path_l[0]], read_values, path_l[0])
+    assert ch.get_cache_info()["hits"] == 2
+    ch.get_cached_input(1, [path_l[1]], read_values, path_l[1])
+    assert ch.get_cache_info()["misses"] == 4
+
+
+def test_value_larger_than_the_budget_is_not_cached(tmp_path):
+    ch.clear_cache()
+    path = str(tmp_path / "a.csv")
+    write_values(path, 200000)
+    ch.get_cached_input(1, [path], read_values, path)
+    assert ch.get_cache_info()["entries"] == 0
+
+
+def test_keyed_input_is_keyed_on_key_arg_l(tmp_path):
+    ch.clear_cache()
+    path = str(tmp_path / "a.csv")
+    write_values(path, 10)
+    ch.get_keyed_cached_input(1, [path], ("a",), read_values, path)
+    ch.get_keyed_cached_input(1, [path], ("a",), read_values, path)
+    ch.get_keyed_cached_input(1, [path], ("b",), read_values, path)
+    assert ch.get_cache_info()["hits"] == 1 and ch.get_cache_info()["entries"] == 2
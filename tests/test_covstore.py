@@ -0,0 +1,72 @@
+import os
+import sys
+import shutil
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import coverage as c
+import covstore as cs
+
+'''
+Tests that a columnar coverage store gives the same coverage data as the coverage file it was made from.
+'''
+
+in_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "data", "input")
+transcript = "ENST00000457016"
+sample_l = ["543_A03","543_A06","543_A07"]
+sample_group_dict = {"a":["543_A03","543_A06"], "b":["543_A07","543_A08","543_A09","543_A10"]}
+
+
+def copy_cov_file(tmp_path, name="APC_ENST00000457016_small.csv"):
+
+    '''Copy an example coverage file to a temporary directory, so that no index file is made next to the original.'''
+
+    cov_file = str(tmp_path / name)
+    shutil.copy(os.path.join(in_dir, name), cov_file)
+
+    return cov_file
+
+
+def assert_same_cov_df(store_cov_df, file_cov_df, col_l):
+
+    '''Check that 2 coverage DataFrames have the same rows, matched on bp, and the same values in col_l.'''
+
+    store_cov_df, file_cov_df = store_cov_df.sort_values("bp").reset_index(drop=True), file_cov_df.sort_values("bp").reset_index(drop=True)
+    assert len(store_cov_df) > 0 and (store_cov_df["bp"].values == file_cov_df["bp"].values).all()
+    assert (store_cov_df["exon"].values == file_cov_df["exon"].values).all()
+    for col in col_l:
+        assert np.allclose(store_cov_df[col].values, file_cov_df[col].values, equal_nan=True)
+
+
+def test_store_matches_file(tmp_path):
+    for name in ["APC_ENST00000457016_small.csv","APC_ENST00000457016_small_reverse.csv"]:
+        cov_file, store_dir = copy_cov_file(tmp_path, name), str(tmp_path / (name + ".store"))
+        assert cs.make_cov_store(cov_file, store_dir) != False and cs.is_cov_store(store_dir)
+        assert_same_cov_df(c.get_cov_df(store_dir, transcript, None, None, sample_l), c.get_cov_df(cov_file, transcript, None, None, sample_l),
+                           ["cov","tp"])
+        assert_same_cov_df(c.get_cov_df(store_dir, transcript, None, None, sample_group_dict, envelope=True),
+                           c.get_cov_df(cov_file, transcript, None, None, sample_group_dict, envelope=True),
+                           ["cov","cov_a","min_a","max_a","cov_b","min_b","max_b"])
+
+
+def test_store_window_matches_file(tmp_path):
+    cov_file, store_dir = copy_cov_file(tmp_path), str(tmp_path / "cov.store")
+    cs.make_cov_store(cov_file, store_dir)
+    store_cov_df = c.get_cov_df(store_dir, transcript, 112175000, 112180000, sample_l)
+    assert_same_cov_df(store_cov_df, c.get_cov_df(cov_file, transcript, 112175000, 112180000, sample_l), ["cov"])
+    assert store_cov_df["bp"].min() >= 112175000 and store_cov_df["bp"].max() <= 112180000
+
+
+def test_missing_depths_need_a_float_store(tmp_path):
+    cov_file = str(tmp_path / "cov.csv")
+    cov_df = pd.read_csv(os.path.join(in_dir, "APC_ENST00000457016_small.csv"), nrows=100)
+    cov_df["543_A03"] = cov_df["543_A03"].astype(float)
+    cov_df.loc[[0, 5], "543_A03"] = np.nan
+    cov_df.loc[1, "543_A06"] = 2.5
+    cov_df.to_csv(cov_file, index=False)
+    assert cs.make_cov_store(cov_file, str(tmp_path / "int.store")) == False
+    assert not os.path.exists(str(tmp_path / "int.store"))
+    store_dir = str(tmp_path / "float.store")
+    assert cs.make_cov_store(cov_file, store_dir, depth_dtype="float32") != False
+    assert_same_cov_df(c.get_cov_df(store_dir, transcript, None, None, sample_l), c.get_cov_df(cov_file, transcript, None, None, sample_l),
+                       ["cov"])
@@ -0,0 +1,47 @@
+import os
+import sys
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import depth as d
+
+'''
+Tests of reading coverage data from samtools depth and mosdepth per-base files.
+'''
+
+exon_coord_df = pd.DataFrame({"start_bp":[100, 200], "end_bp":[104, 202], "start_tp":[1, 6], "end_tp":[5, 8]}, index=["E1","E2"])
+
+
+def write_lines(path, line_l):
+
+    '''Write tab-separated lines to a file.'''
+
+    with open(path, "w") as out_fh:
+        out_fh.write("".join(["\t".join([str(value) for value in line]) + "\n" for line in line_l]))
+
+
+def test_samtools_depth(tmp_path):
+    depth_file = str(tmp_path / "a.depth")
+    write_lines(depth_file, [["#CHROM","POS","s1.bam","s2.bam"], [5, 99, 50, 50], [5, 100, 10, 20], [5, 101, 10, 30], [5, 104, 2, 4],
+                             [5, 200, 6, 6], [5, 201, 1, 2], [6, 100, 9, 9]])
+    cov_df = d.get_cov_df_from_depth(depth_file, d.get_depth_format(depth_file), exon_coord_df, "5", None, None, ["s1.bam","s2.bam"])
+    assert cov_df["bp"].tolist() == [100, 101, 102, 103, 104, 200, 201, 202]
+    assert cov_df["tp"].tolist() == list(range(1, 9))
+    assert cov_df["exon"].tolist() == ["E1"]*5 + ["E2"]*3
+    #Exonic bases without a record have a depth of 0.
+    assert cov_df["cov"].tolist() == [15, 20, 0, 0, 3, 6, 1.5, 0]
+
+
+def test_samtools_depth_window_and_groups(tmp_path):
+    depth_file = str(tmp_path / "a.depth")
+    write_lines(depth_file, [["#CHROM","POS","s1.bam","s2.bam"], [5, 100, 10, 20], [5, 101, 10, 30], [5, 104, 2, 4], [5, 200, 6, 6]])
+    cov_df = d.get_cov_df_from_depth(depth_file, "samtools", exon_coord_df, "5", 101, 200, {"g":["s1.bam"], "h":["s2.bam"]}, envelope=True)
+    assert cov_df["bp"].tolist() == [101, 102, 103, 104, 200]
+    assert cov_df["cov_g"].tolist() == [10, 0, 0, 2, 6] and cov_df["max_h"].tolist() == [30, 0, 0, 4, 6]
+
+
+def test_mosdepth_runs(tmp_path):
+    depth_file = str(tmp_path / "m1.per-base.bed")
+    write_lines(depth_file, [[5, 0, 99, 50], [5, 99, 102, 10], [5, 102, 300, 4]])
+    assert d.get_depth_format(depth_file) == "mosdepth"
+    cov_df = d.get_cov_df_from_depth(depth_file, "mosdepth", exon_coord_df, "5", None, None, [])
+    assert cov_df["cov"].tolist() == [10, 10, 10, 4, 4, 4, 4, 4]
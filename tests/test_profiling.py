@@ -0,0 +1,50 @@
+import os
+import sys
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import matplotlib
+matplotlib.use("Agg")
+import profiling as pf
+import settings as s
+import transplotter as ngstp
+import tracemalloc
+
+'''
+Tests of the stage timer of make_png.
+'''
+
+in_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "data", "input")
+
+
+def make_coverage_png(tmp_path, cov_file, bp_window, stage_report_l):
+
+    '''Make a png with a coverage track of the example transcript.'''
+
+    return ngstp.make_png(["ENST00000457016"], ["APC"], ["100"], [["543_A10"]], [os.path.join(in_dir, "APC_utrs.txt")],
+                          [os.path.join(in_dir, "APC_exon_coord.csv")], [cov_file], [None], [None], None, s.get_setting_dict(),
+                          str(tmp_path / "a.png"), [bp_window], None, None, stage_report_l)
+
+
+def test_concurrent_timer_does_not_measure_memory():
+    stage_report_l_1, stage_report_l_2 = [], []
+    stage_timer_dict_1 = pf.start_stage_timer(stage_report_l_1, "a.png")
+    stage_timer_dict_2 = pf.start_stage_timer(stage_report_l_2, "b.png")
+    pf.start_stage(stage_timer_dict_1, None, "layout")
+    pf.start_stage(stage_timer_dict_2, None, "layout")
+    pf.stop_stage_timer(stage_timer_dict_2)
+    pf.stop_stage_timer(stage_timer_dict_1)
+    assert stage_report_l_1[0]["peak_mb"] != None and stage_report_l_2[0]["peak_mb"] == None
+    assert not tracemalloc.is_tracing()
+    assert pf.start_stage_timer([], "c.png")["measure_memory"] == True
+    pf.stop_stage_timer(pf.memory_timer_l[0])
+
+
+def test_timer_is_stopped_when_make_png_fails(tmp_path):
+    stage_report_l = []
+    #The window is in an intron.
+    assert make_coverage_png(tmp_path, os.path.join(in_dir, "APC_ENST00000457016_small.csv"), [112043600, 112043700], stage_report_l) == False
+    assert not tracemalloc.is_tracing() and len(pf.memory_timer_l) == 0
+    with pytest.raises(Exception):
+        make_coverage_png(tmp_path, str(tmp_path / "missing.csv"), None, stage_report_l)
+    assert not tracemalloc.is_tracing() and len(pf.memory_timer_l) == 0
+    assert len(stage_report_l) > 0
@@ -0,0 +1,51 @@
+import os
+import sys
+import threading
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import readers as r
+
+'''
+Tests of the reads on the thread pool and of their messages.
+'''
+
+def read_value(value, event=None):
+
+    '''Report a message and return a value, after waiting for an event if one is given.'''
+
+    if event != None:
+        event.wait(5)
+    r.report("Reading {0}".format(value))
+    if value == None:
+        raise ValueError("no value")
+
+    return value
+
+
+def test_read_messages_are_printed_when_collected(capsys):
+    stdout = sys.stdout
+    thread_pool = r.get_read_thread_pool(2)
+    event = threading.Event()
+    read_result_1 = r.apply_read_async(thread_pool, read_value, (1, event))
+    read_result_2 = r.apply_read_async(thread_pool, read_value, (2,))
+    read_result_2.wait(5)
+    event.set()
+    read_result_1.wait(5)
+    assert sys.stdout is stdout
+    assert capsys.readouterr().out == ""
+    assert r.get_read_result(read_result_1) == 1
+    assert capsys.readouterr().out == "Reading 1\n"
+    assert r.get_read_result(read_result_2) == 2 and r.get_read_result(read_result_2) == 2
+    assert capsys.readouterr().out == "Reading 2\n"
+
+
+def test_read_error_is_raised_with_its_messages(capsys):
+    read_result = r.apply_read_async(r.get_read_thread_pool(2), read_value, (None,))
+    with pytest.raises(ValueError):
+        r.get_read_result(read_result)
+    assert capsys.readouterr().out == "Reading None\n"
+
+
+def test_messages_outside_reads_are_printed(capsys):
+    r.report("Not in a read")
+    assert capsys.readouterr().out == "Not in a read\n"
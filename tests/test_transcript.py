@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import transcript as ts
+
+'''
+Tests of the exon interval model of a transcript.
+'''
+
+def get_transcript_model_dict(strand):
+
+    '''Make the model of a transcript with 3 exons, of 10, 5 and 10 bases at 100-109, 200-204 and 300-309, in transcript order.'''
+
+    exon_coord_df = pd.DataFrame({"start_bp":[100, 200, 300], "end_bp":[109, 204, 309]}, index=["E1","E2","E3"])
+    if strand == "-":
+        exon_coord_df = pd.DataFrame({"start_bp":[309, 204, 109], "end_bp":[300, 200, 100]}, index=["E3","E2","E1"])
+
+    return ts.get_transcript_model_dict(exon_coord_df)
+
+
+def test_bp_tp_round_trip():
+    exonic_bp_arr = np.concatenate([np.arange(100, 110), np.arange(200, 205), np.arange(300, 310)])
+    for strand in ["+","-"]:
+        transcript_model_dict = get_transcript_model_dict(strand)
+        assert transcript_model_dict["strand"] == strand
+        assert transcript_model_dict["transcript_len"] == 25
+        tp_arr = ts.get_tp_arr(transcript_model_dict, exonic_bp_arr)
+        expected_tp_arr = np.arange(1, 26) if strand == "+" else np.arange(25, 0, -1)
+        assert (tp_arr == expected_tp_arr).all()
+        assert (ts.get_bp_arr(transcript_model_dict, tp_arr) == exonic_bp_arr).all()
+
+
+def test_intronic_positions_snap_to_the_nearest_exon_boundary():
+    for strand, expected_tp_l in [("+", [10, 11, 15, 16]), ("-", [16, 15, 11, 10])]:
+        transcript_model_dict = get_transcript_model_dict(strand)
+        tp_arr = ts.get_tp_arr(transcript_model_dict, [120, 190, 210, 290])
+        assert tp_arr.tolist() == expected_tp_l
+        assert np.isnan(ts.get_tp_arr(transcript_model_dict, [120, 190, 210, 290], snap_intronic=False)).all()
+
+
+def test_positions_outside_the_transcript_are_nan():
+    for strand in ["+","-"]:
+        transcript_model_dict = get_transcript_model_dict(strand)
+        tp_arr = ts.get_tp_arr(transcript_model_dict, [99, 100, 309, 310])
+        assert np.isnan(tp_arr[[0, 3]]).all() and not np.isnan(tp_arr[[1, 2]]).any()
+        bp_arr = ts.get_bp_arr(transcript_model_dict, [0, 1, 25, 26])
+        assert np.isnan(bp_arr[[0, 3]]).all() and not np.isnan(bp_arr[[1, 2]]).any()
@@ -0,0 +1,73 @@
+import os
+import sys
+import sqlite3
+import shutil
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import transplotter as ngstp
+import transcriptdb as tdb
+import coverage as c
+
+'''
+Tests of the transcript model database.
+'''
+
+in_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "data", "input")
+transcript = "ENST00000457016"
+
+
+def test_models_loaded_from_the_database_match_the_files(tmp_path):
+    for exon_coord_name, utr_name in [("APC_exon_coord.csv","APC_utrs.txt"), ("APC_exon_coord_reverse.csv","APC_utrs_manual_reverse.txt")]:
+        db_file = str(tmp_path / (exon_coord_name + ".db"))
+        exon_coord_file, utr_file = os.path.join(in_dir, exon_coord_name), os.path.join(in_dir, utr_name)
+        ngstp.make_transcript_model_db(db_file, [transcript], [exon_coord_file], [utr_file])
+        file_record = ngstp.load_transcript_model_record(transcript, exon_coord_file, utr_file, None)
+        db_record = ngstp.load_transcript_model_record(transcript, None, None, db_file)
+        assert db_record["source_path"] == db_file
+        for col in ["start_bp","end_bp","start_tp","end_tp"]:
+            assert db_record["exon_coord_df"][col].to_dict() == file_record["exon_coord_df"][col].to_dict()
+        for col in ["utr","start_bp","end_bp","start_tp","end_tp"]:
+            assert db_record["utr_df"][col].tolist() == file_record["utr_df"][col].tolist()
+        assert db_record["exon_bound_color_ll"] == file_record["exon_bound_color_ll"]
+        assert db_record["transcript_model_dict"]["transcript_len"] == file_record["transcript_model_dict"]["transcript_len"]
+        assert tdb.get_db_transcript_l(db_file) == [transcript]
+
+
+def test_chromosome_is_recorded_in_the_model(tmp_path):
+    exon_coord_file, db_file = str(tmp_path / "exon_coord.csv"), str(tmp_path / "a.db")
+    ngstp.make_exon_coord_file(os.path.join(in_dir, "APC_ENST00000457016_small.csv"), transcript, exon_coord_file)
+    ngstp.make_transcript_model_db(db_file, [transcript], [exon_coord_file], [os.path.join(in_dir, "APC_utrs.txt")])
+    for transcript_model_record in [ngstp.load_transcript_model_record(transcript, exon_coord_file, os.path.join(in_dir, "APC_utrs.txt"), None),
+                                    ngstp.load_transcript_model_record(transcript, None, None, db_file)]:
+        assert transcript_model_record["chrom"] == "5"
+        assert "chrom" not in transcript_model_record["exon_coord_df"].columns
+    assert ngstp.load_transcript_model_record(transcript, os.path.join(in_dir, "APC_exon_coord.csv"), os.path.join(in_dir, "APC_utrs.txt"), None)["chrom"] == None
+    tdb.close_db_conns()
+
+
+def test_chromosome_is_read_with_and_without_the_coverage_index(tmp_path):
+    cov_file = str(tmp_path / "cov.csv")
+    shutil.copy(os.path.join(in_dir, "APC_ENST00000457016_small.csv"), cov_file)
+    assert c.get_cov_chrom(cov_file, transcript) == "5" and c.get_cov_chrom(cov_file, "ENST00000000000") == None
+    c.make_cov_index_file(cov_file)
+    assert c.get_cov_chrom(cov_file, transcript) == "5" and c.get_cov_chrom(cov_file, "ENST00000000000") == None
+    exon_coord_file = ngstp.make_exon_coord_files(cov_file, [transcript], str(tmp_path / "exon_coords"))[transcript]
+    assert ngstp.load_transcript_model_record(transcript, exon_coord_file, os.path.join(in_dir, "APC_utrs.txt"), None)["chrom"] == "5"
+
+
+def test_missing_transcript_and_shared_connection(tmp_path):
+    db_file = str(tmp_path / "a.db")
+    ngstp.make_transcript_model_db(db_file, [transcript], [os.path.join(in_dir, "APC_exon_coord.csv")], [os.path.join(in_dir, "APC_utrs.txt")])
+    assert tdb.get_transcript_interval_df_l(db_file, "ENST00000000000") == None
+    assert tdb.get_db_conn(db_file) is tdb.get_db_conn(db_file)
+    tdb.close_db_conns()
+
+
+def test_older_database_is_not_loaded(tmp_path):
+    db_file = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE transcript_model (transcript TEXT PRIMARY KEY, model BLOB)")
+    conn.commit()
+    conn.close()
+    assert tdb.get_transcript_interval_df_l(db_file, transcript) == None
+    assert tdb.write_transcript_model_db(db_file, []) == False
+    tdb.close_db_conns()
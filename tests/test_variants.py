@@ -0,0 +1,58 @@
+import os
+import sys
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.text
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.gridspec import GridSpec
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import settings as s
+import synthetic as sy
+import variants as v
+
+'''
+Tests of the placement of the variant arrow labels.
+'''
+
+def get_label_bbox_l(num_variants, transcript_len, setting_dict, seed=0):
+
+    '''Annotate a variants track, laid out as in make_png, with a synthetic variant set, and get the bounding boxes of the drawn labels
+    in display coordinates. The track has the 0-1 data coordinates of a colorbar.'''
+
+    variant_df = sy.get_synthetic_variant_df(num_variants, transcript_len, sorted(setting_dict["v_track_vars_t_or_b"].keys()), seed)
+    fig = Figure(figsize=(setting_dict["fig_width_inches"], setting_dict["fig_height_inches"]))
+    canvas = FigureCanvasAgg(fig)
+    variant_track = fig.add_subplot(GridSpec(setting_dict["fig_num_rows"], 1)[6,0])
+    variant_track.set_xlim(0, 1)
+    variant_track.set_ylim(0, 1)
+    v.annotate_track_with_variants(variant_track, variant_df, transcript_len, setting_dict)
+    renderer = canvas.get_renderer()
+    label_l = [text for text in variant_track.texts if hasattr(text, "arrow_patch") and text.get_text() != ""]
+
+    #The extent of the text alone, without the arrow, once the annotation has placed it.
+    for label in label_l:
+        label.update_positions(renderer)
+
+    return [matplotlib.text.Text.get_window_extent(label, renderer) for label in label_l]
+
+
+def test_swept_labels_do_not_overlap():
+    setting_dict = s.get_setting_dict()
+    setting_dict["text_mode"] = "mathtext"
+    for num_variants in [20, 200, 800]:
+        bbox_l = get_label_bbox_l(num_variants, 10000, setting_dict)
+        assert len(bbox_l) > 0
+        for i in range(len(bbox_l)):
+            for j in range(i+1, len(bbox_l)):
+                assert not bbox_l[i].overlaps(bbox_l[j]), "labels {0} and {1} overlap".format(bbox_l[i], bbox_l[j])
+
+
+def test_swept_labels_past_the_heights_are_left_out():
+    setting_dict = s.get_setting_dict()
+    setting_dict["v_track_num_arrow_heights"] = 1
+    bbox_l = get_label_bbox_l(800, 10000, setting_dict)
+    assert len(bbox_l) > 0
+    #1 height on each side, so the labels on a side must be disjoint along x.
+    for bbox_i in bbox_l:
+        assert sum([bbox_i.overlaps(bbox_j) for bbox_j in bbox_l]) == 1
@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import vcf
+
+'''
+Tests of reading the variants of a transcript from a VEP annotated VCF file.
+'''
+
+header_line_l = ["##fileformat=VCFv4.2",
+                 "##INFO=<ID=CSQ,Number=.,Type=String,Description=\"Consequence annotations from Ensembl VEP. Format: Allele|Consequence|Feature|HGVSc|HGVSp\">",
+                 "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO"]
+
+
+def write_vcf(vcf_file, record_l):
+
+    '''Write a VCF file with a CSQ annotation on ENST00000457016 for each record, given as (chromosome, position, REF, consequence).'''
+
+    with open(vcf_file, "w") as vcf_fh:
+        vcf_fh.write("\n".join(header_line_l) + "\n")
+        for chrom, pos, ref, consequence in record_l:
+            csq = "T|{0}|ENST00000457016.6|ENST00000457016.6:c.{1}{2}>T|ENST00000457016.6:p.Arg{1}Ter".format(consequence, pos, ref[0])
+            vcf_fh.write("\t".join([chrom, str(pos), ".", ref, "T", ".", "PASS", "CSQ=" + csq]) + "\n")
+
+
+def test_records_at_the_span_edges(tmp_path):
+    vcf_file = str(tmp_path / "a.vcf")
+    write_vcf(vcf_file, [("4", 150, "C", "stop_gained"), ("5", 99, "C", "stop_gained"), ("5", 100, "C", "stop_gained"),
+                         ("5", 200, "C", "missense_variant"), ("5", 201, "C", "stop_gained"), ("6", 150, "C", "stop_gained")])
+    variant_df = vcf.get_vcf_variant_df("ENST00000457016", vcf_file, "5", 100, 200)
+    assert variant_df["pos"].tolist() == [100, 200]
+    assert variant_df["CHROM"].tolist() == ["5", "5"]
+    assert variant_df["effect"].tolist() == ["stop_gained", "missense_variant"]
+    assert variant_df["dnachange"].tolist() == ["c.100C>T", "c.200C>T"]
+    assert variant_df["prot_change"].tolist() == ["p.Arg100Ter", "p.Arg200Ter"]
+
+
+def test_chr_prefix_and_effect_filter(tmp_path):
+    vcf_file = str(tmp_path / "a.vcf")
+    write_vcf(vcf_file, [("chr5", 100, "C", "stop_gained"), ("chr5", 150, "C", "synonymous_variant")])
+    variant_df = vcf.get_vcf_variant_df("ENST00000457016", vcf_file, "5", 100, 200, effect_l=["stop_gained"])
+    assert variant_df["pos"].tolist() == [100]
+
+
+def test_no_chromosome_reads_every_record(tmp_path):
+    vcf_file = str(tmp_path / "a.vcf")
+    write_vcf(vcf_file, [("4", 150, "C", "stop_gained"), ("5", 150, "C", "stop_gained")])
+    assert vcf.get_vcf_variant_df("ENST00000457016", vcf_file, None, 100, 200)["pos"].tolist() == [150, 150]
+
+
+def test_deletion_overlapping_the_span_start(tmp_path):
+    vcf_file = str(tmp_path / "a.vcf")
+    write_vcf(vcf_file, [("5", 97, "CA", "stop_gained"), ("5", 98, "CAG", "frameshift_variant"), ("5", 150, "C", "stop_gained")])
+    variant_df = vcf.get_vcf_variant_df("ENST00000457016", vcf_file, "5", 100, 200)
+    assert variant_df["pos"].tolist() == [98, 150]
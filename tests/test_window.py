@@ -0,0 +1,47 @@
+import os
+import sys
+import pandas as pd
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","transplot")))
+import transcript as ts
+import window as w
+
+'''
+Tests of restricting the tracks to a window of the transcript.
+'''
+
+def get_transcript_model_dict(strand):
+
+    '''Make the model of a transcript with 3 exons, of 10, 5 and 10 bases at 100-109, 200-204 and 300-309, in transcript order.'''
+
+    exon_coord_df = pd.DataFrame({"start_bp":[100, 200, 300], "end_bp":[109, 204, 309]}, index=["E1","E2","E3"])
+    if strand == "-":
+        exon_coord_df = pd.DataFrame({"start_bp":[309, 204, 109], "end_bp":[300, 200, 100]}, index=["E3","E2","E1"])
+
+    return ts.get_transcript_model_dict(exon_coord_df)
+
+
+def test_window_tp_l():
+    assert w.get_window_tp_l(get_transcript_model_dict("+"), 105, 202) == [6, 13]
+    assert w.get_window_tp_l(get_transcript_model_dict("-"), 105, 202) == [13, 20]
+
+
+def test_window_ends_are_clipped_to_exonic_bases():
+    transcript_model_dict = get_transcript_model_dict("+")
+    assert w.get_window_tp_l(transcript_model_dict, 150, 400) == [11, 25]
+    assert w.get_window_tp_l(transcript_model_dict, 1, 99999) == [1, 25]
+    assert w.get_window_tp_l(transcript_model_dict, 120, 190) == None
+    assert w.get_window_tp_l(transcript_model_dict, 310, 400) == None
+
+
+def test_window_positions_are_numbered_from_1():
+    tp_window_l = [6, 13]
+    tp_offset = w.get_window_tp_offset(tp_window_l)
+    assert [tp - tp_offset for tp in tp_window_l] == [1, w.get_window_len(tp_window_l)]
+    assert w.get_window_len(tp_window_l) == 8
+
+
+def test_window_bound_color_clipping():
+    bound_l, color_l, edge_color_l = [1, 11, 16, 26], ["red", "grey", "red"], ["k", "w", "k"]
+    assert w.get_window_bound_color_ll(bound_l, [color_l, edge_color_l], 6, 13) == [[6, 11, 13], ["red", "grey"], ["k", "w"]]
+    assert w.get_window_bound_color_ll(bound_l, [color_l], 11, 26) == [[11, 16, 26], ["grey", "red"]]
+    assert w.get_window_bound_color_ll(bound_l, [color_l], 1, 26) == [bound_l, color_l]
@@ -0,0 +1,343 @@
+import pandas as pd
+import multiprocessing
+import concurrent.futures
+import traceback
+import hashlib
+import json
+import time
+import os
+import cache as ch
+import transplotter as ngstp
+import textmode as tm
+
+
+'''
+Functions for rendering many pngs in a batch: reading a manifest of transcripts and output paths, and fanning the make_png calls
+out over a process pool. make_png draws each figure on its own Agg canvas, so the workers need no display. If a worker process dies
+(e.g. it is killed for using too much memory), the pngs which were not made are retried each in its own process, and the pngs
+whose process dies again are reported as failed. A fingerprint of each png's inputs and settings is stored next to it when it is made,
+in <png_file>.fingerprint, and is deleted when it fails, so that in incremental mode the pngs whose fingerprint is unchanged are skipped.
+'''
+
+def get_sample_l(sample_str):
+
+    '''Parse the samples field of a manifest row.
+
+    Args:
+        sample_str (str): comma-separated sample IDs, e.g. "s1,s2", or semicolon-separated sample groups of the form
+        name=sample1,sample2, e.g. "cases=s1,s2;controls=s3,s4".
+
+    Returns:
+        sample_l (list of strs or dict): list of sample IDs, or lists of sample IDs indexed by group name.
+    '''
+
+    if "=" not in sample_str:
+        return [sample for sample in sample_str.split(",") if sample != ""]
+    sample_l = {}
+    for group_str in sample_str.split(";"):
+        name, group_sample_str = group_str.split("=", 1)
+        sample_l[name] = group_sample_str.split(",")
+
+    return sample_l
+
+
+def get_batch_job_l(manifest_file):
+
+    '''Read a batch manifest into a list of jobs. The manifest is a tab-separated file with 1 row per transcript and the columns
+    png_file, transcript, title, tracks, samples, utr_file, exon_coord_file, cov_file, variant_file and protein_domain_file, plus
+    the optional columns bp_start, bp_end and chrom. Rows with the same png_file are drawn in the same png, in manifest order.
+
+    Args:
+        manifest_file (str): path to the manifest.
+
+    Returns:
+        job_l (list of dicts): the make_png list arguments for each png, indexed by argument name, plus png_file.
+    '''
+
+    manifest_df = pd.read_csv(manifest_file, sep="\t", dtype=str, keep_default_na=False)
+    for col in ["bp_start","bp_end","chrom"]:
+        if col not in manifest_df.columns:
+            manifest_df[col] = ""
+
+    job_l, job_dict = [], {}
+    for row in manifest_df.to_dict(orient="records"):
+        if row["png_file"] not in job_dict:
+            job_dict[row["png_file"]] = {"png_file":row["png_file"], "transcript_l":[], "title_l":[], "track_l":[], "sample_ll":[],
+                                         "utr_file_l":[], "exon_coord_file_l":[], "cov_file_l":[], "variant_file_l":[],
+                                         "protein_domain_file_l":[], "bp_window_l":[], "chrom_l":[]}
+            job_l.append(job_dict[row["png_file"]])
+        job = job_dict[row["png_file"]]
+        job["transcript_l"].append(row["transcript"])
+        job["title_l"].append(row["title"])
+        job["track_l"].append(row["tracks"])
+        job["sample_ll"].append(get_sample_l(row["samples"]))
+        for col in ["utr_file","exon_coord_file","cov_file","variant_file","protein_domain_file"]:
+            job[col + "_l"].append(row[col])
+        job["bp_window_l"].append(None if row["bp_start"] == "" or row["bp_end"] == "" else [int(row["bp_start"]), int(row["bp_end"])])
+        job["chrom_l"].append(None if row["chrom"] == "" else row["chrom"])
+
+    return job_l
+
+
+def get_file_fingerprint(path, hash_inputs, file_fingerprint_dict=None):
+
+    '''Get the part of a png fingerprint which identifies the current version of an input file.
+
+    Args:
+        | path (str): path to a file, or to a directory such as a columnar coverage store.
+        | hash_inputs (bool): whether to hash the contents of the file. If False, its size and modification time are used.
+        | file_fingerprint_dict (dict): fingerprints already computed in this batch, indexed by path, so that each file is hashed once.
+
+    Returns:
+        file_fingerprint (tuple): the absolute path and the size and modification time, or the SHA-1 hash, of the file.
+    '''
+
+    if not hash_inputs or path == None or not os.path.exists(path):
+        return ch.get_path_key(path)
+    if file_fingerprint_dict != None and path in file_fingerprint_dict:
+        return file_fingerprint_dict[path]
+    file_path_l = [path] if not os.path.isdir(path) else [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    sha1 = hashlib.sha1()
+    for file_path in file_path_l:
+        with open(file_path, "rb") as in_fh:
+            for block in iter(lambda: in_fh.read(1024*1024), b""):
+                sha1.update(block)
+    file_fingerprint = (os.path.abspath(path), sha1.hexdigest())
+    if file_fingerprint_dict != None:
+        file_fingerprint_dict[path] = file_fingerprint
+
+    return file_fingerprint
+
+
+def get_job_fingerprint(job, protein_domain_color_file, setting_dict, transcript_model_db, hash_inputs=False, file_fingerprint_dict=None):
+
+    '''Get the fingerprint of a png: a hash of its transcripts, titles, tracks, samples, windows and chromosomes, the full settings, and
+    the versions of the input files read for the enabled tracks.
+
+    Args:
+        | job (dict): the job (see get_batch_job_l).
+        | protein_domain_color_file (str): protein domain color file.
+        | setting_dict (dictionary): settings for making the png.
+        | transcript_model_db (str): path to a transcript model database, or None.
+        | hash_inputs (bool): whether to hash the contents of the input files, rather than use their sizes and modification times.
+        | file_fingerprint_dict (dict): input file fingerprints already computed in this batch, indexed by path.
+
+    Returns:
+        fingerprint (str): SHA-1 hex digest.
+    '''
+
+    path_l = [transcript_model_db]
+    for i in range(len(job["transcript_l"])):
+        path_l.extend([job["utr_file_l"][i], job["exon_coord_file_l"][i]])
+        if job["track_l"][i][0] == "1":
+            path_l.append(job["cov_file_l"][i])
+        if job["track_l"][i][1] == "1":
+            path_l.append(job["variant_file_l"][i])
+        if job["track_l"][i][2] == "1":
+            path_l.extend([job["protein_domain_file_l"][i], protein_domain_color_file])
+    fingerprint_dict = dict([(key, job[key]) for key in ["transcript_l","title_l","track_l","sample_ll","bp_window_l","chrom_l"]])
+    fingerprint_dict["setting_dict"] = setting_dict
+    fingerprint_dict["input_l"] = [get_file_fingerprint(path, hash_inputs, file_fingerprint_dict) for path in path_l]
+    fingerprint = hashlib.sha1(json.dumps(fingerprint_dict, sort_keys=True, default=repr).encode("utf-8")).hexdigest()
+
+    return fingerprint
+
+
+def get_rebuild_reason(png_file, fingerprint):
+
+    '''Get why a png needs to be rebuilt.
+
+    Args:
+        | png_file (str): path to the png.
+        | fingerprint (str): the current fingerprint of the png (see get_job_fingerprint).
+
+    Returns:
+        rebuild_reason (str): "no png", "no fingerprint" or "changed", or None if the png is up to date.
+    '''
+
+    if not os.path.exists(png_file):
+        return "no png"
+    if not os.path.exists(png_file + ".fingerprint"):
+        return "no fingerprint"
+    with open(png_file + ".fingerprint") as fingerprint_fh:
+        if fingerprint_fh.read().strip() != fingerprint:
+            return "changed"
+
+    return None
+
+
+def run_batch_job(job_arg_l):
+
+    '''Make 1 png, catching any error so that 1 failure does not stop the batch.
+
+    Args:
+        job_arg_l (list): the job (see get_batch_job_l), the protein domain color file, the settings and the transcript model database.
+
+    Returns:
+        job_report_dict (dict): the png file, number of transcripts, status ("ok" or "failed"), time taken in seconds and error message.
+        The job's fingerprint is written to <png_file>.fingerprint when the png is made.
+    '''
+
+    [job, protein_domain_color_file, setting_dict, transcript_model_db] = job_arg_l
+    start_time = time.time()
+    status, error = "ok", ""
+    try:
+        if ngstp.make_png(job["transcript_l"], job["title_l"], job["track_l"], job["sample_ll"], job["utr_file_l"], job["exon_coord_file_l"],
+                          job["cov_file_l"], job["variant_file_l"], job["protein_domain_file_l"], protein_domain_color_file, setting_dict,
+                          job["png_file"], job["bp_window_l"], job["chrom_l"], transcript_model_db) != True:
+            status, error = "failed", "make_png returned False"
+    except Exception:
+        status, error = "failed", traceback.format_exc().strip().split("\n")[-1]
+    if status == "ok":
+        with open(job["png_file"] + ".fingerprint", "w") as fingerprint_fh:
+            fingerprint_fh.write(job["fingerprint"] + "\n")
+    job_report_dict = {"png_file":job["png_file"], "num_transcripts":len(job["transcript_l"]), "status":status,
+                       "seconds":round(time.time() - start_time, 3), "error":error}
+
+    return job_report_dict
+
+
+def get_job_report_iter(pool, job_arg_ll, num_workers, tex_cache_dir):
+
+    '''Run batch jobs on a process pool and yield their reports as they finish. If a worker process dies, the pool is broken and the
+    jobs which had not finished are retried, each in its own process (see get_isolated_job_report_iter).
+
+    Args:
+        | pool (concurrent.futures.ProcessPoolExecutor): the process pool.
+        | job_arg_ll (list of lists): the arguments of run_batch_job for each job.
+        | num_workers (int): number of worker processes.
+        | tex_cache_dir (str): the LaTeX cache directory of the workers, or None.
+
+    Returns:
+        job_report_dict (generator of dicts): the report of each job (see run_batch_job).
+    '''
+
+    future_job_arg_dict = dict([(pool.submit(run_batch_job, job_arg_l), job_arg_l) for job_arg_l in job_arg_ll])
+    retry_job_arg_ll = []
+    for future in concurrent.futures.as_completed(future_job_arg_dict):
+        try:
+            yield future.result()
+        except concurrent.futures.process.BrokenProcessPool:
+            retry_job_arg_ll.append(future_job_arg_dict[future])
+    if len(retry_job_arg_ll) > 0:
+        print("WARNING: a worker process died, so the {0} pngs which were not made are retried, each in its own process.".format(len(retry_job_arg_ll)))
+        for job_report_dict in get_isolated_job_report_iter(retry_job_arg_ll, num_workers, tex_cache_dir):
+            yield job_report_dict
+
+
+def get_isolated_job_report_iter(job_arg_ll, num_workers, tex_cache_dir):
+
+    '''Run batch jobs each in its own worker process, num_workers at a time, and yield their reports as they finish. A job whose
+    process dies is reported as failed, without affecting the others.
+
+    Args:
+        | job_arg_ll (list of lists): the arguments of run_batch_job for each job.
+        | num_workers (int): number of worker processes.
+        | tex_cache_dir (str): the LaTeX cache directory of the workers, or None.
+
+    Returns:
+        job_report_dict (generator of dicts): the report of each job (see run_batch_job).
+    '''
+
+    pending_job_arg_ll, running_dict = list(job_arg_ll[::-1]), {}
+    while len(pending_job_arg_ll) > 0 or len(running_dict) > 0:
+        while len(pending_job_arg_ll) > 0 and len(running_dict) < num_workers:
+            job_arg_l = pending_job_arg_ll.pop()
+            pool = concurrent.futures.ProcessPoolExecutor(1, initializer=tm.set_tex_cache_dir, initargs=(tex_cache_dir,))
+            running_dict[pool.submit(run_batch_job, job_arg_l)] = (pool, job_arg_l)
+        done_future_set = concurrent.futures.wait(running_dict, return_when=concurrent.futures.FIRST_COMPLETED)[0]
+        for future in done_future_set:
+            pool, job_arg_l = running_dict.pop(future)
+            pool.shutdown(wait=True)
+            try:
+                yield future.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                yield {"png_file":job_arg_l[0]["png_file"], "num_transcripts":len(job_arg_l[0]["transcript_l"]), "status":"failed", 
+                       "seconds":0.0, "error":"the worker process died before the png was made"}
+
+
+def make_pngs(manifest_file, protein_domain_color_file, setting_dict, num_workers=None, report_file=None, transcript_model_db=None,
+              incremental=False, dry_run=False, hash_inputs=False):
+
+    '''Make the pngs in a batch manifest, in parallel over a pool of worker processes. Each worker renders whole pngs, so the
+    throughput scales with the number of workers as long as there are more pngs than workers.
+
+    Args:
+        | manifest_file (str): path to the manifest (see get_batch_job_l).
+        | protein_domain_color_file (str): protein domain color file.
+        | setting_dict (dictionary): settings for making the pngs.
+        | num_workers (int): number of worker processes, defaults to the number of CPUs. If 1, the pngs are made in this process.
+        | report_file (str): path to write the per-png timing report to (tab-separated), or None.
+        | transcript_model_db (str): path to a transcript model database (see transplotter.make_transcript_model_db), or None.
+        | incremental (bool): whether to skip the pngs whose fingerprint (see get_job_fingerprint) is unchanged since they were made.
+        | dry_run (bool): whether to only list the pngs which would be rebuilt in incremental mode, without making any.
+        | hash_inputs (bool): whether the fingerprints hash the contents of the input files, rather than use their sizes and modification times.
+
+    Returns:
+        batch_report_df (DataFrame): 1 row per png with the columns png_file, num_transcripts, status, seconds and error. The status
+        is "ok" or "failed", or "skipped" for an unchanged png in incremental mode, or "rebuild" for a png which would be rebuilt in a dry run.
+    '''
+
+    job_l = get_batch_job_l(manifest_file)
+    skip_report_l = []
+    #Every png's fingerprint is written when it is made, so that a later incremental batch can tell whether it is up to date.
+    file_fingerprint_dict = {}
+    for job in job_l:
+        job["fingerprint"] = get_job_fingerprint(job, protein_domain_color_file, setting_dict, transcript_model_db, hash_inputs, file_fingerprint_dict)
+    if incremental or dry_run:
+        rebuild_job_l = []
+        for job in job_l:
+            rebuild_reason = get_rebuild_reason(job["png_file"], job["fingerprint"])
+            if rebuild_reason == None:
+                skip_report_l.append({"png_file":job["png_file"], "num_transcripts":len(job["transcript_l"]), "status":"skipped", "seconds":0.0, "error":""})
+            else:
+                job["rebuild_reason"] = rebuild_reason
+                rebuild_job_l.append(job)
+        print("{0} of {1} pngs are up to date.".format(len(skip_report_l), len(job_l)))
+        job_l = rebuild_job_l
+        if dry_run:
+            for job in job_l:
+                print("Would rebuild {0} ({1})".format(job["png_file"], job["rebuild_reason"]))
+            return pd.DataFrame(skip_report_l + [{"png_file":job["png_file"], "num_transcripts":len(job["transcript_l"]), "status":"rebuild", 
+                                                  "seconds":0.0, "error":job["rebuild_reason"]} for job in job_l],
+                                columns=["png_file","num_transcripts","status","seconds","error"])
+    if num_workers == None:
+        num_workers = multiprocessing.cpu_count()
+    num_workers = max(1, min(num_workers, len(job_l)))
+    print("Making {0} pngs with {1} workers...".format(len(job_l), num_workers))
+
+    #The LaTeX cache directory is process-wide, so it is set once here and in each worker, before any png is made.
+    tex_cache_dir = setting_dict["tex_cache_dir"] if setting_dict["text_mode"] == "latex" else None
+    tm.set_tex_cache_dir(tex_cache_dir)
+    start_time = time.time()
+    job_arg_ll = [[job, protein_domain_color_file, setting_dict, transcript_model_db] for job in job_l]
+    job_report_l = []
+    if num_workers == 1:
+        job_report_iter = (run_batch_job(job_arg_l) for job_arg_l in job_arg_ll)
+        pool = None
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(num_workers, initializer=tm.set_tex_cache_dir, initargs=(tex_cache_dir,))
+        job_report_iter = get_job_report_iter(pool, job_arg_ll, num_workers, tex_cache_dir)
+    try:
+        for job_report_dict in job_report_iter:
+            print("{0}: {1} in {2}s{3}".format(job_report_dict["png_file"], job_report_dict["status"], job_report_dict["seconds"],
+                                               "" if job_report_dict["error"] == "" else " ({0})".format(job_report_dict["error"])))
+            job_report_l.append(job_report_dict)
+            #Delete the fingerprint of an earlier version of a png which failed (including in a worker which died), so that it is rebuilt.
+            if job_report_dict["status"] == "failed" and os.path.exists(job_report_dict["png_file"] + ".fingerprint"):
+                os.remove(job_report_dict["png_file"] + ".fingerprint")
+    finally:
+        if pool != None:
+            pool.shutdown(wait=True)
+    elapsed = time.time() - start_time
+
+    batch_report_df = pd.DataFrame(skip_report_l + job_report_l, columns=["png_file","num_transcripts","status","seconds","error"])
+    num_ok = (batch_report_df["status"] == "ok").sum()
+    print("Made {0} of {1} pngs in {2:.1f}s ({3:.2f} pngs/s).".format(num_ok, len(job_l), elapsed, len(job_l)/elapsed if elapsed > 0 else 0.0))
+    if num_ok < len(job_l):
+        print("WARNING: {0} pngs failed.".format(len(job_l) - num_ok))
+    if report_file != None:
+        batch_report_df.to_csv(report_file, sep="\t", index=False)
+        print("Written batch report to {0}\n".format(report_file))
+
+    return batch_report_df
@@ -0,0 +1,165 @@
+import pandas as pd
+import collections
+import threading
+import sys
+import os
+import readers as r
+
+
+'''
+Functions for the in-process cache of parsed inputs. Parsed DataFrames are kept in a least recently used (LRU) cache, keyed by the
+reading function, the path, modification time and size of each input file and the other arguments, so repeated make_png calls on
+the same inputs skip parsing. The cache is bounded by a memory budget, and the least recently used entries are evicted first.
+'''
+
+cache_od = collections.OrderedDict()
+cache_stat_dict = {"num_bytes":0, "hits":0, "misses":0}
+cache_lock = threading.Lock()
+
+
+def get_path_key(path):
+
+    '''Get the part of a cache key which identifies the current version of an input file.
+
+    Args:
+        path (str): path to a file, or to a directory such as a columnar coverage store.
+
+    Returns:
+        path_key (tuple): the absolute path, modification time and size of the file, or of each file in the directory.
+    '''
+
+    if path == None or not os.path.exists(path):
+        return (path,)
+    if os.path.isdir(path):
+        return (os.path.abspath(path),) + tuple([(name, os.path.getmtime(os.path.join(path, name)), os.path.getsize(os.path.join(path, name)))
+                                                 for name in sorted(os.listdir(path))])
+    path_key = (os.path.abspath(path), os.path.getmtime(path), os.path.getsize(path))
+
+    return path_key
+
+
+def get_num_bytes(value):
+
+    '''Get the memory used by a cached value.
+
+    Args:
+        value (DataFrame, Series or other object): the cached value.
+
+    Returns:
+        num_bytes (int): memory used, including the contents of object columns.
+    '''
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    num_bytes = sys.getsizeof(value)
+
+    return num_bytes
+
+
+def copy_value(value):
+
+    '''Copy a cached value, so that callers which modify their inputs in place do not modify the cache.'''
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+
+    return value
+
+
+def get_cached_input(max_mb, path_l, read_func, *arg_l, **kwarg_dict):
+
+    '''Call a reading function through the cache. On a hit a copy of the cached value is returned without reading. On a miss the
+    function is called and its result is cached, evicting the least recently used entries until the cache fits in max_mb. The
+    arguments form part of the key through their repr, so they must be values such as strings, numbers and lists; to cache a
+    reading function which takes a DataFrame, use get_keyed_cached_input.
+
+    Args:
+        | max_mb (float): memory budget of the cache in megabytes. If 0 or None, the cache is bypassed.
+        | path_l (list of strs): the input files which read_func reads, whose modification times and sizes form part of the key.
+        | read_func (function): the reading function.
+        | arg_l: positional arguments for read_func.
+        | kwarg_dict: keyword arguments for read_func.
+
+    Returns:
+        value: the result of read_func(*arg_l, **kwarg_dict).
+    '''
+
+    value = get_keyed_cached_input(max_mb, path_l, arg_l, read_func, *arg_l, **kwarg_dict)
+
+    return value
+
+
+def get_keyed_cached_input(max_mb, path_l, key_arg_l, read_func, *arg_l, **kwarg_dict):
+
+    '''Call a reading function through the cache, as get_cached_input does, with the positional arguments identified in the key by
+    key_arg_l instead of by their own repr. This is for arguments such as DataFrames, whose repr is slow to build and truncated:
+    key_arg_l gives instead what they were made from, e.g. a transcript ID, and path_l includes the file they were read from.
+
+    Args:
+        | max_mb (float): memory budget of the cache in megabytes. If 0 or None, the cache is bypassed.
+        | path_l (list of strs): the input files which read_func depends on, whose modification times and sizes form part of the key.
+        | key_arg_l (tuple): values which identify the positional arguments.
+        | read_func (function): the reading function.
+        | arg_l: positional arguments for read_func.
+        | kwarg_dict: keyword arguments for read_func.
+
+    Returns:
+        value: the result of read_func(*arg_l, **kwarg_dict).
+    '''
+
+    if not max_mb:
+        return read_func(*arg_l, **kwarg_dict)
+
+    key = (read_func.__module__, read_func.__name__, tuple([get_path_key(path) for path in path_l]), repr(tuple(key_arg_l)), repr(sorted(kwarg_dict.items())))
+    with cache_lock:
+        is_hit = key in cache_od
+        if is_hit:
+            value, num_bytes = cache_od.pop(key)
+            cache_od[key] = (value, num_bytes)
+        cache_stat_dict["hits" if is_hit else "misses"] += 1
+    if is_hit:
+        r.report("Using cached {0} of {1}".format(read_func.__name__, ", ".join([str(path) for path in path_l])))
+        return copy_value(value)
+
+    #Read outside the lock, so that threads reading different inputs do not wait for each other.
+    value = read_func(*arg_l, **kwarg_dict)
+    num_bytes = get_num_bytes(value)
+    max_bytes = max_mb*1024*1024
+    if num_bytes <= max_bytes:
+        with cache_lock:
+            if key in cache_od:
+                cache_stat_dict["num_bytes"] -= cache_od.pop(key)[1]
+            while cache_stat_dict["num_bytes"] + num_bytes > max_bytes:
+                evicted_value, evicted_num_bytes = cache_od.popitem(last=False)[1]
+                cache_stat_dict["num_bytes"] -= evicted_num_bytes
+            cache_od[key] = (value, num_bytes)
+            cache_stat_dict["num_bytes"] += num_bytes
+        value = copy_value(value)
+
+    return value
+
+
+def get_cache_info():
+
+    '''Get statistics for the cache.
+
+    Returns:
+        cache_info_dict (dict): the number of entries, the memory used in megabytes and the numbers of hits and misses.
+    '''
+
+    with cache_lock:
+        cache_info_dict = {"entries":len(cache_od), "mb":cache_stat_dict["num_bytes"]/(1024.0*1024.0),
+                           "hits":cache_stat_dict["hits"], "misses":cache_stat_dict["misses"]}
+
+    return cache_info_dict
+
+
+def clear_cache():
+
+    '''Empty the cache and reset its statistics.'''
+
+    with cache_lock:
+        cache_od.clear()
+        cache_stat_dict.update({"num_bytes":0, "hits":0, "misses":0})
@@ -0,0 +1,147 @@
+import argparse
+import pandas as pd
+import sys
+import transplotter as ngstp
+import covsummary as csum
+import settings as s
+
+
+'''
+Command line interface for the bulk operations in transplot, e.g.
+
+    python transplot/cli.py exon-coords coverage.csv exon_coord_dir --transcripts ENST00000457016
+'''
+
+def get_transcript_l(transcript_l, transcript_file):
+
+    '''Get the list of transcripts from the command line arguments.
+
+    Args:
+        | transcript_l (list of strs): Ensembl transcript IDs given on the command line.
+        | transcript_file (str): path to file containing 1 Ensembl transcript ID per line.
+
+    Returns:
+        transcript_l (list of strs): Ensembl transcript IDs, or None for every transcript.
+    '''
+
+    if transcript_file != None:
+        with open(transcript_file) as transcript_fh:
+            transcript_l = (transcript_l or []) + [line.strip() for line in transcript_fh if line.strip() != ""]
+
+    return transcript_l
+
+
+def get_sample_group_dict(group_l):
+
+    '''Get the sample groups from command line arguments of the form name=sample1,sample2.
+
+    Args:
+        group_l (list of strs): sample group arguments.
+
+    Returns:
+        sample_group_dict (dict): lists of sample IDs indexed by group name.
+    '''
+
+    sample_group_dict = {}
+    for group in group_l:
+        name, sample_str = group.split("=", 1)
+        sample_group_dict[name] = sample_str.split(",")
+
+    return sample_group_dict
+
+
+def get_arg_parser():
+
+    '''Make the command line argument parser.
+
+    Returns:
+        arg_parser (argparse.ArgumentParser): parser with a sub-command for each operation.
+    '''
+
+    arg_parser = argparse.ArgumentParser(prog="transplot", description="Bulk operations for transplot.")
+    sub_parsers = arg_parser.add_subparsers(dest="command")
+
+    index_parser = sub_parsers.add_parser("index-cov", help="make a transcript index for a coverage file.")
+    index_parser.add_argument("cov_file")
+
+    store_parser = sub_parsers.add_parser("make-cov-store", help="convert a coverage file into a columnar coverage store.")
+    store_parser.add_argument("cov_file")
+    store_parser.add_argument("store_dir")
+
+    exon_coord_parser = sub_parsers.add_parser("exon-coords", help="make exon coordinate files for many transcripts in 1 pass.")
+    exon_coord_parser.add_argument("cov_file")
+    exon_coord_parser.add_argument("out_dir")
+    exon_coord_parser.add_argument("--transcripts", nargs="+", default=None, help="transcript IDs (default: every transcript).")
+    exon_coord_parser.add_argument("--transcript-file", default=None, help="file containing 1 transcript ID per line.")
+    exon_coord_parser.add_argument("--chunksize", type=int, default=100000)
+
+    summary_parser = sub_parsers.add_parser("cov-summary", help="write per-transcript coverage summary statistics in 1 pass.")
+    summary_parser.add_argument("cov_file")
+    summary_parser.add_argument("out_path")
+    summary_parser.add_argument("--samples", nargs="+", default=None, help="sample IDs (default: every sample).")
+    summary_parser.add_argument("--groups", nargs="+", default=[], help="sample groups of the form name=sample1,sample2.")
+    summary_parser.add_argument("--thresholds", nargs="+", type=int, default=[10,20,30])
+    summary_parser.add_argument("--transcripts", nargs="+", default=None, help="transcript IDs (default: every transcript).")
+    summary_parser.add_argument("--transcript-file", default=None, help="file containing 1 transcript ID per line.")
+    summary_parser.add_argument("--chunksize", type=int, default=100000)
+
+    render_parser = sub_parsers.add_parser("render", help="make the pngs in a batch manifest over a pool of worker processes.")
+    render_parser.add_argument("manifest_file", help="tab-separated file with 1 row per transcript (see batch.get_batch_job_l).")
+    render_parser.add_argument("protein_domain_color_file")
+    render_parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs).")
+    render_parser.add_argument("--report", default=None, help="path to write the per-png timing report to.")
+    render_parser.add_argument("--model-db", default=None, help="transcript model database to load the exon and utr models from.")
+    render_parser.add_argument("--incremental", action="store_true", help="skip the pngs whose inputs and settings are unchanged since they were made.")
+    render_parser.add_argument("--dry-run", action="store_true", help="list the pngs which would be rebuilt in incremental mode, without making any.")
+    render_parser.add_argument("--hash-inputs", action="store_true", help="fingerprint the input files by content rather than size and modification time.")
+    render_parser.add_argument("--settings", default=None, help="JSON file of settings which replace the defaults, e.g. {\"fig_dpi\": 300}.")
+
+    model_db_parser = sub_parsers.add_parser("make-model-db", help="make a transcript model database from the exon coordinate and utr files in a manifest.")
+    model_db_parser.add_argument("manifest_file", help="tab-separated file with the columns transcript, exon_coord_file and utr_file, e.g. a render manifest.")
+    model_db_parser.add_argument("db_file")
+
+    return arg_parser
+
+
+def main(arg_l=None):
+
+    '''Run a transplot command.
+
+    Args:
+        arg_l (list of strs): command line arguments, defaults to sys.argv[1:].
+    '''
+
+    arg_parser = get_arg_parser()
+    args = arg_parser.parse_args(arg_l)
+
+    if args.command == "index-cov":
+        ngstp.make_cov_index_file(args.cov_file)
+    elif args.command == "make-cov-store":
+        ngstp.make_cov_store(args.cov_file, args.store_dir)
+    elif args.command == "exon-coords":
+        ngstp.make_exon_coord_files(args.cov_file, get_transcript_l(args.transcripts, args.transcript_file), args.out_dir, args.chunksize)
+    elif args.command == "cov-summary":
+        csum.make_cov_summary_file(args.cov_file, args.samples, get_sample_group_dict(args.groups), args.thresholds,
+                                   get_transcript_l(args.transcripts, args.transcript_file), args.out_path, args.chunksize)
+    elif args.command == "render":
+        import batch
+        setting_dict = s.get_setting_dict() if args.settings == None else s.get_setting_dict_from_file(args.settings)
+        if setting_dict == False:
+            return 1
+        batch_report_df = batch.make_pngs(args.manifest_file, args.protein_domain_color_file, setting_dict, args.workers, args.report,
+                                          args.model_db, args.incremental, args.dry_run, args.hash_inputs)
+        if (batch_report_df["status"] == "failed").any():
+            return 1
+    elif args.command == "make-model-db":
+        manifest_df = pd.read_csv(args.manifest_file, sep="\t", dtype=str).drop_duplicates(subset=["transcript"])
+        ngstp.make_transcript_model_db(args.db_file, manifest_df["transcript"].tolist(), manifest_df["exon_coord_file"].tolist(),
+                                       manifest_df["utr_file"].tolist())
+    else:
+        arg_parser.print_help()
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,46 +1,203 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib as mpl
+import matplotlib.artist
+import csv
+import io
+import os
+import cache as ch
+import covstore as cs
+import readers as r
+import textmode as tm
 
 
 '''
 Functions specific to coverage: reading in the data and creating the coverage track.
 '''
 
-def get_cov_df(cov_file, transcript, bp_start, bp_end, sample_l):
+def get_cov_df(cov_file, transcript, bp_start, bp_end, sample_l, envelope=False, chunksize=1000, max_mb=None):
 
     '''Get the coverage data for a transcript. If bp_start and bp_end are None, then coverage data for the whole transcript will
-    be extracted. The coordinates in cov_df and exon_coords_df are 1-based.
+    be extracted. Otherwise the window is applied while reading: blocks of rows outside it are skipped using the index or store,
+    and without either, the lines outside the window are dropped before any row is parsed (see get_windowed_cov_df_chunker). tp then numbers the bases within the window (map bp to transcript positions with the exon 
+    coordinates instead). The coordinates in cov_df and exon_coords_df are 1-based. cov_file 
+    may also be a columnar coverage store made by covstore.make_cov_store, in which case only the requested samples are memory-mapped.
+    
+    sample_l may also be a dictionary of named sample groups, in which case the mean of each group is computed from the same read
+    and returned in a cov_<group> column (plus min_<group> and max_<group> columns if envelope is True). The cov column then 
+    contains the mean of the first group.
     
     Args:
-        | cov_file (str): path to file containing the coverage data.
+        | cov_file (str): path to file (or columnar store) containing the coverage data.
         | transcript (str): Ensembl transcript ID.
         | bp_start (int): base pair start coordinate.
         | bp_end (int): base pair end coordinate.
-        | sample_l (list of strs): list of sample IDs.
+        | sample_l (list of strs or dict): list of sample IDs, or lists of sample IDs indexed by group name.
+        | envelope (bool): whether to add the min and max envelope of each sample group.
+        | chunksize (int): number of rows to read at a time.
+        | max_mb (float): memory budget of the input cache, in which the parsed coverage index is kept, or None to bypass it.
     
     Returns:
         cov_df (DataFrame): contains the coverage data.
     '''    
 
-    print("Reading in coverage data for {0} samples...".format(len(sample_l)))
+    group_col_l = []
+    if isinstance(sample_l, dict):
+        group_col_l = get_group_col_l(sample_l, envelope)
+        r.report("Reading in coverage data for {0} sample groups...".format(len(sample_l)))
+    else:
+        r.report("Reading in coverage data for {0} samples...".format(len(sample_l)))
     if bp_start != None and bp_end != None:
         if bp_start >= bp_end:
-            print("WARNING: bp_start {0} is not less than {1}".format(bp_start,bp_end)) 
+            r.report("WARNING: bp_start {0} is not less than {1}".format(bp_start,bp_end)) 
     
-    cov_df_chunker = pd.read_csv(cov_file, chunksize=1000)
-    col_to_keep_l = ["chromStart","strand","position","cov","exon"]
+    if cs.is_cov_store(cov_file):
+        return cs.get_cov_df_from_store(cov_file, transcript, sample_l, bp_start, bp_end, envelope)
+    
+    #Seek straight to the transcript's rows if the coverage file has been indexed, otherwise scan the whole file.
+    cov_df_chunker = None
+    cov_index_file = get_cov_index_file(cov_file)
+    if is_cov_index_current(cov_file, cov_index_file):
+        cov_index_df = get_cov_index_df(cov_index_file, transcript, max_mb)
+        if len(cov_index_df.index) > 0:
+            r.report("Using coverage index {0}".format(cov_index_file))
+            if bp_start != None and bp_end != None:
+                cov_index_df = cov_index_df[(cov_index_df["chromEnd"] >= bp_start) & (cov_index_df["chromStart"] + 1 <= bp_end)]
+            cov_df_chunker = get_indexed_cov_df_chunker(cov_file, cov_index_df, chunksize, sample_l)
+    if cov_df_chunker == None and bp_start != None and bp_end != None:
+        cov_df_chunker = get_windowed_cov_df_chunker(cov_file, transcript, bp_start, bp_end, chunksize, sample_l)
+    if cov_df_chunker == None:
+        cov_df_chunker = pd.read_csv(cov_file, chunksize=chunksize, **get_cov_read_kwarg_dict(sample_l))
+    col_to_keep_l = ["chromStart","strand","position","cov","exon"] + group_col_l
     cov_df_chunk_l = []
     for cov_df_chunk in cov_df_chunker:
-        cov_df_chunk = cov_df_chunk[cov_df_chunk["name"].str.contains(transcript)]
+        cov_df_chunk = set_depth_dtypes(cov_df_chunk[cov_df_chunk["name"].str.contains(transcript)], sample_l)
+        if bp_start != None and bp_end != None:
+            chunk_bp_s = cov_df_chunk["chromStart"] + cov_df_chunk["position"]
+            cov_df_chunk = cov_df_chunk[(chunk_bp_s >= bp_start) & (chunk_bp_s <= bp_end)]
         cov_df_chunk["exon"] = cov_df_chunk["name"].str.split(pat=":").str.get(2)
-        cov_df_chunk["cov"] = cov_df_chunk[sample_l].mean(axis=1)
+        if isinstance(sample_l, dict):
+            cov_df_chunk = add_group_cov_cols(cov_df_chunk, sample_l, envelope)
+        else:
+            cov_df_chunk["cov"] = cov_df_chunk[sample_l].mean(axis=1)
         cov_df_chunk = cov_df_chunk[col_to_keep_l]
         #print cov_df_chunk
         cov_df_chunk_l.append(cov_df_chunk)
     
+    if len(cov_df_chunk_l) == 0:
+        cov_df_chunk_l.append(pd.DataFrame([], columns=col_to_keep_l))
     cov_df = pd.concat(cov_df_chunk_l,ignore_index=True)
     del cov_df_chunk_l
+    if len(cov_df.index) == 0:
+        r.report("WARNING: no coverage data for {0}".format(transcript) if bp_start == None or bp_end == None else
+              "WARNING: no coverage data for {0} between {1} and {2}".format(transcript, bp_start, bp_end))
+    cov_df = add_bp_tp_cols(cov_df)
+    
+    return cov_df
+
+
+def get_cov_read_kwarg_dict(sample_l):
+
+    '''Get the pandas.read_csv column projection and dtypes for reading a coverage file: only the columns needed to filter and
+    position the rows, plus the requested sample columns, are parsed. The name column is read as a categorical, since it repeats
+    for every base of an exon, and the depths as 32-bit floats, so that missing and fractional (e.g. normalised) depths are read.
+    Chunks whose depths are all whole numbers are then converted to 32-bit integers (see set_depth_dtypes).
+    
+    Args:
+        sample_l (list of strs or dict): list of sample IDs, or lists of sample IDs indexed by group name.
+    
+    Returns:
+        read_kwarg_dict (dict): the usecols and dtype keyword arguments.
+    '''
+    
+    if isinstance(sample_l, dict):
+        sample_l = [sample for group in sample_l for sample in sample_l[group]]
+    col_l = ["chromStart","name","strand","position"]
+    col_l = col_l + [sample for sample in sample_l if sample not in col_l]
+    dtype_dict = dict([(sample, "float32") for sample in sample_l])
+    dtype_dict.update({"chromStart":"int64", "name":"category", "strand":str, "position":"int64"})
+    read_kwarg_dict = {"usecols":col_l, "dtype":dtype_dict}
+    
+    return read_kwarg_dict
+
+
+def set_depth_dtypes(cov_df, sample_l):
+
+    '''Convert the depth columns of coverage data read with get_cov_read_kwarg_dict to 32-bit integers, if every depth in them is a
+    whole number. Missing or fractional depths are left as 32-bit floats.
+    
+    Args:
+        | cov_df (DataFrame): contains a column per sample.
+        | sample_l (list of strs or dict): list of sample IDs, or lists of sample IDs indexed by group name.
+    
+    Returns:
+        cov_df (DataFrame): with the depth columns converted.
+    '''
+    
+    if isinstance(sample_l, dict):
+        sample_l = [sample for group in sample_l for sample in sample_l[group]]
+    sample_l = list(dict.fromkeys(sample_l))
+    depth_arr = cov_df[sample_l].values
+    if np.isfinite(depth_arr).all() and (depth_arr == np.floor(depth_arr)).all():
+        cov_df = cov_df.astype(dict([(sample, "int32") for sample in sample_l]))
+    
+    return cov_df
+
+
+def get_group_col_l(sample_group_dict, envelope):
+
+    '''Get the names of the coverage columns for a dictionary of sample groups.
+    
+    Args:
+        | sample_group_dict (dict): lists of sample IDs indexed by group name.
+        | envelope (bool): whether to include the min and max envelope columns.
+    
+    Returns:
+        group_col_l (list of strs): column names.
+    '''
+    
+    group_col_l = []
+    for group in sample_group_dict:
+        group_col_l.append("cov_" + group)
+        if envelope == True:
+            group_col_l.extend(["min_" + group, "max_" + group])
+    
+    return group_col_l
+
+
+def add_group_cov_cols(cov_df, sample_group_dict, envelope):
+
+    '''Add the mean (and optionally min and max) coverage of each sample group to the coverage data.
+    
+    Args:
+        | cov_df (DataFrame): contains a column per sample.
+        | sample_group_dict (dict): lists of sample IDs indexed by group name.
+        | envelope (bool): whether to add the min and max envelope of each sample group.
+    
+    Returns:
+        cov_df (DataFrame): with the cov column and a cov_<group> column per group (and min_<group>, max_<group> columns).
+    '''
+    
+    for group in sample_group_dict:
+        cov_df["cov_" + group] = cov_df[sample_group_dict[group]].mean(axis=1)
+        if envelope == True:
+            cov_df["min_" + group] = cov_df[sample_group_dict[group]].min(axis=1)
+            cov_df["max_" + group] = cov_df[sample_group_dict[group]].max(axis=1)
+    cov_df["cov"] = cov_df["cov_" + list(sample_group_dict)[0]]
+    
+    return cov_df
+
+
+def add_bp_tp_cols(cov_df):
+
+    '''Add the base pair and transcript position columns to the coverage data for a transcript, and sort it by base pair.
+    
+    Args:
+        cov_df (DataFrame): contains the chromStart, strand and position columns of the coverage data.
+    
+    Returns:
+        cov_df (DataFrame): contains the coverage data with bp and tp columns in place of chromStart and position.
+    '''
     
     #Work out the bp and check whether bp_start <= bp <= bp_end
     #BED start positions are 0-based i.e. the first base in an exon is interpreted as +1 from the start position.
@@ -48,7 +205,7 @@ def get_cov_df(cov_file, transcript, bp_start, bp_end, sample_l):
     cov_df["bp"] = cov_df["chromStart"] + cov_df["position"]
     cov_df.sort_values(by="bp", inplace=True)
     cov_df.index = range(len(cov_df.index))
-    gene_strand = cov_df.iloc[0]["strand"]
+    gene_strand = cov_df.iloc[0]["strand"] if len(cov_df.index) > 0 else "+"
     #cov_df.drop("strand", axis=1, inplace=True)
     cov_df["tp"] = range(1,len(cov_df.index)+1)
     if gene_strand == "-":
@@ -58,6 +215,321 @@ def get_cov_df(cov_file, transcript, bp_start, bp_end, sample_l):
     return cov_df
 
 
+def get_transcript_cov_df_chunker(cov_file, transcript_l, sample_l, chunksize):
+
+    '''Stream a coverage file once and yield the coverage data for each transcript in turn. Rows are grouped by the transcript ID parsed
+    from the name column, and a transcript's rows are yielded as soon as the stream moves on to another transcript, so memory use is
+    bounded by the largest transcript rather than the file. This assumes each transcript's rows are contiguous, as in a sorted 
+    coverage file.
+    
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | transcript_l (list of strs): Ensembl transcript IDs to extract, or None for every transcript.
+        | sample_l (list of strs): sample IDs whose columns are kept.
+        | chunksize (int): number of rows per chunk.
+    
+    Returns:
+        transcript_cov_df (generator of (str, DataFrame) tuples): transcript ID and its coverage data, with chrom, bp and tp columns.
+    '''
+    
+    transcript_set = None if transcript_l == None else set(transcript_l)
+    col_to_keep_l = ["chrom","chromStart","strand","position","exon"] + list(sample_l)
+    read_kwarg_dict = get_cov_read_kwarg_dict(sample_l)
+    read_kwarg_dict["usecols"] = ["chrom"] + read_kwarg_dict["usecols"]
+    read_kwarg_dict["dtype"]["chrom"] = "category"
+    cov_df_chunk_l_dict, yielded_set = {}, set()
+    
+    def flush(transcript):
+        cov_df = pd.concat(cov_df_chunk_l_dict.pop(transcript), ignore_index=True)
+        yielded_set.add(transcript)
+        return (transcript, add_bp_tp_cols(cov_df))
+    
+    for cov_df_chunk in pd.read_csv(cov_file, chunksize=chunksize, **read_kwarg_dict):
+        name_df = cov_df_chunk["name"].str.split(pat=":", expand=True)
+        cov_df_chunk["transcript"], cov_df_chunk["exon"] = name_df[1], name_df[2]
+        last_transcript = name_df[1].iloc[-1]
+        if transcript_set != None:
+            cov_df_chunk = cov_df_chunk[cov_df_chunk["transcript"].isin(transcript_set)]
+        cov_df_chunk = set_depth_dtypes(cov_df_chunk, sample_l)
+        for transcript, cov_df_group in cov_df_chunk.groupby("transcript", sort=False):
+            if transcript in yielded_set:
+                r.report("WARNING: rows for {0} are not contiguous in {1}, so it is yielded more than once.".format(transcript, cov_file))
+            cov_df_chunk_l_dict.setdefault(transcript, []).append(cov_df_group[col_to_keep_l])
+        for transcript in [transcript for transcript in cov_df_chunk_l_dict if transcript != last_transcript]:
+            yield flush(transcript)
+    for transcript in list(cov_df_chunk_l_dict):
+        yield flush(transcript)
+
+
+def get_cov_index_file(cov_file):
+
+    '''Get the path of the transcript index for a coverage file.
+    
+    Args:
+        cov_file (str): path to file containing the coverage data.
+    
+    Returns:
+        cov_index_file (str): path to the transcript index.
+    '''
+    
+    cov_index_file = cov_file + ".tpi"
+    
+    return cov_index_file
+
+
+def is_cov_index_current(cov_file, cov_index_file):
+
+    '''Check whether a coverage index exists and is at least as recent as the coverage file.
+    
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | cov_index_file (str): path to the transcript index.
+    
+    Returns:
+        is_current (bool): whether the index can be used.
+    '''
+    
+    if not os.path.exists(cov_index_file):
+        return False
+    if os.path.getmtime(cov_index_file) < os.path.getmtime(cov_file):
+        r.report("WARNING: coverage index {0} is older than {1} and will be ignored.".format(cov_index_file, cov_file))
+        return False
+    
+    return True
+
+
+def make_cov_index_file(cov_file, cov_index_file=None):
+
+    '''Make a transcript index for a coverage file. The coverage file is scanned once and, for each block of consecutive rows
+    with the same name (i.e. the same transcript and exon), the index records the byte range it occupies in the file along with
+    its chromStart, chromEnd and number of rows. get_cov_df uses the index automatically when it exists.
+    
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | cov_index_file (str): path to write the index to. Defaults to the coverage file path with the suffix .tpi.
+    
+    Returns:
+        cov_index_file (str): path to the transcript index.
+    '''
+
+    print("Indexing coverage file {0}...".format(cov_file))
+    if cov_index_file == None:
+        cov_index_file = get_cov_index_file(cov_file)
+    
+    block_l = []
+    with open(cov_file, "rb") as cov_fh:
+        header_l = get_csv_field_l(cov_fh.readline())
+        name_i, chrom_start_i, chrom_end_i = header_l.index("name"), header_l.index("chromStart"), header_l.index("chromEnd")
+        block = None
+        start_byte = cov_fh.tell()
+        for line in get_csv_line_iter(cov_fh):
+            field_l = get_csv_field_l(line)
+            end_byte = start_byte + len(line)
+            if block != None and block[1] == field_l[name_i]:
+                block[5] += 1
+                block[7] = end_byte
+            else:
+                if block != None:
+                    block_l.append(block)
+                name_field_l = field_l[name_i].split(":")
+                block = [name_field_l[1], field_l[name_i], name_field_l[2], int(field_l[chrom_start_i]), int(field_l[chrom_end_i]), 1, start_byte, end_byte]
+            start_byte = end_byte
+        if block != None:
+            block_l.append(block)
+    
+    cov_index_df = pd.DataFrame(block_l, columns=["transcript","name","exon","chromStart","chromEnd","num_rows","start_byte","end_byte"])
+    cov_index_df.drop("name", axis=1, inplace=True)
+    cov_index_df.to_csv(cov_index_file, sep="\t", index=False)
+    print("Written coverage index to {0}\n".format(cov_index_file))
+    
+    return cov_index_file
+
+
+def get_csv_line_iter(in_fh):
+
+    '''Iterate over the records of a comma-separated file opened in binary mode, from its current position. A quoted field may
+    contain line breaks, so a record continues over further lines until its quotes are balanced.
+    
+    Args:
+        in_fh (file): the file.
+    
+    Returns:
+        line (generator of bytes): each record, with its line breaks.
+    '''
+    
+    for line in iter(in_fh.readline, b""):
+        while line.count(b'"') % 2 == 1:
+            next_line = in_fh.readline()
+            if next_line == b"":
+                break
+            line += next_line
+        yield line
+
+
+def get_csv_field_l(line):
+
+    '''Split a line of a comma-separated file into its fields, with quoted fields handled as pandas.read_csv handles them.
+    
+    Args:
+        line (bytes): the line, which may hold several physical lines if a quoted field contains line breaks.
+    
+    Returns:
+        field_l (list of strs): the fields.
+    '''
+    
+    line = line.decode()
+    if '"' not in line:
+        return line.rstrip("\r\n").split(",")
+    field_l = next(csv.reader([line.rstrip("\r\n")]))
+    
+    return field_l
+
+
+def read_cov_index_file(cov_index_file):
+
+    '''Read a transcript index.
+    
+    Args:
+        cov_index_file (str): path to the transcript index.
+    
+    Returns:
+        cov_index_df (DataFrame): contains the byte ranges of the blocks of every transcript in the coverage file.
+    '''
+    
+    cov_index_df = pd.read_csv(cov_index_file, sep="\t", dtype={"transcript":str, "exon":str})
+    
+    return cov_index_df
+
+
+def get_cov_index_df(cov_index_file, transcript, max_mb=None):
+
+    '''Get the index entries for a transcript. The index is parsed once and kept in the input cache (see cache.get_cached_input),
+    so that reading each transcript of a coverage file does not parse its whole index again.
+    
+    Args:
+        | cov_index_file (str): path to the transcript index.
+        | transcript (str): Ensembl transcript ID.
+        | max_mb (float): memory budget of the input cache, or None to bypass it.
+    
+    Returns:
+        cov_index_df (DataFrame): contains the byte ranges of the transcript's blocks in the coverage file.
+    '''
+    
+    cov_index_df = ch.get_cached_input(max_mb, [cov_index_file], read_cov_index_file, cov_index_file)
+    cov_index_df = cov_index_df[cov_index_df["transcript"] == transcript]
+    cov_index_df.index = range(len(cov_index_df.index))
+    
+    return cov_index_df
+
+
+def get_cov_chrom(cov_file, transcript, max_mb=None):
+
+    '''Get the chromosome of a transcript from the chrom column of a coverage file. Only the transcript's first row is parsed: the
+    index is used to seek to it if the file has been indexed, and otherwise the file is streamed until it is reached.
+    
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | transcript (str): Ensembl transcript ID.
+        | max_mb (float): memory budget of the input cache, in which the parsed coverage index is kept, or None to bypass it.
+    
+    Returns:
+        chrom (str): the chromosome, or None if the transcript is not in the file or the file is a columnar coverage store.
+    '''
+    
+    if cs.is_cov_store(cov_file):
+        return None
+    cov_index_file = get_cov_index_file(cov_file)
+    with open(cov_file, "rb") as cov_fh:
+        header_l = get_csv_field_l(cov_fh.readline())
+        if "chrom" not in header_l:
+            return None
+        chrom_i, name_i = header_l.index("chrom"), header_l.index("name")
+        if is_cov_index_current(cov_file, cov_index_file):
+            cov_index_df = get_cov_index_df(cov_index_file, transcript, max_mb)
+            if len(cov_index_df.index) == 0:
+                return None
+            cov_fh.seek(int(cov_index_df["start_byte"].iloc[0]))
+        transcript_bytes = transcript.encode()
+        for line in get_csv_line_iter(cov_fh):
+            if transcript_bytes not in line:
+                continue
+            field_l = get_csv_field_l(line)
+            if field_l[name_i].split(":")[1] == transcript:
+                return field_l[chrom_i]
+    
+    return None
+
+
+def get_indexed_cov_df_chunker(cov_file, cov_index_df, chunksize, sample_l=None):
+
+    '''Read the coverage data for a transcript by seeking straight to the byte ranges recorded in the index. Adjacent byte ranges are
+    merged so that a transcript stored contiguously is read with a single seek.
+    
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | cov_index_df (DataFrame): the index entries for the transcript.
+        | chunksize (int): number of rows per chunk.
+        | sample_l (list of strs or dict): sample IDs whose columns are read (see get_cov_read_kwarg_dict), or None for every column.
+    
+    Returns:
+        cov_df_chunk (generator of DataFrames): chunks of the coverage data for the transcript.
+    '''
+    
+    byte_range_l = []
+    for start_byte, end_byte in zip(cov_index_df["start_byte"].tolist(), cov_index_df["end_byte"].tolist()):
+        if len(byte_range_l) > 0 and byte_range_l[-1][1] == start_byte:
+            byte_range_l[-1][1] = end_byte
+        else:
+            byte_range_l.append([start_byte, end_byte])
+    
+    read_kwarg_dict = {} if sample_l == None else get_cov_read_kwarg_dict(sample_l)
+    with open(cov_file, "rb") as cov_fh:
+        header = cov_fh.readline()
+        for start_byte, end_byte in byte_range_l:
+            cov_fh.seek(start_byte)
+            for cov_df_chunk in pd.read_csv(io.BytesIO(header + cov_fh.read(end_byte - start_byte)), chunksize=chunksize, **read_kwarg_dict):
+                yield cov_df_chunk
+
+
+def get_windowed_cov_df_chunker(cov_file, transcript, bp_start, bp_end, chunksize, sample_l):
+
+    '''Read the coverage data for a transcript in a window from a coverage file which has not been indexed. The file is streamed
+    once, line by line: lines which do not contain the transcript ID are skipped with a substring search, and only the chromStart
+    and position fields of the others are split out to test them against the window. The lines in the window are then parsed
+    together, so rows outside the window are never turned into DataFrame rows. Each query still reads the whole file, so for 
+    repeated queries of a large file, index it with make_cov_index_file or convert it with covstore.make_cov_store.
+    
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | transcript (str): Ensembl transcript ID.
+        | bp_start (int): base pair start coordinate.
+        | bp_end (int): base pair end coordinate.
+        | chunksize (int): number of rows per chunk.
+        | sample_l (list of strs or dict): sample IDs whose columns are read (see get_cov_read_kwarg_dict).
+    
+    Returns:
+        cov_df_chunk (generator of DataFrames): chunks of the coverage data for the transcript in the window.
+    '''
+    
+    transcript_bytes = transcript.encode()
+    window_line_l = []
+    with open(cov_file, "rb") as cov_fh:
+        header = cov_fh.readline()
+        header_l = get_csv_field_l(header)
+        chrom_start_i, position_i = header_l.index("chromStart"), header_l.index("position")
+        max_split = max(chrom_start_i, position_i) + 1
+        for line in get_csv_line_iter(cov_fh):
+            if transcript_bytes not in line:
+                continue
+            field_l = line.split(b",", max_split) if b'"' not in line else get_csv_field_l(line)
+            if bp_start <= int(field_l[chrom_start_i]) + int(field_l[position_i]) <= bp_end:
+                window_line_l.append(line)
+    if len(window_line_l) == 0:
+        return
+    for cov_df_chunk in pd.read_csv(io.BytesIO(header + b"".join(window_line_l)), chunksize=chunksize, **get_cov_read_kwarg_dict(sample_l)):
+        yield cov_df_chunk
+
+
 def get_exon_coord_df(cov_df):
 
     '''Make an exon coordinate file.
@@ -66,24 +538,26 @@ def get_exon_coord_df(cov_df):
         cov_df (DataFrame): contains the coverage information.
         
     Returns:
-        exon_coord_df (DataFrame): contains the exon base pair and transcript position coordinates.
+        exon_coord_df (DataFrame): contains the exon base pair and transcript position coordinates, and the chromosome if cov_df 
+        has a chrom column.
     '''
 
     #Exons: the exon start and end positions in this list are 1-based. 
     #cov_df["exon"] = cov_df["name"].str.split(pat=":").str.get(2)
     
-    exon_coord_df = cov_df.groupby("exon")["bp"].agg([np.min,np.max])
-    exon_coord_df.columns = ["start_bp","end_bp"] 
-    
-    #Add the transcript positions to exon_coords_df 
-    get_tp_from_cov_df = lambda bp, cov_df: cov_df[cov_df["bp"] == bp].iloc[0]["tp"] 
-    exon_coord_df["start_tp"] =  exon_coord_df["start_bp"].apply(func=get_tp_from_cov_df, cov_df=cov_df)
-    exon_coord_df["end_tp"] =  exon_coord_df["end_bp"].apply(func=get_tp_from_cov_df, cov_df=cov_df)
+    #Get the first and last base of each exon in a single grouped pass, then look up their transcript positions by row label.
+    exon_bp_gb = cov_df.groupby("exon")["bp"]
+    start_idx_s, end_idx_s = exon_bp_gb.idxmin(), exon_bp_gb.idxmax()
+    exon_coord_df = pd.DataFrame({"start_bp":cov_df.loc[start_idx_s, "bp"].values, "end_bp":cov_df.loc[end_idx_s, "bp"].values,
+                                  "start_tp":cov_df.loc[start_idx_s, "tp"].values, "end_tp":cov_df.loc[end_idx_s, "tp"].values},
+                                 index=start_idx_s.index, columns=["start_bp","end_bp","start_tp","end_tp"])
     exon_coord_df.sort_values(by="start_tp", inplace=True)
     
     gene_strand = cov_df.iloc[0]["strand"]
     if gene_strand == "-":
         exon_coord_df.rename(columns={"start_bp":"end_bp", "end_bp":"start_bp", "start_tp":"end_tp", "end_tp":"start_tp"}, inplace=True)
+    if "chrom" in cov_df.columns:
+        exon_coord_df["chrom"] = str(cov_df["chrom"].iloc[0])
     
     return exon_coord_df
 
@@ -98,22 +572,166 @@ def make_track(track, cov_df, bound_l, color_l, edge_color_l, setting_dict):
         | bound_l (list of ints): bounds of the utrs and exons.
         | color_l (list of strs): colors for the utrs and exons.
         | edge_color_l (list of strs): edge colors for the utrs and exons.
-        | setting_dict (dictionary): settings for making the png.'''
+        | setting_dict (dictionary): settings for making the png.
+    
+    If cov_df contains the coverage of more than 1 sample group (see get_cov_df), then the groups are drawn overlaid or as a 
+    difference track, depending on setting_dict["c_track_group_mode"].'''
+    
+    #In level-of-detail mode, reduce each bound segment to 1 point per pixel bin before drawing.
+    bases_per_bin = None
+    if setting_dict["c_track_lod"] == True:
+        track_width_pixels = setting_dict["fig_width_inches"] * setting_dict["fig_dpi"] * track.get_position().width
+        bases_per_bin = setting_dict["c_track_lod_pixels_per_bin"] * float(bound_l[-1] - bound_l[0] + 1) / track_width_pixels
     
-    for i in range(1,len(bound_l)):
-        cov_in_bounds_df =  cov_df[(cov_df["tp"] >= bound_l[i-1]) & (cov_df["tp"] < bound_l[i])]
-        #print cov_in_bounds_df
-        track.fill_between(cov_in_bounds_df["tp"].tolist(), cov_in_bounds_df["cov"], facecolor=color_l[i-1], edgecolor=edge_color_l[i-1])
+    group_l = [col[4:] for col in cov_df.columns if col.startswith("cov_")]
+    y_lim_l = [0,cov_df["cov"].max()+10]
+    y_axis_label = setting_dict["c_track_y_axis_label"]
+    if len(group_l) > 1 and setting_dict["c_track_group_mode"] == "difference":
+        y_lim_l = make_group_difference(track, cov_df, group_l, bases_per_bin, setting_dict)
+        y_axis_label = setting_dict["c_track_diff_y_axis_label"]
+    elif len(group_l) > 1:
+        y_lim_l = make_group_overlay(track, cov_df, group_l, bases_per_bin, setting_dict)
+    
+    #With 1 sample group (or none), fill the coverage of each bound segment in the segment's color.
+    if len(group_l) <= 1:
+        for i in range(1,len(bound_l)):
+            cov_in_bounds_df =  cov_df[(cov_df["tp"] >= bound_l[i-1]) & (cov_df["tp"] < bound_l[i])]
+            #print cov_in_bounds_df
+            if bases_per_bin != None and len(cov_in_bounds_df.index) > 2*bases_per_bin:
+                cov_env_df = get_cov_envelope_df(cov_in_bounds_df, bases_per_bin)
+                track.fill_between(cov_env_df["tp"].tolist(), cov_env_df["max"], facecolor=color_l[i-1], edgecolor=edge_color_l[i-1])
+            else:
+                track.fill_between(cov_in_bounds_df["tp"].tolist(), cov_in_bounds_df["cov"], facecolor=color_l[i-1], edgecolor=edge_color_l[i-1])
 
     track.set_xlabel('Position')
-    plt.rc('text',usetex=True)
-    track.set_ylabel(setting_dict["c_track_y_axis_label"], rotation="horizontal", size=setting_dict["c_track_fontsize"], ha='right', va='center')
+    track.set_ylabel(tm.get_text(y_axis_label, setting_dict["text_mode"]), rotation="horizontal", size=setting_dict["c_track_fontsize"], ha='right', va='center')
     track.set_xlim((0,bound_l[-1]))
-    track.set_ylim([0,cov_df["cov"].max()+10])
+    track.set_ylim(y_lim_l)
     track.grid(True)
-    plt.setp(track.xaxis.get_ticklabels(), size=setting_dict["c_track_fontsize"])
-    plt.setp(track.yaxis.get_ticklabels(), size=setting_dict["c_track_fontsize"])
-    plt.setp(track.xaxis.get_label(), size=setting_dict["c_track_fontsize"])
+    mpl.artist.setp(track.xaxis.get_ticklabels(), size=setting_dict["c_track_fontsize"])
+    mpl.artist.setp(track.yaxis.get_ticklabels(), size=setting_dict["c_track_fontsize"])
+    mpl.artist.setp(track.xaxis.get_label(), size=setting_dict["c_track_fontsize"])
     
     #NOTE, Above the xlim start is set to x[0] i.e. 1 so the track starts from 1, but the first xtick label in the plot is 0!
     #I have tried without success to replace this 0 with a 1.  
+
+
+def make_group_overlay(track, cov_df, group_l, bases_per_bin, setting_dict):
+
+    '''Draw the mean coverage of each sample group as overlaid lines, with the min-max envelope of each group shaded if present.
+    
+    Args:
+        | track (matplotlib.axes.Axes): the axis for this coverage track.
+        | cov_df (DataFrame): contains the coverage data, with a cov_<group> column per group.
+        | group_l (list of strs): sample group names.
+        | bases_per_bin (float): number of bases per pixel bin in level-of-detail mode, or None.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        y_lim_l (list of floats): y axis limits.
+    '''
+    
+    y_max = 0
+    for i in range(len(group_l)):
+        color = setting_dict["c_track_group_color_l"][i % len(setting_dict["c_track_group_color_l"])]
+        if "max_" + group_l[i] in cov_df.columns:
+            band_df = get_band_df(cov_df, "min_" + group_l[i], "max_" + group_l[i], bases_per_bin)
+            track.fill_between(band_df["tp"].tolist(), band_df["lower"], band_df["upper"], facecolor=color, edgecolor="none",
+                               alpha=setting_dict["c_track_group_envelope_alpha"])
+            y_max = max(y_max, band_df["upper"].max())
+        band_df = get_band_df(cov_df, "cov_" + group_l[i], "cov_" + group_l[i], bases_per_bin)
+        track.fill_between(band_df["tp"].tolist(), band_df["lower"], band_df["upper"], facecolor=color, edgecolor=color,
+                           linewidth=setting_dict["c_track_group_linewidth"], label=group_l[i])
+        y_max = max(y_max, band_df["upper"].max())
+    track.legend(loc="upper right", fontsize=setting_dict["c_track_fontsize"])
+    y_lim_l = [0, y_max+10]
+    
+    return y_lim_l
+
+
+def get_band_df(cov_df, lower_col, upper_col, bases_per_bin):
+
+    '''Get the band between 2 coverage columns, sorted by transcript position. In level-of-detail mode the band is reduced to the
+    per-bin min of the lower column and the per-bin max of the upper column.
+    
+    Args:
+        | cov_df (DataFrame): contains the coverage data.
+        | lower_col (str): column for the lower edge of the band.
+        | upper_col (str): column for the upper edge of the band.
+        | bases_per_bin (float): number of bases per pixel bin in level-of-detail mode, or None.
+    
+    Returns:
+        band_df (DataFrame): contains the columns tp, lower and upper.
+    '''
+    
+    cov_df = cov_df.sort_values(by="tp")
+    if bases_per_bin != None and len(cov_df.index) > 2*bases_per_bin:
+        lower_env_df = get_cov_envelope_df(cov_df[["tp", lower_col]].rename(columns={lower_col:"cov"}), bases_per_bin)
+        upper_env_df = get_cov_envelope_df(cov_df[["tp", upper_col]].rename(columns={upper_col:"cov"}), bases_per_bin)
+        band_df = pd.DataFrame({"tp":lower_env_df["tp"], "lower":lower_env_df["min"], "upper":upper_env_df["max"]}, columns=["tp","lower","upper"])
+    else:
+        band_df = pd.DataFrame({"tp":cov_df["tp"], "lower":cov_df[lower_col], "upper":cov_df[upper_col]}, columns=["tp","lower","upper"])
+    
+    return band_df
+
+
+def make_group_difference(track, cov_df, group_l, bases_per_bin, setting_dict):
+
+    '''Draw the difference in mean coverage between the 2nd and 1st sample groups, shaded by the sign of the difference. In 
+    level-of-detail mode the difference is reduced to its per-bin min and max (see get_band_df), so a bin in which the sign changes
+    is shaded on both sides of 0.
+    
+    Args:
+        | track (matplotlib.axes.Axes): the axis for this coverage track.
+        | cov_df (DataFrame): contains the coverage data, with a cov_<group> column per group.
+        | group_l (list of strs): sample group names.
+        | bases_per_bin (float): number of bases per pixel bin in level-of-detail mode, or None.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        y_lim_l (list of floats): y axis limits.
+    '''
+    
+    diff_df = pd.DataFrame({"tp":cov_df["tp"], "diff":cov_df["cov_" + group_l[1]] - cov_df["cov_" + group_l[0]]}, columns=["tp","diff"])
+    band_df = get_band_df(diff_df, "diff", "diff", bases_per_bin)
+    color_l = setting_dict["c_track_group_color_l"]
+    track.fill_between(band_df["tp"].tolist(), band_df["upper"], 0, where=(band_df["upper"] >= 0).tolist(), facecolor=color_l[1 % len(color_l)],
+                       edgecolor="none", label="{0} $>$ {1}".format(group_l[1], group_l[0]))
+    track.fill_between(band_df["tp"].tolist(), band_df["lower"], 0, where=(band_df["lower"] < 0).tolist(), facecolor=color_l[0],
+                       edgecolor="none", label="{0} $>$ {1}".format(group_l[0], group_l[1]))
+    track.axhline(0, color="black", linewidth=setting_dict["c_track_group_linewidth"])
+    track.legend(loc="upper right", fontsize=setting_dict["c_track_fontsize"])
+    diff_max = max(band_df["upper"].max(), -band_df["lower"].min())
+    y_lim_l = [-diff_max-10, diff_max+10]
+    
+    return y_lim_l
+
+
+def get_cov_envelope_df(cov_df, bases_per_bin):
+
+    '''Reduce coverage data to per-bin min/max/mean envelopes, where a bin is the number of bases drawn within 1 (or more) pixels.
+    Each bin is represented by 2 points, at its first and last transcript position, so that the max envelope drawn as a filled 
+    area has the same outline as the full-resolution data.
+    
+    Args:
+        | cov_df (DataFrame): contains the coverage data for a contiguous range of transcript positions.
+        | bases_per_bin (float): number of bases per bin.
+    
+    Returns:
+        cov_env_df (DataFrame): contains the columns tp, min, max and mean.
+    '''
+    
+    cov_df = cov_df.sort_values(by="tp")
+    tp_arr, cov_arr = cov_df["tp"].values, cov_df["cov"].values
+    bin_arr = np.floor((tp_arr - tp_arr[0]) / bases_per_bin).astype(np.int64)
+    bin_start_idx_arr = np.flatnonzero(np.concatenate([[True], bin_arr[1:] != bin_arr[:-1]]))
+    bin_end_idx_arr = np.concatenate([bin_start_idx_arr[1:], [len(tp_arr)]]) - 1
+    
+    min_arr = np.minimum.reduceat(cov_arr, bin_start_idx_arr)
+    max_arr = np.maximum.reduceat(cov_arr, bin_start_idx_arr)
+    mean_arr = np.add.reduceat(cov_arr, bin_start_idx_arr) / (bin_end_idx_arr - bin_start_idx_arr + 1)
+    cov_env_df = pd.DataFrame({"tp":np.column_stack([tp_arr[bin_start_idx_arr], tp_arr[bin_end_idx_arr]]).ravel(),
+                               "min":np.repeat(min_arr, 2), "max":np.repeat(max_arr, 2), "mean":np.repeat(mean_arr, 2)},
+                              columns=["tp","min","max","mean"])
+    
+    return cov_env_df
@@ -0,0 +1,292 @@
+import pandas as pd
+import numpy as np
+import tempfile
+import shutil
+import json
+import os
+import threading
+import readers as r
+
+
+'''
+Functions for the columnar coverage store: converting a coverage file into a binary columnar layout, and memory-mapping the
+requested samples for a transcript. The store is a directory which contains one array per sample plus shared position and exon
+arrays, and a meta.json file which records the samples, the exons and the rows occupied by each transcript.
+'''
+
+#Parsed store metadata, indexed by store directory, with the modification time and size of its meta.json.
+cov_store_meta_dict = {}
+cov_store_meta_lock = threading.Lock()
+
+def is_cov_store(cov_path):
+
+    '''Check whether a path is a columnar coverage store.
+
+    Args:
+        cov_path (str): path to a coverage file or store.
+
+    Returns:
+        is_store (bool): whether the path is a columnar coverage store.
+    '''
+
+    is_store = os.path.isdir(cov_path) and os.path.exists(os.path.join(cov_path, "meta.json"))
+
+    return is_store
+
+
+def make_cov_store(cov_file, store_dir, depth_dtype="uint16", chunksize=100000):
+
+    '''Convert a coverage file into a columnar coverage store. The coverage file is streamed in chunks and each column is appended to its
+    own binary file, so memory use is bounded by the chunk size. The store is built in a temporary directory next to store_dir and
+    moved into place only once it is complete, so a failed conversion leaves no partial store behind. An existing store at
+    store_dir is replaced.
+
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | store_dir (str): path to the store directory.
+        | depth_dtype (str): dtype for the per-sample depths. With an integer dtype every depth must be a whole number; use a float
+          dtype such as "float32" for fractional (e.g. normalised) or missing depths, which are then stored as they are.
+        | chunksize (int): number of rows per chunk.
+
+    Returns:
+        meta_dict (dict): the store metadata, or False if a depth does not fit in depth_dtype or store_dir is not a store.
+    '''
+
+    print("Converting coverage file {0} to columnar store {1}...".format(cov_file, store_dir))
+    store_dir = os.path.abspath(store_dir)
+    if os.path.exists(store_dir) and not is_cov_store(store_dir) and (not os.path.isdir(store_dir) or len(os.listdir(store_dir)) > 0):
+        print("ERROR: {0} exists and is not a columnar coverage store.\n".format(store_dir))
+        return False
+    build_dir = tempfile.mkdtemp(prefix=".{0}.".format(os.path.basename(store_dir)), dir=os.path.dirname(store_dir))
+    try:
+        meta_dict = write_cov_store(cov_file, build_dir, depth_dtype, chunksize)
+        if meta_dict == False:
+            return False
+        if is_cov_store(store_dir):
+            shutil.rmtree(store_dir)
+        elif os.path.isdir(store_dir):
+            os.rmdir(store_dir)
+        os.rename(build_dir, store_dir)
+    finally:
+        if os.path.exists(build_dir):
+            shutil.rmtree(build_dir)
+    print("Written columnar store for {0} samples and {1} transcripts to {2}\n".format(len(meta_dict["sample_l"]), len(meta_dict["transcript_dict"]), 
+                                                                                       store_dir))
+
+    return meta_dict
+
+
+def write_cov_store(cov_file, store_dir, depth_dtype="uint16", chunksize=100000):
+
+    '''Write the arrays and metadata of a columnar coverage store (see make_cov_store) into an existing directory.
+
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | store_dir (str): path to the directory.
+        | depth_dtype (str): dtype for the per-sample depths.
+        | chunksize (int): number of rows per chunk.
+
+    Returns:
+        meta_dict (dict): the store metadata, or False if a depth does not fit in depth_dtype.
+    '''
+
+    sample_l = [col for col in pd.read_csv(cov_file, nrows=0).columns
+                if col not in ["chrom","chromStart","chromEnd","name","score","strand","position"]]
+    is_int_dtype = np.issubdtype(np.dtype(depth_dtype), np.integer)
+    depth_max = np.iinfo(depth_dtype).max if is_int_dtype else np.finfo(depth_dtype).max
+    exon_code_dict, transcript_dict = {}, {}
+    num_rows, previous_transcript = 0, None
+
+    fh_dict = dict([(col, open(os.path.join(store_dir, col + ".bin"), "wb")) for col in ["bp","exon"]])
+    for i in range(len(sample_l)):
+        fh_dict[sample_l[i]] = open(os.path.join(store_dir, "sample_{0}.bin".format(i)), "wb")
+
+    try:
+        for cov_df_chunk in pd.read_csv(cov_file, chunksize=chunksize):
+            name_df = cov_df_chunk["name"].str.split(pat=":", expand=True)
+            (cov_df_chunk["chromStart"] + cov_df_chunk["position"]).values.astype(np.int64).tofile(fh_dict["bp"])
+            exon_code_l = [exon_code_dict.setdefault(exon, len(exon_code_dict)) for exon in name_df[2].tolist()]
+            np.array(exon_code_l, dtype=np.int32).tofile(fh_dict["exon"])
+            for sample in sample_l:
+                depth_arr = cov_df_chunk[sample].values.astype(np.float64)
+                if is_int_dtype and (np.isnan(depth_arr).any() or (depth_arr != np.floor(depth_arr)).any()):
+                    print("ERROR: sample {0} has missing or fractional depths, which {1} cannot hold. Use a float depth_dtype such as float32.\n".format(
+                          sample, depth_dtype))
+                    return False
+                if (depth_arr > depth_max).any():
+                    print("ERROR: sample {0} has a depth greater than {1}, the maximum for {2}.\n".format(sample, depth_max, depth_dtype))
+                    return False
+                depth_arr.astype(depth_dtype).tofile(fh_dict[sample])
+
+            #Record the row ranges occupied by each transcript.
+            transcript_l, strand_l = name_df[1].tolist(), cov_df_chunk["strand"].tolist()
+            for j in range(len(transcript_l)):
+                if transcript_l[j] != previous_transcript:
+                    transcript_entry = transcript_dict.setdefault(transcript_l[j], {"strand":strand_l[j], "row_range_l":[]})
+                    transcript_entry["row_range_l"].append([num_rows + j, num_rows + j])
+                    previous_transcript = transcript_l[j]
+                transcript_dict[previous_transcript]["row_range_l"][-1][1] = num_rows + j + 1
+            num_rows += len(transcript_l)
+    finally:
+        for fh in fh_dict.values():
+            fh.close()
+
+    exon_l = sorted(exon_code_dict, key=exon_code_dict.get)
+    meta_dict = {"sample_l":sample_l, "depth_dtype":depth_dtype, "num_rows":num_rows, "exon_l":exon_l, "transcript_dict":transcript_dict}
+    with open(os.path.join(store_dir, "meta.json"), "w") as meta_fh:
+        json.dump(meta_dict, meta_fh)
+
+    return meta_dict
+
+
+def get_cov_store_meta_dict(store_dir):
+
+    '''Read the metadata of a columnar coverage store. The parsed metadata is kept for the life of the process and reused until
+    meta.json is modified, so that each query does not re-parse it. The exon IDs are also kept as an array (exon_arr), which the exon
+    codes of a query's rows index, and the position of each sample (sample_idx_dict). The metadata is shared between queries, so it must not be modified.
+
+    Args:
+        store_dir (str): path to the store directory.
+
+    Returns:
+        meta_dict (dict): the store metadata.
+    '''
+
+    meta_file = os.path.join(store_dir, "meta.json")
+    meta_stat = os.stat(meta_file)
+    key, version = os.path.abspath(store_dir), (meta_stat.st_mtime, meta_stat.st_size)
+    with cov_store_meta_lock:
+        if key in cov_store_meta_dict and cov_store_meta_dict[key][0] == version:
+            return cov_store_meta_dict[key][1]
+
+    with open(meta_file) as meta_fh:
+        meta_dict = json.load(meta_fh)
+    meta_dict["exon_arr"] = np.array(meta_dict["exon_l"], dtype=object)
+    meta_dict["sample_idx_dict"] = dict(zip(meta_dict["sample_l"], range(len(meta_dict["sample_l"]))))
+    with cov_store_meta_lock:
+        cov_store_meta_dict[key] = (version, meta_dict)
+
+    return meta_dict
+
+
+def get_cov_store_array(store_dir, meta_dict, col):
+
+    '''Memory-map one column of a columnar coverage store.
+
+    Args:
+        | store_dir (str): path to the store directory.
+        | meta_dict (dict): the store metadata.
+        | col (str): "bp", "exon" or a sample ID.
+
+    Returns:
+        col_arr (numpy.memmap): the memory-mapped column.
+    '''
+
+    if col == "bp":
+        file_name, dtype = "bp.bin", np.int64
+    elif col == "exon":
+        file_name, dtype = "exon.bin", np.int32
+    else:
+        file_name, dtype = "sample_{0}.bin".format(meta_dict["sample_idx_dict"][col]), meta_dict["depth_dtype"]
+    if meta_dict["num_rows"] == 0:
+        return np.array([], dtype=dtype)
+    col_arr = np.memmap(os.path.join(store_dir, file_name), dtype=dtype, mode="r", shape=(meta_dict["num_rows"],))
+
+    return col_arr
+
+
+def get_cov_df_from_store(store_dir, transcript, sample_l, bp_start=None, bp_end=None, envelope=False):
+
+    '''Get the coverage data for a transcript from a columnar coverage store. Only the requested samples are memory-mapped and only
+    the transcript's rows of each are touched. The mean coverage is accumulated directly over the mapped arrays. If bp_start and
+    bp_end are given, only the rows in that window are read from the sample arrays. If sample_l is a dictionary of sample groups,
+    each sample is read once and the group means (and envelopes) are accumulated in the same pass.
+
+    Args:
+        | store_dir (str): path to the store directory.
+        | transcript (str): Ensembl transcript ID.
+        | sample_l (list of strs or dict): list of sample IDs, or lists of sample IDs indexed by group name.
+        | bp_start (int): base pair start coordinate.
+        | bp_end (int): base pair end coordinate.
+        | envelope (bool): whether to add the min and max envelope of each sample group.
+
+    Returns:
+        cov_df (DataFrame): contains the coverage data, in the same form as coverage.get_cov_df.
+    '''
+
+    meta_dict = get_cov_store_meta_dict(store_dir)
+    group_col_l = []
+    if isinstance(sample_l, dict):
+        for group in sample_l:
+            group_col_l.extend(["cov_" + group] + (["min_" + group, "max_" + group] if envelope == True else []))
+    if transcript not in meta_dict["transcript_dict"]:
+        r.report("WARNING: no coverage data for {0}".format(transcript))
+        return pd.DataFrame([], columns=["strand","cov","exon"] + group_col_l + ["bp","tp"])
+    transcript_entry = meta_dict["transcript_dict"][transcript]
+    row_range_l = transcript_entry["row_range_l"]
+
+    #Use a slice (a view of the memory map) when the transcript is stored in 1 block of rows sorted by position.
+    bp_arr = get_cov_store_array(store_dir, meta_dict, "bp")
+    if len(row_range_l) == 1 and np.all(np.diff(bp_arr[row_range_l[0][0]:row_range_l[0][1]]) >= 0):
+        row_idx = slice(row_range_l[0][0], row_range_l[0][1])
+        if bp_start != None and bp_end != None:
+            window_start = np.searchsorted(bp_arr[row_idx], bp_start, side="left")
+            window_end = np.searchsorted(bp_arr[row_idx], bp_end, side="right")
+            row_idx = slice(row_range_l[0][0] + window_start, row_range_l[0][0] + window_end)
+    else:
+        row_idx = np.concatenate([np.arange(row_range[0], row_range[1]) for row_range in row_range_l])
+        row_idx = row_idx[np.argsort(bp_arr[row_idx], kind="mergesort")]
+        if bp_start != None and bp_end != None:
+            row_idx = row_idx[(bp_arr[row_idx] >= bp_start) & (bp_arr[row_idx] <= bp_end)]
+    bp_arr = np.asarray(bp_arr[row_idx])
+
+    sample_group_dict = sample_l if isinstance(sample_l, dict) else {"":sample_l}
+    group_arr_dict = dict([(group, get_group_cov_arr_l(store_dir, meta_dict, row_idx, len(bp_arr), sample_group_dict[group]))
+                           for group in sample_group_dict])
+    cov_arr = group_arr_dict[list(sample_group_dict)[0]][0]
+
+    exon_arr = meta_dict["exon_arr"][get_cov_store_array(store_dir, meta_dict, "exon")[row_idx]]
+    tp_arr = np.arange(1, len(bp_arr)+1)
+    if transcript_entry["strand"] == "-":
+        tp_arr = tp_arr[::-1]
+    cov_df = pd.DataFrame({"strand":transcript_entry["strand"], "cov":cov_arr, "exon":exon_arr, "bp":bp_arr, "tp":tp_arr},
+                          columns=["strand","cov","exon","bp","tp"])
+    if isinstance(sample_l, dict):
+        for group in sample_group_dict:
+            cov_df["cov_" + group] = group_arr_dict[group][0]
+            if envelope == True:
+                cov_df["min_" + group], cov_df["max_" + group] = group_arr_dict[group][1], group_arr_dict[group][2]
+        cov_df = cov_df[["strand","cov","exon"] + group_col_l + ["bp","tp"]]
+
+    return cov_df
+
+
+def get_group_cov_arr_l(store_dir, meta_dict, row_idx, num_rows, sample_l):
+
+    '''Accumulate the mean, min and max coverage of a group of samples over their memory-mapped arrays. Missing depths (NaN, in a
+    store with a float depth dtype) are skipped, as pandas skips them when reading a coverage file.
+
+    Args:
+        | store_dir (str): path to the store directory.
+        | meta_dict (dict): the store metadata.
+        | row_idx (slice or numpy.ndarray): the rows to read.
+        | num_rows (int): the number of rows selected by row_idx.
+        | sample_l (list of strs): list of sample IDs.
+
+    Returns:
+        group_cov_arr_l (list of numpy.ndarrays): the mean, min and max coverage (all NaN if sample_l is empty).
+    '''
+
+    sum_arr, count_arr = np.zeros(num_rows, dtype=np.float64), np.zeros(num_rows, dtype=np.int64)
+    min_arr, max_arr = np.full(num_rows, np.nan), np.full(num_rows, np.nan)
+    for sample in sample_l:
+        depth_arr = np.asarray(get_cov_store_array(store_dir, meta_dict, sample)[row_idx], dtype=np.float64)
+        is_depth_arr = ~np.isnan(depth_arr)
+        sum_arr += np.where(is_depth_arr, depth_arr, 0)
+        count_arr += is_depth_arr
+        min_arr, max_arr = np.fmin(min_arr, depth_arr), np.fmax(max_arr, depth_arr)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_arr = np.where(count_arr > 0, sum_arr / count_arr, np.nan)
+    group_cov_arr_l = [mean_arr, min_arr, max_arr]
+
+    return group_cov_arr_l
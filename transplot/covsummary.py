@@ -0,0 +1,103 @@
+import pandas as pd
+import numpy as np
+import coverage as c
+
+
+'''
+Functions for summarising coverage: per-transcript QC statistics computed in 1 streaming pass over a coverage file.
+'''
+
+def get_cov_summary_df(cov_file, sample_l, sample_group_dict, thresh_l, transcript_l=None, chunksize=100000):
+
+    '''Get per-transcript coverage summary statistics for each sample and each sample group. The coverage file is streamed once with
+    coverage.get_transcript_cov_df_chunker, and the statistics for each transcript are computed with vectorized reductions over a
+    (bases x samples) depth array as soon as its rows have been read. The depth of a sample group at each base is the mean depth
+    of its samples.
+
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | sample_l (list of strs): list of sample IDs, or None for every sample in the coverage file.
+        | sample_group_dict (dict): lists of sample IDs indexed by group name.
+        | thresh_l (list of ints): depth thresholds, e.g. [10,20,30].
+        | transcript_l (list of strs): Ensembl transcript IDs, or None for every transcript.
+        | chunksize (int): number of rows to read at a time.
+
+    Returns:
+        cov_summary_df (DataFrame): tidy table with the columns transcript, level (sample or group), id, exon, metric and value.
+        The exon is "all" for the transcript-level metrics mean, median and pct_ge_<thresh>x, and the exon ID for the metric min.
+    '''
+
+    print("Summarising coverage in {0}...".format(cov_file))
+    if sample_l == None:
+        sample_l = [col for col in pd.read_csv(cov_file, nrows=0).columns
+                    if col not in ["chrom","chromStart","chromEnd","name","score","strand","position"]]
+    read_sample_l = []
+    for sample in list(sample_l) + [sample for group in sample_group_dict for sample in sample_group_dict[group]]:
+        if sample not in read_sample_l:
+            read_sample_l.append(sample)
+    level_l = ["sample"]*len(sample_l) + ["group"]*len(sample_group_dict)
+    id_l = list(sample_l) + list(sample_group_dict)
+    metric_l = ["mean","median"] + ["pct_ge_{0}x".format(thresh) for thresh in thresh_l]
+
+    cov_summary_df_l = []
+    for transcript, cov_df in c.get_transcript_cov_df_chunker(cov_file, transcript_l, read_sample_l, chunksize):
+        depth_arr = get_summary_depth_arr(cov_df, sample_l, sample_group_dict)
+
+        #Transcript-level metrics: 1 row per metric per column of depth_arr.
+        metric_arr = np.vstack([depth_arr.mean(axis=0), np.median(depth_arr, axis=0)] +
+                               [100.0*(depth_arr >= thresh).mean(axis=0) for thresh in thresh_l])
+        cov_summary_df_l.append(pd.DataFrame({"transcript":transcript, "level":np.tile(level_l, len(metric_l)), "id":np.tile(id_l, len(metric_l)),
+                                              "exon":"all", "metric":np.repeat(metric_l, len(id_l)), "value":metric_arr.ravel()}))
+
+        #Per-exon minimums: cov_df is sorted by bp so each exon's rows are contiguous.
+        exon_arr = cov_df["exon"].values
+        exon_start_idx_arr = np.flatnonzero(np.concatenate([[True], exon_arr[1:] != exon_arr[:-1]]))
+        exon_min_arr = np.minimum.reduceat(depth_arr, exon_start_idx_arr, axis=0)
+        cov_summary_df_l.append(pd.DataFrame({"transcript":transcript, "level":np.tile(level_l, len(exon_start_idx_arr)),
+                                              "id":np.tile(id_l, len(exon_start_idx_arr)), "exon":np.repeat(exon_arr[exon_start_idx_arr], len(id_l)),
+                                              "metric":"min", "value":exon_min_arr.ravel()}))
+
+    cov_summary_df = pd.concat(cov_summary_df_l, ignore_index=True) if len(cov_summary_df_l) > 0 else pd.DataFrame([])
+    cov_summary_df = cov_summary_df.reindex(columns=["transcript","level","id","exon","metric","value"])
+
+    return cov_summary_df
+
+
+def get_summary_depth_arr(cov_df, sample_l, sample_group_dict):
+
+    '''Get the (bases x samples + groups) depth array for a transcript.
+
+    Args:
+        | cov_df (DataFrame): contains the coverage data for a transcript, with a column per sample.
+        | sample_l (list of strs): list of sample IDs.
+        | sample_group_dict (dict): lists of sample IDs indexed by group name.
+
+    Returns:
+        depth_arr (numpy.ndarray): depth of each sample, then the mean depth of each group, at each base.
+    '''
+
+    depth_arr_l = [cov_df[list(sample_l)].values.astype(np.float64)]
+    for group in sample_group_dict:
+        depth_arr_l.append(cov_df[sample_group_dict[group]].values.astype(np.float64).mean(axis=1).reshape(-1,1))
+    depth_arr = np.hstack(depth_arr_l)
+
+    return depth_arr
+
+
+def make_cov_summary_file(cov_file, sample_l, sample_group_dict, thresh_l, transcript_l, out_path, chunksize=100000):
+
+    '''Write per-transcript coverage summary statistics to a csv file.
+
+    Args:
+        | cov_file (str): path to file containing the coverage data.
+        | sample_l (list of strs): list of sample IDs, or None for every sample in the coverage file.
+        | sample_group_dict (dict): lists of sample IDs indexed by group name.
+        | thresh_l (list of ints): depth thresholds.
+        | transcript_l (list of strs): Ensembl transcript IDs, or None for every transcript.
+        | out_path (str): path to write the summary file to.
+        | chunksize (int): number of rows to read at a time.
+    '''
+
+    cov_summary_df = get_cov_summary_df(cov_file, sample_l, sample_group_dict, thresh_l, transcript_l, chunksize)
+    cov_summary_df.to_csv(out_path, index=False)
+    print("Written coverage summary to {0}\n".format(out_path))
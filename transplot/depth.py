@@ -0,0 +1,168 @@
+import pandas as pd
+import numpy as np
+import gzip
+import os
+import coverage as c
+import readers as r
+
+
+'''
+Functions for reading per-base depth files directly: samtools depth output and mosdepth per-base (run-length) BED files. The
+depths are streamed in chunks and intersected with the exon coordinates on the fly, so no intermediate coverage csv is needed.
+'''
+
+def get_depth_format(depth_file):
+
+    '''Get the format of a depth file from its name.
+
+    Args:
+        depth_file (str): path to a coverage or depth file.
+
+    Returns:
+        depth_format (str): "mosdepth" for a (gzipped) BED file, "samtools" for a (gzipped) .depth or .depth.txt file, or None for
+        a coverage csv file or columnar store.
+    '''
+
+    depth_format = None
+    file_name = os.path.basename(depth_file)
+    if file_name.endswith(".gz"):
+        file_name = file_name[:-3]
+    if file_name.endswith(".bed"):
+        depth_format = "mosdepth"
+    elif file_name.endswith(".depth") or file_name.endswith(".depth.txt"):
+        depth_format = "samtools"
+
+    return depth_format
+
+
+def get_exon_base_df(exon_coord_df):
+
+    '''Get the base pair coordinate, exon and transcript position of every exonic base, sorted by base pair.
+
+    Args:
+        exon_coord_df (DataFrame): contains the exon base pair and transcript position coordinates.
+
+    Returns:
+        exon_base_df (DataFrame): contains the columns bp, exon and tp.
+    '''
+
+    lo_bp_arr = exon_coord_df[["start_bp","end_bp"]].min(axis=1).values
+    hi_bp_arr = exon_coord_df[["start_bp","end_bp"]].max(axis=1).values
+    exon_len_arr = hi_bp_arr - lo_bp_arr + 1
+    lo_tp_arr = exon_coord_df[["start_tp","end_tp"]].min(axis=1).values
+    strand = "+" if (exon_coord_df["end_bp"] >= exon_coord_df["start_bp"]).all() else "-"
+
+    offset_arr = np.arange(exon_len_arr.sum()) - np.repeat(np.cumsum(exon_len_arr) - exon_len_arr, exon_len_arr)
+    bp_arr = np.repeat(lo_bp_arr, exon_len_arr) + offset_arr
+    if strand == "+":
+        tp_arr = np.repeat(lo_tp_arr, exon_len_arr) + offset_arr
+    else:
+        tp_arr = np.repeat(lo_tp_arr + exon_len_arr - 1, exon_len_arr) - offset_arr
+    exon_base_df = pd.DataFrame({"bp":bp_arr, "exon":np.repeat(exon_coord_df.index.values, exon_len_arr), "tp":tp_arr},
+                                columns=["bp","exon","tp"])
+    exon_base_df.sort_values(by="bp", inplace=True)
+    exon_base_df.index = range(len(exon_base_df.index))
+
+    return exon_base_df
+
+
+def get_depth_df_chunker(depth_file, depth_format, chunksize):
+
+    '''Read a depth file in chunks with uniform column names: chrom, start (0-based), end and 1 column per sample.
+
+    Args:
+        | depth_file (str): path to the depth file, which may be gzipped.
+        | depth_format (str): "samtools" or "mosdepth".
+        | chunksize (int): number of rows per chunk.
+
+    Returns:
+        depth_df_chunk (generator of DataFrames): chunks of the depth file.
+    '''
+
+    if depth_format == "mosdepth":
+        name_l = ["chrom","start","end",os.path.basename(depth_file).split(".")[0]]
+        depth_df_chunker = pd.read_csv(depth_file, sep="\t", header=None, names=name_l, dtype={"chrom":str}, chunksize=chunksize)
+    else:
+        #samtools depth -H writes a header line, e.g. #CHROM POS sample1.bam sample2.bam.
+        open_func = gzip.open if depth_file.endswith(".gz") else open
+        with open_func(depth_file, "rt") as depth_fh:
+            first_line = depth_fh.readline().rstrip("\n")
+        if first_line.startswith("#"):
+            name_l, skiprows = ["chrom","pos"] + first_line.split("\t")[2:], 1
+        else:
+            name_l, skiprows = ["chrom","pos"] + ["sample_{0}".format(i+1) for i in range(len(first_line.split("\t"))-2)], 0
+        depth_df_chunker = pd.read_csv(depth_file, sep="\t", header=None, names=name_l, skiprows=skiprows, dtype={"chrom":str}, chunksize=chunksize)
+
+    for depth_df_chunk in depth_df_chunker:
+        if depth_format == "samtools":
+            depth_df_chunk.insert(1, "start", depth_df_chunk["pos"] - 1)
+            depth_df_chunk.rename(columns={"pos":"end"}, inplace=True)
+        yield depth_df_chunk
+
+
+def get_cov_df_from_depth(depth_file, depth_format, exon_coord_df, chrom, bp_start, bp_end, sample_l, envelope=False, chunksize=100000):
+
+    '''Get the coverage data for a transcript from a samtools depth or mosdepth per-base BED file. Each chunk is restricted to the
+    chromosome and the transcript's span, and each depth record (a single base for samtools, a run of bases for mosdepth) is
+    intersected with the exonic bases by a sorted search. Exonic bases without a record (e.g. samtools depth without -a) get a depth
+    of 0. Reading stops once the stream has passed the transcript, so the file should be sorted. tp is taken from the exon coordinates.
+
+    Args:
+        | depth_file (str): path to the depth file.
+        | depth_format (str): "samtools" or "mosdepth".
+        | exon_coord_df (DataFrame): contains the exon base pair and transcript position coordinates.
+        | chrom (str): chromosome of the transcript, or None if the file contains 1 chromosome.
+        | bp_start (int): base pair start coordinate, or None.
+        | bp_end (int): base pair end coordinate, or None.
+        | sample_l (list of strs or dict): list of sample IDs (samtools depth -H column names, or sample_1, sample_2... without a header),
+          or lists of sample IDs indexed by group name. An empty list means every sample in the file.
+        | envelope (bool): whether to add the min and max envelope of each sample group.
+        | chunksize (int): number of rows per chunk.
+
+    Returns:
+        cov_df (DataFrame): contains the coverage data, in the same form as coverage.get_cov_df.
+    '''
+
+    r.report("Reading in {0} depth data from {1}...".format(depth_format, depth_file))
+    exon_base_df = get_exon_base_df(exon_coord_df)
+    if bp_start != None and bp_end != None:
+        exon_base_df = exon_base_df[(exon_base_df["bp"] >= bp_start) & (exon_base_df["bp"] <= bp_end)]
+        exon_base_df.index = range(len(exon_base_df.index))
+    exon_bp_arr = exon_base_df["bp"].values
+    strand = "+" if (exon_coord_df["end_bp"] >= exon_coord_df["start_bp"]).all() else "-"
+
+    depth_arr, depth_col_l, chrom_seen = None, None, False
+    for depth_df_chunk in get_depth_df_chunker(depth_file, depth_format, chunksize):
+        if depth_arr is None:
+            depth_col_l = list(depth_df_chunk.columns[3:])
+            depth_arr = np.zeros((len(exon_bp_arr), len(depth_col_l)), dtype=np.float64)
+        if chrom != None:
+            chrom_mask_arr = (depth_df_chunk["chrom"] == str(chrom)).values
+            if chrom_seen and not chrom_mask_arr.any():
+                break
+            chrom_seen = chrom_seen or chrom_mask_arr.any()
+            depth_df_chunk = depth_df_chunk[chrom_mask_arr]
+        if len(depth_df_chunk.index) == 0 or len(exon_bp_arr) == 0:
+            continue
+
+        #Find the exonic bases covered by each record: those with start < bp <= end.
+        start_idx_arr = np.searchsorted(exon_bp_arr, depth_df_chunk["start"].values, side="right")
+        end_idx_arr = np.searchsorted(exon_bp_arr, depth_df_chunk["end"].values, side="right")
+        count_arr = end_idx_arr - start_idx_arr
+        base_idx_arr = np.repeat(start_idx_arr, count_arr) + np.arange(count_arr.sum()) - np.repeat(np.cumsum(count_arr) - count_arr, count_arr)
+        depth_arr[base_idx_arr] = np.repeat(depth_df_chunk[depth_col_l].values, count_arr, axis=0)
+        if depth_df_chunk["start"].iloc[-1] >= exon_bp_arr[-1]:
+            break
+
+    cov_df = pd.DataFrame(depth_arr if depth_arr is not None else np.zeros((len(exon_bp_arr), 0)), columns=depth_col_l or [])
+    if isinstance(sample_l, dict):
+        cov_df = c.add_group_cov_cols(cov_df, sample_l, envelope)
+    else:
+        cov_df["cov"] = cov_df[list(sample_l) if len(sample_l) > 0 else depth_col_l].mean(axis=1)
+    cov_df.insert(0, "strand", strand)
+    cov_df["exon"] = exon_base_df["exon"].values
+    cov_df["bp"], cov_df["tp"] = exon_bp_arr, exon_base_df["tp"].values
+    group_col_l = c.get_group_col_l(sample_l, envelope) if isinstance(sample_l, dict) else []
+    cov_df = cov_df[["strand","cov","exon"] + group_col_l + ["bp","tp"]]
+
+    return cov_df
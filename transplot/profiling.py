@@ -0,0 +1,140 @@
+import pandas as pd
+import threading
+import json
+import time
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+'''
+Functions for opt-in instrumentation of make_png: the wall time, CPU time and peak memory of each stage (reading each input, mapping
+base pairs to transcript positions, drawing each track, layout and saving). Stages are timed as laps: starting a stage ends the
+previous one. Peak memory is measured with tracemalloc, which is only started when a report is requested as it slows allocation.
+
+The CPU time and peak memory of a stage are process-wide: they include the work of the thread pool which reads the next inputs while
+the stage runs, so they are upper bounds for the stage itself. tracemalloc has a single peak per process, so only 1 timer at a time
+measures memory; a png timed while another is being timed in the same process (e.g. by make_png calls on several threads) gets no
+peak_mb.
+'''
+
+get_cpu_time = time.process_time if hasattr(time, "process_time") else time.clock
+#The timer which owns the tracemalloc peak, if any.
+memory_timer_l = []
+memory_timer_lock = threading.Lock()
+
+
+def start_stage_timer(stage_report_l, png_file):
+
+    '''Start timing the stages of a png. Only 1 timer at a time in a process measures peak memory, as tracemalloc has a single
+    peak, so a timer started while another is active records a peak_mb of None for each stage.
+
+    Args:
+        | stage_report_l (list): list to append 1 dict per stage to, or None to disable timing.
+        | png_file (str): path of the png, recorded in each stage.
+
+    Returns:
+        stage_timer_dict (dict): the timer state, or None if timing is disabled.
+    '''
+
+    if stage_report_l == None:
+        return None
+    stage_timer_dict = {"stage_report_l":stage_report_l, "png_file":png_file, "stage_dict":None, "measure_memory":False,
+                        "started_tracemalloc":False}
+    if tracemalloc != None:
+        with memory_timer_lock:
+            if len(memory_timer_l) == 0:
+                memory_timer_l.append(stage_timer_dict)
+                stage_timer_dict["measure_memory"] = True
+        if stage_timer_dict["measure_memory"]:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                stage_timer_dict["started_tracemalloc"] = True
+        else:
+            print("WARNING: another png is being timed in this process, so the peak memory of {0} is not measured.".format(png_file))
+
+    return stage_timer_dict
+
+
+def start_stage(stage_timer_dict, transcript, stage):
+
+    '''End the current stage, if any, and start a new one.
+
+    Args:
+        | stage_timer_dict (dict): the timer state, or None if timing is disabled.
+        | transcript (str): Ensembl transcript ID, or None for stages of the whole png (e.g. layout and savefig).
+        | stage (str): stage name, e.g. read_coverage or draw_variants.
+    '''
+
+    if stage_timer_dict == None:
+        return
+    end_stage(stage_timer_dict)
+    base_bytes = 0
+    if stage_timer_dict["measure_memory"] and tracemalloc.is_tracing():
+        if hasattr(tracemalloc, "reset_peak"):
+            base_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.clear_traces()
+    stage_timer_dict["stage_dict"] = {"transcript":transcript, "stage":stage, "base_bytes":base_bytes,
+                                      "wall_start":time.time(), "cpu_start":get_cpu_time()}
+
+
+def end_stage(stage_timer_dict):
+
+    '''End the current stage, if any, and append its measurements to the report.
+
+    Args:
+        stage_timer_dict (dict): the timer state, or None if timing is disabled.
+    '''
+
+    if stage_timer_dict == None or stage_timer_dict["stage_dict"] == None:
+        return
+    stage_dict = stage_timer_dict["stage_dict"]
+    peak_mb = None
+    #tracemalloc may have been stopped by other code during the stage, in which case the peak is unknown.
+    if stage_timer_dict["measure_memory"] and tracemalloc.is_tracing():
+        peak_mb = round((tracemalloc.get_traced_memory()[1] - stage_dict["base_bytes"])/(1024.0*1024.0), 3)
+    stage_timer_dict["stage_report_l"].append({"png_file":stage_timer_dict["png_file"], "transcript":stage_dict["transcript"] or "",
+                                               "stage":stage_dict["stage"], "wall_s":round(time.time() - stage_dict["wall_start"], 6),
+                                               "cpu_s":round(get_cpu_time() - stage_dict["cpu_start"], 6), "peak_mb":peak_mb})
+    stage_timer_dict["stage_dict"] = None
+
+
+def stop_stage_timer(stage_timer_dict):
+
+    '''End the current stage, stop tracemalloc if it was started by start_stage_timer, and let another timer measure memory.
+
+    Args:
+        stage_timer_dict (dict): the timer state, or None if timing is disabled.
+    '''
+
+    if stage_timer_dict == None:
+        return
+    end_stage(stage_timer_dict)
+    if stage_timer_dict["started_tracemalloc"]:
+        tracemalloc.stop()
+        stage_timer_dict["started_tracemalloc"] = False
+    if stage_timer_dict["measure_memory"]:
+        with memory_timer_lock:
+            memory_timer_l.remove(stage_timer_dict)
+        stage_timer_dict["measure_memory"] = False
+
+
+def write_stage_report(stage_report_l, out_path):
+
+    '''Write a stage report to a json file (if out_path ends with .json) or a csv file. cpu_s and peak_mb are process-wide, so they
+    include the reads of later inputs which overlap a stage, and peak_mb is empty for pngs timed while another was (see start_stage_timer).
+
+    Args:
+        | stage_report_l (list of dicts): the stages, as filled in by make_png.
+        | out_path (str): path to write the report to.
+    '''
+
+    if out_path.endswith(".json"):
+        with open(out_path, "w") as out_fh:
+            json.dump(stage_report_l, out_fh, indent=1)
+    else:
+        pd.DataFrame(stage_report_l, columns=["png_file","transcript","stage","wall_s","cpu_s","peak_mb"]).to_csv(out_path, index=False)
+    print("Written stage report to {0}\n".format(out_path))
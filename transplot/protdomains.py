@@ -1,16 +1,23 @@
 import pandas as pd
 import matplotlib as mpl
-import matplotlib.pyplot as plt
+import matplotlib.artist
+import matplotlib.cm
+import matplotlib.colorbar
+import matplotlib.colors
+import matplotlib.patches
 import sys
 #import random
 import numpy as np
+import window as w
+import readers as r
+import textmode as tm
 
 
 '''
 Functions specific to protein domains: reading in the protein domains and creating a protein domains track.
 '''
 
-def get_protein_domain_df(protein_domain_file, transcript_l, database, sortby_col_l):
+def get_protein_domain_df(protein_domain_file, transcript_l, database, sortby_col_l, chunksize=1000):
 
     '''Read the protein domain information from a tsv file into a DataFrame.
     
@@ -19,17 +26,21 @@ def get_protein_domain_df(protein_domain_file, transcript_l, database, sortby_co
         | transcript_l (list of strs): list of Ensembl transcript IDs.
         | database (str): protein domain database.
         | sortby_col_l (list of strs): columns to sort the DataFrame by.
+        | chunksize (int): number of rows to read at a time.
     
     Returns:
         protein_domain_df (DataFrame): contains the protein domain information.
     '''
 
-    protein_domain_df = pd.DataFrame([])
-    protein_domain_df_chunker = pd.read_csv(protein_domain_file, sep="\t", chunksize=1000)
-    for protein_domain_df_chunk in protein_domain_df_chunker:
-        protein_domain_df_chunk = protein_domain_df_chunk[["TranscriptID","Length","DomainID","Start","End","Domain_type","name","UniprotID"]]
-        protein_domain_df_chunk = protein_domain_df_chunk[(protein_domain_df_chunk["TranscriptID"].isin(transcript_l)) & (protein_domain_df_chunk["Domain_type"]==database)]
-        protein_domain_df = pd.concat([protein_domain_df, protein_domain_df_chunk], ignore_index=True)
+    protein_domain_col_l = ["TranscriptID","Length","DomainID","Start","End","Domain_type","name","UniprotID"]
+    protein_domain_dtype_dict = {"TranscriptID":"category", "Length":"int32", "DomainID":str, "Start":"int32", "End":"int32",
+                                 "Domain_type":"category", "name":str, "UniprotID":str}
+    filter_func = lambda protein_domain_df_chunk: protein_domain_df_chunk[(protein_domain_df_chunk["TranscriptID"].isin(transcript_l)) & 
+                                                                          (protein_domain_df_chunk["Domain_type"]==database)]
+    protein_domain_df = r.read_filtered_csv(protein_domain_file, filter_func, chunksize, usecols=protein_domain_col_l, 
+                                            dtype=protein_domain_dtype_dict, sep="\t")
+    protein_domain_df = protein_domain_df[protein_domain_col_l]
+    protein_domain_df[["TranscriptID","Domain_type"]] = protein_domain_df[["TranscriptID","Domain_type"]].astype(str)
     
     protein_domain_df.sort_values(by=sortby_col_l, inplace=True)
 
@@ -64,7 +75,27 @@ def get_protein_domain_color_s(protein_domain_df):
     return protein_domain_color_s
 
 
-def make_track(track, protein_domain_df, utr_df, protein_domain_color_s, setting_dict, variant_track):
+def get_protein_domain_color_s_from_file(protein_domain_color_file):
+
+    '''Read a protein domain color file made by transplotter.make_protein_domain_color_file.
+    
+    Args:
+        protein_domain_color_file (str): path to the protein domain color file.
+    
+    Returns:
+        protein_domain_color_s (Series): contains colors indexed by protein domain. Colors stored as comma-separated RGB(A) values
+        are converted to tuples of floats.
+    '''
+
+    protein_domain_color_df = pd.read_csv(protein_domain_color_file, header=None, names=["Domain", "Color"], index_col="Domain")
+    protein_domain_color_s = pd.Series(data=protein_domain_color_df["Color"], index=protein_domain_color_df.index)
+    del protein_domain_color_df
+    protein_domain_color_s = protein_domain_color_s.apply(lambda x: x if "," not in x else tuple([float(f) for f in x.split(",")]))
+
+    return protein_domain_color_s
+
+
+def make_track(track, protein_domain_df, utr_df, protein_domain_color_s, setting_dict, variant_track, tp_window_l=None):
 
     '''Make the protein domain track.
     
@@ -74,7 +105,8 @@ def make_track(track, protein_domain_df, utr_df, protein_domain_color_s, setting
         | utr_df (DataFrame): contains the utr information.
         | protein_domain_color_s (Series): colors indexed by protein domain IDs.
         | setting_dict (dictionary): settings for making the png.
-        | variants_track (matplotlib.axes.Axes): axis for the variant track.'''
+        | variants_track (matplotlib.axes.Axes): axis for the variant track.
+        | tp_window_l (list of ints): first and last transcript positions to show, or None for the whole transcript.'''
 
     #Work out the protein domain start and end transcript positions.
     protein_domain_df["start_tp_pc"] = (protein_domain_df["Start"]/protein_domain_df["Length"]).astype(float)
@@ -89,13 +121,17 @@ def make_track(track, protein_domain_df, utr_df, protein_domain_color_s, setting
     #Make the colorbar.
     [protein_domain_bound_l, bound_l, color_l] = get_bound_color_ls_for_cb(protein_domain_df, utr_df, protein_domain_color_s, 
                                                                            setting_dict["pd_track_stripe_min_bases"])
+    if tp_window_l != None:
+        [bound_l, color_l] = w.get_window_bound_color_ll(bound_l, [color_l], tp_window_l[0], tp_window_l[1])
+        protein_domain_bound_l = [bound - w.get_window_tp_offset(tp_window_l) for bound in protein_domain_bound_l if tp_window_l[0] <= bound <= tp_window_l[1]]
+        transcript_len = w.get_window_len(tp_window_l)
+        protein_domain_df = protein_domain_df[(protein_domain_df["end_tp"] >= tp_window_l[0]) & (protein_domain_df["start_tp"] <= tp_window_l[1])]
     cmap = mpl.colors.ListedColormap(color_l)
     norm = mpl.colors.BoundaryNorm(bound_l, cmap.N)
     cb = mpl.colorbar.ColorbarBase(track, cmap=cmap, norm=norm, boundaries=bound_l,
                                    spacing='proportional', orientation='horizontal', ticks=[], drawedges=False)#, alpha=0.5)
-    plt.setp(track.get_yticklabels(),visible=False)
-    plt.rc('text',usetex=True)
-    track.set_ylabel(setting_dict["pd_track_y_label"], rotation='horizontal', ha='right', va=setting_dict["pd_track_y_label_va"],
+    mpl.artist.setp(track.get_yticklabels(),visible=False)
+    track.set_ylabel(tm.get_text(setting_dict["pd_track_y_label"], setting_dict["text_mode"]), rotation='horizontal', ha='right', va=setting_dict["pd_track_y_label_va"],
                      position=(setting_dict["pd_track_y_label_x"], setting_dict["pd_track_y_label_y"]), size=setting_dict["pd_track_y_label_fontsize"])
 
     #Make the protein domain track legend.
@@ -360,8 +396,8 @@ def set_colorbar_ticks(track, bound_l, transcript_len, top_or_bottom, markersize
     for i in range(len(bound_l)):
         bound_l[i] = float(bound_l[i]-1)/float(transcript_len-1) #This assumes the xlim is (1, transcript_length).
     
-    plt.setp(track.xaxis.get_ticklines(),'markersize', markersize)
-    plt.setp(track.xaxis.get_ticklines(),'markeredgewidth', markeredgewidth)
+    mpl.artist.setp(track.xaxis.get_ticklines(),'markersize', markersize)
+    mpl.artist.setp(track.xaxis.get_ticklines(),'markeredgewidth', markeredgewidth)
         
     track.xaxis.set_ticks(bound_l)
     track.xaxis.set_ticks_position(top_or_bottom)
@@ -0,0 +1,137 @@
+import pandas as pd
+import multiprocessing.pool
+import threading
+import atexit
+import os
+
+
+'''
+Functions shared by the input loaders: reading a delimited file in chunks with column projection, compact dtypes and a per-chunk
+filter, then concatenating the filtered chunks once, and the thread pool on which make_png reads its inputs concurrently. The loaders
+report their messages with report, which keeps the messages of a read on the thread pool with the read, to be printed when its result
+is collected, so that the messages of concurrent reads are not interleaved.
+'''
+
+read_thread_pool_dict = {}
+read_thread_pool_lock = threading.Lock()
+#The messages of the read running on each thread, or None outside a read.
+read_message_local = threading.local()
+
+def read_filtered_csv(in_file, filter_func, chunksize, usecols=None, dtype=None, **read_csv_kwargs):
+
+    '''Read the rows of a delimited file which pass a filter. Only the columns in usecols are parsed, with the dtypes in dtype, and
+    each chunk is filtered as soon as it is read, so only the matching rows are kept in memory. The filtered chunks are concatenated
+    once at the end.
+
+    Args:
+        | in_file (str or file-like): path to the file.
+        | filter_func (function): takes a chunk DataFrame and returns the rows to keep.
+        | chunksize (int): number of rows per chunk.
+        | usecols (list of strs): columns to parse, or None for every column.
+        | dtype (dict): dtypes indexed by column name.
+        | read_csv_kwargs: other keyword arguments for pandas.read_csv, e.g. sep.
+
+    Returns:
+        df (DataFrame): the filtered rows.
+    '''
+
+    df_chunk_l = [filter_func(df_chunk) for df_chunk in pd.read_csv(in_file, chunksize=chunksize, usecols=usecols, dtype=dtype, **read_csv_kwargs)]
+    if len(df_chunk_l) == 0:
+        return pd.DataFrame([], columns=usecols)
+    df = pd.concat(df_chunk_l, ignore_index=True)
+
+    return df
+
+
+def get_read_thread_pool(num_threads):
+
+    '''Get the thread pool for reading inputs concurrently. 1 pool of each size is made per process, on first use, and reused by
+    later calls, so that make_png does not start threads for every png. A process forked from one which has a pool makes its own.
+
+    Args:
+        num_threads (int): number of threads.
+
+    Returns:
+        thread_pool (multiprocessing.pool.ThreadPool): the thread pool.
+    '''
+
+    key = (os.getpid(), max(1, num_threads))
+    with read_thread_pool_lock:
+        if key not in read_thread_pool_dict:
+            read_thread_pool_dict[key] = multiprocessing.pool.ThreadPool(key[1])
+        thread_pool = read_thread_pool_dict[key]
+
+    return thread_pool
+
+
+def report(message):
+
+    '''Print a message of a loader or, if it is called from a read started by apply_read_async, keep the message with the read
+    (see get_read_result).
+
+    Args:
+        message (str): the message.
+    '''
+
+    message_l = getattr(read_message_local, "message_l", None)
+    if message_l != None:
+        message_l.append(message)
+    else:
+        print(message)
+
+
+def call_with_messages(message_l, read_func, *arg_l):
+
+    '''Call a reading function, keeping the messages it reports in message_l.'''
+
+    read_message_local.message_l = message_l
+    try:
+        return read_func(*arg_l)
+    finally:
+        read_message_local.message_l = None
+
+
+def apply_read_async(thread_pool, read_func, arg_l):
+
+    '''Start a read on the thread pool, with the messages it reports kept (see get_read_result).
+
+    Args:
+        | thread_pool (multiprocessing.pool.ThreadPool): the thread pool (see get_read_thread_pool).
+        | read_func (function): the reading function.
+        | arg_l (tuple): positional arguments for read_func.
+
+    Returns:
+        read_result (multiprocessing.pool.AsyncResult): the read, whose message_l attribute holds its messages.
+    '''
+
+    message_l = []
+    read_result = thread_pool.apply_async(call_with_messages, (message_l, read_func) + tuple(arg_l))
+    read_result.message_l = message_l
+
+    return read_result
+
+
+def get_read_result(read_result):
+
+    '''Wait for a read started by apply_read_async, report its messages on the calling thread, and return its result (or raise the
+    error raised by the read). The messages are reported only the first time the result is collected.'''
+
+    try:
+        return read_result.get()
+    finally:
+        for message in read_result.message_l:
+            report(message)
+        del read_result.message_l[:]
+
+
+def close_read_thread_pools():
+
+    '''Stop the thread pools made by this process. This is called when the interpreter exits.'''
+
+    with read_thread_pool_lock:
+        for key in list(read_thread_pool_dict.keys()):
+            if key[0] == os.getpid():
+                read_thread_pool_dict.pop(key).terminate()
+
+
+atexit.register(close_read_thread_pools)
@@ -1,4 +1,5 @@
 import pandas as pd
+import json
 
 def get_setting_dict():
 
@@ -19,6 +20,12 @@ def get_setting_dict():
     setting_dict["fig_left"] = 0.125
     setting_dict["fig_num_rows"] = 17
     
+    setting_dict["read_chunksize"] = 100000
+    setting_dict["read_num_threads"] = 4
+    setting_dict["input_cache_max_mb"] = 256
+    setting_dict["text_mode"] = "latex" 
+    setting_dict["tex_cache_dir"] = None
+    
     setting_dict["t_track_rows"] = 1
     setting_dict["c_track_rows"] = 3
     setting_dict["c_track_gap_rows"] = 2
@@ -37,6 +44,14 @@ def get_setting_dict():
     
     setting_dict["c_track_y_axis_label"] = r'\noindent \textbf{Average}\\ \textbf{coverage}'
     setting_dict["c_track_fontsize"] = 10
+    setting_dict["c_track_lod"] = True
+    setting_dict["c_track_lod_pixels_per_bin"] = 1
+    setting_dict["c_track_group_mode"] = "overlay"
+    setting_dict["c_track_group_envelope"] = False
+    setting_dict["c_track_group_envelope_alpha"] = 0.25
+    setting_dict["c_track_group_color_l"] = ["#1F77B4","#D62728","#2CA02C","#FF7F0E"]
+    setting_dict["c_track_group_linewidth"] = 0.75
+    setting_dict["c_track_diff_y_axis_label"] = r'\noindent \textbf{Coverage}\\ \textbf{difference}'
     
     setting_dict["v_track_y_axis_label"] = r'\textbf{Exons \& variants}'
     setting_dict["v_track_vars_text_top"] = "Splice acceptor/donor \n (SA/D), initiator codon \n (IC), stop gained (SG),\n \& frameshift (F)"
@@ -59,12 +74,20 @@ def get_setting_dict():
                                        "splice_donor_variant":"T","inframe_deletion":"B","initiator_codon_variant":"T"}
     setting_dict["v_track_merge_pixel_thresh"] = 3.5
     setting_dict["v_track_num_arrow_heights"] = 4
+    setting_dict["v_track_arrow_height_mode"] = "sweep"
+    setting_dict["v_track_arrow_fontsize"] = 8
+    setting_dict["v_track_arrow_label_pad_chars"] = 1
+    setting_dict["v_track_density_min_variants"] = 1000
+    setting_dict["v_track_density_pixels_per_bin"] = 2
+    setting_dict["v_track_density_color_l"] = ["#D62728","#FF7F0E","#9467BD","#8C564B","#E377C2","#1F77B4","#2CA02C","#17BECF","#BCBD22","#7F7F7F"]
     
     setting_dict["v_key_num_cols"] = 4
     setting_dict["v_key_fontsize"] = 10
     setting_dict["v_key_x"] = 0.5 
     setting_dict["v_key_y"] = 1.175
     setting_dict["v_key_max_chars_per_col"] = 44 
+    setting_dict["v_key_max_entries"] = 100
+    setting_dict["v_key_file_format"] = None
 
     setting_dict["pd_track_y_label"] = r'\noindent\textbf{Protein \\ domains}'
     setting_dict["pd_track_y_label_fontsize"] = 10
@@ -90,3 +113,29 @@ def display_setting_dict(setting_dict):
     for key in setting_dict_key_l:
         print("{0}: {1}".format(key,setting_dict[key]))
     print("\n")
+
+
+def get_setting_dict_from_file(setting_file):
+
+    '''Create a dictionary of settings from the default settings, with the values of some keys replaced by those in a JSON file,
+    e.g. {"fig_dpi": 300, "text_mode": "mathtext"}.
+
+    Args:
+        setting_file (str): path to the JSON file.
+
+    Returns:
+        setting_dict (dict): settings for making the png, or False if the file contains keys which are not settings.
+    '''
+
+    setting_dict = get_setting_dict()
+    with open(setting_file) as setting_fh:
+        file_setting_dict = json.load(setting_fh)
+    unknown_key_l = sorted([key for key in file_setting_dict if key not in setting_dict])
+    if len(unknown_key_l) > 0:
+        print("ERROR: {0} contains keys which are not settings: {1}".format(setting_file, ", ".join(unknown_key_l)))
+        return False
+    for key in file_setting_dict:
+        #JSON has no tuples, so lists are converted back for the settings which are tuples.
+        setting_dict[key] = tuple(file_setting_dict[key]) if isinstance(setting_dict[key], tuple) else file_setting_dict[key]
+
+    return setting_dict
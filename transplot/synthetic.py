@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+import os
+import coverage as c
+import protdomains as pds
+
+
+'''
+Functions for generating synthetic inputs in the formats transplot reads (coverage, exon coordinate, utr, variant, protein domain
+and protein domain color files), for benchmarking on transcripts, sample counts and variant/domain densities much larger than the
+example data. The inputs are random but reproducible from a seed.
+'''
+
+def get_synthetic_exon_df(rng, transcript_len, num_exons, start_bp):
+
+    '''Get the exons of a synthetic transcript, with random lengths which add up to transcript_len and random introns of 100-5000 bases.
+
+    Args:
+        | rng (numpy.random.RandomState): random number generator.
+        | transcript_len (int): transcript length.
+        | num_exons (int): number of exons.
+        | start_bp (int): base pair before the first intron.
+
+    Returns:
+        exon_df (DataFrame): contains the 1-based start_bp and end_bp of each exon, in base pair order.
+    '''
+
+    exon_len_arr = rng.multinomial(transcript_len - num_exons, [1.0/num_exons]*num_exons) + 1
+    intron_len_arr = rng.randint(100, 5000, size=num_exons)
+    exon_start_arr = start_bp + np.cumsum(intron_len_arr) + np.concatenate([[0], np.cumsum(exon_len_arr)[:-1]])
+    exon_df = pd.DataFrame({"start_bp":exon_start_arr, "end_bp":exon_start_arr + exon_len_arr - 1}, columns=["start_bp","end_bp"])
+
+    return exon_df
+
+
+def get_synthetic_cov_df(transcript_len, num_exons, strand, seed=0, exon_prefix="ENSE"):
+
+    '''Make a cov_df, in the form returned by coverage.get_cov_df, for a synthetic transcript.
+
+    Args:
+        | transcript_len (int): transcript length.
+        | num_exons (int): number of exons.
+        | strand (str): "+" or "-".
+        | seed (int): random seed.
+        | exon_prefix (str): prefix of the exon IDs, which are numbered in base pair order.
+
+    Returns:
+        cov_df (DataFrame): contains the strand, cov, exon, bp and tp columns.
+    '''
+
+    rng = np.random.RandomState(seed)
+    exon_df = get_synthetic_exon_df(rng, transcript_len, num_exons, 1000000)
+    exon_len_arr = (exon_df["end_bp"] - exon_df["start_bp"] + 1).values
+    bp_arr = np.concatenate([np.arange(start, start + exon_len) for start, exon_len in zip(exon_df["start_bp"].values, exon_len_arr)])
+    exon_arr = np.repeat(["{0}{1:011d}".format(exon_prefix, i) for i in range(num_exons)], exon_len_arr)
+    tp_arr = np.arange(1, transcript_len+1) if strand == "+" else np.arange(transcript_len, 0, -1)
+    cov_df = pd.DataFrame({"strand":strand, "cov":rng.poisson(30, transcript_len).astype(float), "exon":exon_arr, "bp":bp_arr, "tp":tp_arr},
+                          columns=["strand","cov","exon","bp","tp"])
+
+    return cov_df
+
+
+def get_synthetic_variant_df(num_variants, transcript_len, effect_l, seed=0):
+
+    '''Make a variant_df, sorted by tp and indexed from 0, in the form passed to variants.make_track, with variants at random
+    transcript positions.
+
+    Args:
+        | num_variants (int): number of variants.
+        | transcript_len (int): transcript length.
+        | effect_l (list of strs): consequences to choose from, e.g. the keys of the v_track_vars_t_or_b setting.
+        | seed (int): random seed.
+
+    Returns:
+        variant_df (DataFrame): contains the tp, effect, dnachange and prot_change columns.
+    '''
+
+    rng = np.random.RandomState(seed)
+    tp_arr = np.sort(rng.randint(1, transcript_len+1, size=num_variants))
+    variant_df = pd.DataFrame({"tp":tp_arr, "effect":rng.choice(effect_l, size=num_variants),
+                               "dnachange":["c.{0}N>T".format(tp) for tp in tp_arr], "prot_change":["p.Ala{0}Val".format((tp+2)//3) for tp in tp_arr]},
+                              columns=["tp","effect","dnachange","prot_change"])
+
+    return variant_df
+
+
+def make_synthetic_inputs(out_dir, num_transcripts=1, transcript_len=10000, num_exons=20, num_samples=6, variants_per_kb=1.0,
+                          domains_per_kb=0.5, domain_overlap_frac=0.25, strand="+", seed=0, chrom="5"):
+
+    '''Write synthetic input files for 1 or more transcripts, which lie one after another on a chromosome. The coverage, utr, variant,
+    protein domain and protein domain color files hold all the transcripts, and there is 1 exon coordinate file per transcript.
+
+    Args:
+        | out_dir (str): directory to write the files to.
+        | num_transcripts (int): number of transcripts.
+        | transcript_len (int): length of each transcript.
+        | num_exons (int): number of exons per transcript.
+        | num_samples (int): number of samples in the coverage file.
+        | variants_per_kb (float): mean number of variants per kb of transcript.
+        | domains_per_kb (float): mean number of protein domains per kb of transcript.
+        | domain_overlap_frac (float): fraction of the protein domains which overlap the previous domain.
+        | strand (str): "+" or "-".
+        | seed (int): random seed.
+        | chrom (str): chromosome.
+
+    Returns:
+        input_dict (dict): the transcript_l, sample_l, cov_file, exon_coord_file_l, utr_file, variant_file, protein_domain_file and
+        protein_domain_color_file.
+    '''
+
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    rng = np.random.RandomState(seed)
+    sample_l = ["S{0:04d}".format(i) for i in range(1, num_samples+1)]
+    transcript_l = ["ENST9{0:010d}".format(i) for i in range(1, num_transcripts+1)]
+    input_dict = {"transcript_l":transcript_l, "sample_l":sample_l, "cov_file":os.path.join(out_dir, "cov.csv"), "exon_coord_file_l":[],
+                  "utr_file":os.path.join(out_dir, "utrs.txt"), "variant_file":os.path.join(out_dir, "variants.txt"),
+                  "protein_domain_file":os.path.join(out_dir, "domains.txt"), "protein_domain_color_file":os.path.join(out_dir, "domain_colors.csv")}
+
+    effect_l = ["missense_variant","frameshift_variant","stop_gained","splice_acceptor_variant","splice_donor_variant","inframe_deletion",
+                "initiator_codon_variant"]
+    effect_p_arr = np.array([0.6,0.1,0.1,0.05,0.05,0.05,0.05])
+    num_domain_types = max(1, int(domains_per_kb*transcript_len/1000.0))
+    domain_id_l = ["PF9{0:04d}".format(i) for i in range(num_domain_types)]
+
+    utr_df_l, variant_df_l, protein_domain_df_l = [], [], []
+    start_bp = 1000000
+    for i, transcript in enumerate(transcript_l):
+        print("Generating {0}...".format(transcript))
+        exon_df = get_synthetic_exon_df(rng, transcript_len, num_exons, start_bp)
+        exon_df["exon"] = ["ENSE9{0:06d}{1:04d}".format(i+1, j) for j in range(num_exons)]
+        exon_len_arr = (exon_df["end_bp"] - exon_df["start_bp"] + 1).values
+        start_bp = exon_df["end_bp"].iloc[-1] + 10000
+
+        #Coverage: 1 row per exonic base, with a per-exon mean depth so that the coverage track has some structure.
+        position_arr = np.concatenate([np.arange(1, exon_len+1) for exon_len in exon_len_arr])
+        cov_df = pd.DataFrame({"chrom":chrom, "chromStart":np.repeat(exon_df["start_bp"].values - 1, exon_len_arr),
+                               "chromEnd":np.repeat(exon_df["end_bp"].values, exon_len_arr),
+                               "name":np.repeat(["GENE{0}:{1}:{2}".format(i+1, transcript, exon) for exon in exon_df["exon"]], exon_len_arr),
+                               "score":500, "strand":strand, "position":position_arr},
+                              columns=["chrom","chromStart","chromEnd","name","score","strand","position"])
+        exon_mean_arr = np.repeat(rng.gamma(4.0, 10.0, size=num_exons), exon_len_arr)
+        for sample in sample_l:
+            cov_df[sample] = rng.poisson(exon_mean_arr)
+        cov_df.to_csv(input_dict["cov_file"], mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+        #Exon coordinates, derived from the coverage in the same way as transplotter.make_exon_coord_file.
+        cov_df = cov_df[["chrom","chromStart","strand","position","name"]].copy()
+        cov_df["exon"] = cov_df["name"].str.split(pat=":").str.get(2)
+        exon_coord_df = c.get_exon_coord_df(c.add_bp_tp_cols(cov_df))
+        input_dict["exon_coord_file_l"].append(os.path.join(out_dir, "{0}_exon_coord.csv".format(transcript)))
+        exon_coord_df.to_csv(input_dict["exon_coord_file_l"][-1], index=True)
+        del cov_df
+
+        #UTRs: the 5' utr at the start of the first exon and the 3' utr at the end of the last exon, in transcript order.
+        [first_exon, last_exon] = [exon_df.iloc[0], exon_df.iloc[-1]] if strand == "+" else [exon_df.iloc[-1], exon_df.iloc[0]]
+        utr_5_len = min(100, (first_exon["end_bp"] - first_exon["start_bp"])//2)
+        utr_3_len = min(500, (last_exon["end_bp"] - last_exon["start_bp"])//2)
+        if strand == "+":
+            utr_5_l = [first_exon["start_bp"] - 1, first_exon["start_bp"] + utr_5_len - 1]
+            utr_3_l = [last_exon["end_bp"] - utr_3_len, last_exon["end_bp"]]
+        else:
+            utr_5_l = [first_exon["end_bp"] - utr_5_len, first_exon["end_bp"]]
+            utr_3_l = [last_exon["start_bp"] - 1, last_exon["start_bp"] + utr_3_len - 1]
+        utr_df_l.append(pd.DataFrame({"Ensembl Transcript ID":transcript, "5' UTR Start":[utr_5_l[0], None], "5' UTR End":[utr_5_l[1], None],
+                                      "3' UTR Start":[None, utr_3_l[0]], "3' UTR End":[None, utr_3_l[1]], "Strand":1 if strand == "+" else -1},
+                                     columns=["Ensembl Transcript ID","5' UTR Start","5' UTR End","3' UTR Start","3' UTR End","Strand"]))
+
+        #Variants at random exonic bases.
+        num_variants = rng.poisson(variants_per_kb*transcript_len/1000.0)
+        exonic_bp_arr = np.concatenate([np.arange(start, end+1) for start, end in zip(exon_df["start_bp"].values, exon_df["end_bp"].values)])
+        variant_pos_arr = np.sort(rng.choice(exonic_bp_arr, size=num_variants))
+        aa_pos_arr = rng.randint(1, transcript_len//3 + 1, size=num_variants)
+        variant_df_l.append(pd.DataFrame({"CHROM":chrom, "pos":variant_pos_arr, "featureID":transcript,
+                                          "effect":rng.choice(effect_l, size=num_variants, p=effect_p_arr),
+                                          "dnachange":["c.{0}N>T".format(aa_pos*3) for aa_pos in aa_pos_arr],
+                                          "prot_change":["p.Ala{0}Val".format(aa_pos) for aa_pos in aa_pos_arr]},
+                                         columns=["CHROM","pos","featureID","effect","dnachange","prot_change"]))
+
+        #Protein domains, a fraction of which overlap the previous domain.
+        protein_len = transcript_len//3
+        num_domains = max(1, rng.poisson(domains_per_kb*transcript_len/1000.0))
+        domain_len_arr = rng.randint(max(2, protein_len//50), max(3, protein_len//8), size=num_domains)
+        domain_start_arr = np.sort(rng.randint(1, protein_len, size=num_domains))
+        overlap_arr = rng.random_sample(num_domains) < domain_overlap_frac
+        for j in range(1, num_domains):
+            if overlap_arr[j] and domain_start_arr[j] > domain_start_arr[j-1] + domain_len_arr[j-1]:
+                domain_start_arr[j] = domain_start_arr[j-1] + domain_len_arr[j-1]//2
+        domain_end_arr = np.minimum(domain_start_arr + domain_len_arr, protein_len)
+        domain_idx_arr = rng.randint(0, num_domain_types, size=num_domains)
+        protein_domain_df_l.append(pd.DataFrame({"TranscriptID":transcript, "UniprotID":"Q9{0:04d}".format(i+1), "Length":protein_len,
+                                                 "DomainID":[domain_id_l[idx] for idx in domain_idx_arr], "Domain_type":"Pfam",
+                                                 "Start":domain_start_arr, "End":domain_end_arr, "Match Status":"T",
+                                                 "name":["Synthetic domain {0}".format(idx) for idx in domain_idx_arr]},
+                                                columns=["TranscriptID","UniprotID","Length","DomainID","Domain_type","Start","End",
+                                                         "Match Status","name"]))
+
+    pd.concat(utr_df_l).to_csv(input_dict["utr_file"], index=False, float_format="%.0f")
+    pd.concat(variant_df_l).to_csv(input_dict["variant_file"], sep="\t", index=False)
+    protein_domain_df = pd.concat(protein_domain_df_l)
+    protein_domain_df.to_csv(input_dict["protein_domain_file"], sep="\t", index=False)
+    pds.get_protein_domain_color_s(protein_domain_df).to_csv(input_dict["protein_domain_color_file"], header=False)
+    print("Written synthetic inputs for {0} transcripts to {1}\n".format(num_transcripts, out_dir))
+
+    return input_dict
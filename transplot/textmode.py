@@ -0,0 +1,111 @@
+import matplotlib as mpl
+import matplotlib.texmanager
+import threading
+import os
+
+
+'''
+Functions for the text rendering modes. In "latex" mode the labels are rendered by LaTeX (usetex), as written in the settings. In
+"mathtext" mode the same labels are converted to matplotlib's built-in mathtext, so no LaTeX subprocesses are started.
+'''
+
+text_mode_l = ["latex", "mathtext"]
+#The LaTeX snippet cache directory set in this process (see set_tex_cache_dir).
+tex_cache_dir_dict = {"dir":None}
+tex_cache_dir_lock = threading.Lock()
+
+
+def get_text(latex_text, text_mode):
+
+    '''Get the text to draw for a label written in LaTeX.
+
+    Args:
+        | latex_text (str): the label, written in LaTeX (see latex_to_mathtext for the supported markup).
+        | text_mode (str): "latex" or "mathtext".
+
+    Returns:
+        text (str): the label unchanged in latex mode, or converted to mathtext.
+    '''
+
+    if text_mode == "latex":
+        return latex_text
+    text = latex_to_mathtext(latex_text)
+
+    return text
+
+
+def latex_to_mathtext(latex_text):
+
+    '''Convert the LaTeX markup used in transplot labels to mathtext: \\noindent is dropped, \\\\ becomes a new line, \\textbf{} and
+    \\textit{} become $\\mathbf{}$ and $\\mathit{}$, and the escaped characters \\&, \\_ and $>$ become plain characters (an
+    ampersand inside a group splits the group, since mathtext has no \\&).
+
+    Args:
+        latex_text (str): the label, written in LaTeX.
+
+    Returns:
+        mathtext (str): the label in mathtext.
+    '''
+
+    text = latex_text.replace("\\noindent", "").replace("$>$", ">").replace("$<$", "<")
+    text = text.replace("\\textbf{", "\\mathbf{").replace("\\textit{", "\\mathit{")
+
+    #Wrap each top-level \mathbf{} or \mathit{} group in $$, line by line, with its spaces escaped so that they are kept in math mode.
+    mathtext, plain_text, i = "", "", 0
+    while i <= len(text):
+        if i == len(text) or text.startswith("\\mathbf{", i) or text.startswith("\\mathit{", i):
+            mathtext += plain_text.replace("\\&", "&").replace("\\_", "_")
+            plain_text = ""
+            if i == len(text):
+                break
+            depth, j = 0, i
+            while j < len(text):
+                depth += {"{":1, "}":-1}.get(text[j], 0)
+                if depth == 0 and text[j] == "}":
+                    break
+                j += 1
+            #mathtext has no \&, so an ampersand closes the group and is drawn in plain text.
+            mathtext += "\\\\".join([" & ".join(["$" + text[i:i+8] + part.strip().replace(" ", "\\ ") + "}$" for part in content_line.split("\\&")])
+                                     for content_line in text[i+8:j].split("\\\\")])
+            i = j + 1
+        else:
+            plain_text += text[i]
+            i += 1
+    mathtext = "\n".join([line.strip() for line in mathtext.split("\\\\")])
+
+    return mathtext
+
+
+def set_tex_cache_dir(tex_cache_dir):
+
+    '''Set the directory in which matplotlib caches the LaTeX snippets it has compiled. The files in it are named by a hash of the
+    snippet and the font settings, so a directory on shared storage lets processes and runs reuse each other's compiled snippets.
+    
+    The directory is a class attribute of matplotlib's TexManager, so it is process-wide: it applies to every figure saved by the
+    process, including figures saved concurrently from other threads. It is therefore set only once per process, by the first call
+    with a directory (batch.make_pngs makes that call at start-up, in the parent and each worker). Later calls with another directory
+    leave it unchanged, with a warning, rather than switching it under figures being saved.
+
+    Args:
+        tex_cache_dir (str): path to the cache directory, or None to keep matplotlib's default (in its cache directory).
+    '''
+
+    if tex_cache_dir == None:
+        return
+    tex_cache_dir = os.path.abspath(tex_cache_dir)
+    with tex_cache_dir_lock:
+        if tex_cache_dir_dict["dir"] != None:
+            if tex_cache_dir_dict["dir"] != tex_cache_dir:
+                print("WARNING: the LaTeX cache directory is already {0} in this process, so {1} is not used.".format(tex_cache_dir_dict["dir"], tex_cache_dir))
+            return
+        try:
+            os.makedirs(tex_cache_dir)
+        except OSError:
+            if not os.path.isdir(tex_cache_dir):
+                raise
+        #matplotlib 3.8 made the texcache class attribute private.
+        if "_texcache" in vars(mpl.texmanager.TexManager):
+            mpl.texmanager.TexManager._texcache = tex_cache_dir
+        else:
+            mpl.texmanager.TexManager.texcache = tex_cache_dir
+        tex_cache_dir_dict["dir"] = tex_cache_dir
@@ -0,0 +1,104 @@
+import numpy as np
+
+
+'''
+Functions for the exon interval model of a transcript: mapping between base pair (bp) coordinates and transcript positions (tp)
+for whole arrays at once. The model holds 1 interval per exon plus the cumulative transcript position at which each exon starts,
+so its size is proportional to the number of exons rather than the number of bases.
+'''
+
+def get_transcript_model_dict(exon_coord_df):
+
+    '''Make the exon interval model of a transcript.
+
+    Args:
+        exon_coord_df (DataFrame): contains the exon base pair coordinates in transcript order, as in an exon coordinate file. The
+        start_bp of each exon is its 5' end, so start_bp > end_bp on the negative strand.
+
+    Returns:
+        transcript_model_dict (dict): the strand, the start_bp, exon length and start tp of each exon in transcript order, the
+        sorted lowest and highest bp of each exon with the order which sorts them, and the transcript length.
+    '''
+
+    start_bp_arr = exon_coord_df["start_bp"].values.astype(np.int64)
+    end_bp_arr = exon_coord_df["end_bp"].values.astype(np.int64)
+    strand = "+" if (end_bp_arr > start_bp_arr).all() else "-"
+    exon_len_arr = np.abs(end_bp_arr - start_bp_arr) + 1
+    start_tp_arr = np.cumsum(exon_len_arr) - exon_len_arr + 1
+    lo_bp_arr, hi_bp_arr = np.minimum(start_bp_arr, end_bp_arr), np.maximum(start_bp_arr, end_bp_arr)
+    order_arr = np.argsort(lo_bp_arr, kind="mergesort")
+
+    transcript_model_dict = {"strand":strand, "start_bp_arr":start_bp_arr, "exon_len_arr":exon_len_arr, "start_tp_arr":start_tp_arr,
+                             "lo_bp_arr":lo_bp_arr[order_arr], "hi_bp_arr":hi_bp_arr[order_arr], "order_arr":order_arr,
+                             "transcript_len":int(exon_len_arr.sum())}
+
+    return transcript_model_dict
+
+
+def get_tp_arr(transcript_model_dict, bp_arr, snap_intronic=True):
+
+    '''Map base pair coordinates to transcript positions with a sorted search over the exon intervals. An intronic position is
+    moved to the nearest exon boundary (if snap_intronic) or gets NaN, and a position before the first or after the last exon
+    gets NaN. A warning is printed with the number of positions handled in either way.
+
+    Args:
+        | transcript_model_dict (dict): the exon interval model.
+        | bp_arr (array-like of ints): base pair coordinates.
+        | snap_intronic (bool): whether to move intronic positions to the nearest exon boundary.
+
+    Returns:
+        tp_arr (numpy.ndarray of floats): transcript positions, NaN where a position could not be mapped.
+    '''
+
+    bp_arr = np.asarray(bp_arr).astype(np.int64)
+    lo_bp_arr, hi_bp_arr = transcript_model_dict["lo_bp_arr"], transcript_model_dict["hi_bp_arr"]
+    if len(bp_arr) == 0 or len(lo_bp_arr) == 0:
+        return np.full(len(bp_arr), np.nan)
+
+    idx_arr = np.clip(np.searchsorted(lo_bp_arr, bp_arr, side="right") - 1, 0, len(lo_bp_arr)-1)
+    in_range_arr = (bp_arr >= lo_bp_arr[0]) & (bp_arr <= hi_bp_arr[-1])
+    intronic_arr = in_range_arr & (bp_arr > hi_bp_arr[idx_arr])
+    mapped_bp_arr = bp_arr.copy()
+    if intronic_arr.any():
+        print("WARNING: {0} positions are intronic and {1}.".format(intronic_arr.sum(), "were moved to the nearest exon boundary"
+                                                                     if snap_intronic else "were dropped"))
+        if snap_intronic:
+            next_idx_arr = np.clip(idx_arr + 1, 0, len(lo_bp_arr)-1)
+            to_next_arr = intronic_arr & (lo_bp_arr[next_idx_arr] - bp_arr < bp_arr - hi_bp_arr[idx_arr])
+            mapped_bp_arr[intronic_arr] = hi_bp_arr[idx_arr][intronic_arr]
+            mapped_bp_arr[to_next_arr] = lo_bp_arr[next_idx_arr][to_next_arr]
+            idx_arr = np.where(to_next_arr, next_idx_arr, idx_arr)
+    if not in_range_arr.all():
+        print("WARNING: {0} positions are outside the transcript and were dropped.".format((~in_range_arr).sum()))
+
+    exon_idx_arr = transcript_model_dict["order_arr"][idx_arr]
+    sign = 1 if transcript_model_dict["strand"] == "+" else -1
+    tp_arr = (transcript_model_dict["start_tp_arr"][exon_idx_arr] + sign*(mapped_bp_arr - transcript_model_dict["start_bp_arr"][exon_idx_arr])).astype(np.float64)
+    tp_arr[~in_range_arr | (intronic_arr & (not snap_intronic))] = np.nan
+
+    return tp_arr
+
+
+def get_bp_arr(transcript_model_dict, tp_arr):
+
+    '''Map transcript positions to base pair coordinates with a sorted search over the cumulative exon offsets.
+
+    Args:
+        | transcript_model_dict (dict): the exon interval model.
+        | tp_arr (array-like of ints): transcript positions.
+
+    Returns:
+        bp_arr (numpy.ndarray of floats): base pair coordinates, NaN where a position is not in 1..transcript length.
+    '''
+
+    tp_arr = np.asarray(tp_arr).astype(np.int64)
+    start_tp_arr = transcript_model_dict["start_tp_arr"]
+    if len(tp_arr) == 0 or len(start_tp_arr) == 0:
+        return np.full(len(tp_arr), np.nan)
+
+    exon_idx_arr = np.clip(np.searchsorted(start_tp_arr, tp_arr, side="right") - 1, 0, len(start_tp_arr)-1)
+    sign = 1 if transcript_model_dict["strand"] == "+" else -1
+    bp_arr = (transcript_model_dict["start_bp_arr"][exon_idx_arr] + sign*(tp_arr - start_tp_arr[exon_idx_arr])).astype(np.float64)
+    bp_arr[(tp_arr < 1) | (tp_arr > transcript_model_dict["transcript_len"])] = np.nan
+
+    return bp_arr
@@ -0,0 +1,156 @@
+import pandas as pd
+import sqlite3
+import threading
+import os
+import readers as r
+
+
+'''
+Functions for the transcript model database: a SQLite file which holds the exon and UTR intervals of each transcript as plain
+integer columns, and its chromosome if known, so that make_png can load a transcript's intervals by ID instead of parsing the exon 
+coordinate and UTR files.
+The exon interval model and the exon/UTR bounds and colors are rebuilt from the intervals on load. Each process keeps 1
+connection per database, shared by its threads.
+'''
+
+db_schema_version = "2"
+exon_col_l = ["exon", "start_bp", "end_bp", "start_tp", "end_tp"]
+utr_col_l = ["utr", "start_bp", "end_bp"]
+conn_dict = {}
+conn_lock = threading.Lock()
+
+
+def get_db_conn(db_file):
+
+    '''Get this process's connection to a database, opening it on first use. The connection is shared by threads, which must hold
+    conn_lock while using it.
+
+    Args:
+        db_file (str): path to the database file.
+
+    Returns:
+        conn (sqlite3.Connection): the connection.
+    '''
+
+    #Connections are not carried over into forked worker processes, which open their own.
+    key = (os.path.abspath(db_file), os.getpid())
+    if key not in conn_dict:
+        conn_dict[key] = sqlite3.connect(db_file, check_same_thread=False)
+
+    return conn_dict[key]
+
+
+def close_db_conns():
+
+    '''Close this process's database connections.'''
+
+    with conn_lock:
+        for key in list(conn_dict):
+            if key[1] == os.getpid():
+                conn_dict.pop(key).close()
+
+
+def write_transcript_model_db(db_file, transcript_model_record_iter):
+
+    '''Write the exon and UTR intervals of transcript models to a database. A transcript which is already in the database is replaced.
+
+    Args:
+        | db_file (str): path to the database file.
+        | transcript_model_record_iter (iterable of dicts): transcript models, e.g. from transplotter.get_transcript_model_record.
+
+    Returns:
+        num_records (int): number of models written, or False if the database is in an older format.
+    '''
+
+    num_records = 0
+    with conn_lock:
+        conn = get_db_conn(db_file)
+        if "transcript_model" in [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]:
+            print("ERROR: {0} is a transcript model database in an older format. Delete it and make it again.".format(db_file))
+            return False
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS transcript (transcript TEXT PRIMARY KEY, chrom TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS exon (transcript TEXT, exon_order INTEGER, exon TEXT, start_bp INTEGER, end_bp INTEGER, "
+                         "start_tp INTEGER, end_tp INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS utr (transcript TEXT, utr_order INTEGER, utr TEXT, start_bp INTEGER, end_bp INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS exon_transcript ON exon (transcript)")
+            conn.execute("CREATE INDEX IF NOT EXISTS utr_transcript ON utr (transcript)")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (db_schema_version,))
+            for transcript_model_record in transcript_model_record_iter:
+                transcript = transcript_model_record["transcript"]
+                exon_coord_df, utr_df = transcript_model_record["exon_coord_df"], transcript_model_record["utr_df"]
+                conn.execute("INSERT OR REPLACE INTO transcript VALUES (?, ?)", (transcript, transcript_model_record.get("chrom")))
+                conn.execute("DELETE FROM exon WHERE transcript = ?", (transcript,))
+                conn.execute("DELETE FROM utr WHERE transcript = ?", (transcript,))
+                conn.executemany("INSERT INTO exon VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 [(transcript, i, str(exon_coord_df.index[i])) + tuple([int(value) for value in exon_coord_df.iloc[i][exon_col_l[1:]]])
+                                  for i in range(len(exon_coord_df.index))])
+                conn.executemany("INSERT INTO utr VALUES (?, ?, ?, ?, ?)",
+                                 [(transcript, i, utr_df["utr"].iloc[i], int(utr_df["start_bp"].iloc[i]), int(utr_df["end_bp"].iloc[i]))
+                                  for i in range(len(utr_df.index))])
+                num_records += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return num_records
+
+
+def get_transcript_interval_df_l(db_file, transcript):
+
+    '''Load the exon and UTR intervals of a transcript from a database.
+
+    Args:
+        | db_file (str): path to the database file.
+        | transcript (str): Ensembl transcript ID.
+
+    Returns:
+        transcript_interval_df_l (list of DataFrames): exon_coord_df, indexed by exon with the columns start_bp, end_bp, start_tp and end_tp
+        (and chrom, if the chromosome is known), and utr_df, with the columns utr, start_bp and end_bp, or None if the transcript is not in
+        the database.
+    '''
+
+    if not os.path.exists(db_file):
+        r.report("WARNING: transcript model database {0} does not exist.".format(db_file))
+        return None
+    with conn_lock:
+        conn = get_db_conn(db_file)
+        table_l = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        if "exon" not in table_l:
+            r.report("WARNING: {0} is not a transcript model database, or is in an older format and should be made again.".format(db_file))
+            return None
+        exon_row_l = conn.execute("SELECT {0} FROM exon WHERE transcript = ? ORDER BY exon_order".format(", ".join(exon_col_l)), (transcript,)).fetchall()
+        utr_row_l = conn.execute("SELECT {0} FROM utr WHERE transcript = ? ORDER BY utr_order".format(", ".join(utr_col_l)), (transcript,)).fetchall()
+        #Databases made before the chromosome was recorded have no transcript table.
+        chrom_row_l = []
+        if "transcript" in table_l:
+            chrom_row_l = conn.execute("SELECT chrom FROM transcript WHERE transcript = ? AND chrom IS NOT NULL", (transcript,)).fetchall()
+    if len(exon_row_l) == 0:
+        return None
+
+    exon_coord_df = pd.DataFrame(exon_row_l, columns=exon_col_l).set_index("exon")
+    if len(chrom_row_l) > 0:
+        exon_coord_df["chrom"] = chrom_row_l[0][0]
+    utr_df = pd.DataFrame(utr_row_l, columns=utr_col_l)
+    transcript_interval_df_l = [exon_coord_df, utr_df]
+
+    return transcript_interval_df_l
+
+
+def get_db_transcript_l(db_file):
+
+    '''Get the transcripts in a database.
+
+    Args:
+        db_file (str): path to the database file.
+
+    Returns:
+        transcript_l (list of strs): Ensembl transcript IDs, sorted.
+    '''
+
+    with conn_lock:
+        transcript_l = [row[0] for row in get_db_conn(db_file).execute("SELECT DISTINCT transcript FROM exon ORDER BY transcript")]
+
+    return transcript_l
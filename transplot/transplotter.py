@@ -1,9 +1,24 @@
 import utrs as u
 import variants as v
+import vcf
 import protdomains as pds
 import coverage as c
-import matplotlib.pyplot as plt
+import covstore as cs
+import window as w
+import depth as d
+import cache as ch
+import readers as r
+import transcript as ts
+import transcriptdb as tdb
+import textmode as tm
+import profiling as pf
+import matplotlib as mpl
+import matplotlib.text
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.gridspec import GridSpec
 import sys
+import os
 import pandas as pd
 
 
@@ -26,9 +41,37 @@ def make_protein_domain_color_file(protein_domain_file, transcript_l, database,
     print("Written protein domain color file to {0}\n".format(out_path))
     
 
+def make_cov_index_file(cov_file):
+
+    '''Make a transcript index for a coverage file. Once the index exists, make_exon_coord_file and make_png read only the rows for the
+    requested transcript instead of scanning the whole coverage file. The index must be rebuilt if the coverage file changes.
+    
+    Args:
+        cov_file (str): path to coverage file.
+    '''
+    
+    print("make_cov_index_file")
+    c.make_cov_index_file(cov_file)
+
+
+def make_cov_store(cov_file, store_dir):
+
+    '''Convert a coverage file into a columnar coverage store. The store directory can then be passed to make_exon_coord_file and 
+    make_png in place of the coverage file, and only the requested samples are read.
+    
+    Args:
+        | cov_file (str): path to coverage file.
+        | store_dir (str): path to the store directory.
+    '''
+    
+    print("make_cov_store")
+    cs.make_cov_store(cov_file, store_dir)
+
+
 def make_exon_coord_file(cov_file, transcript, out_path):
     
-    '''Make an exon coordinate file from a coverage file.
+    '''Make an exon coordinate file from a coverage file. The file also records the transcript's chromosome (unless the coverage 
+    file is a columnar store), which make_png uses to query VCF files.
     
     Args:
         | cov_file (str): path to coverage file.
@@ -38,13 +81,69 @@ def make_exon_coord_file(cov_file, transcript, out_path):
 
     print("make_exon_coord_file")
     cov_df = c.get_cov_df(cov_file, transcript, None, None, [])
+    chrom = c.get_cov_chrom(cov_file, transcript)
+    if chrom != None:
+        cov_df["chrom"] = chrom
     exon_coord_df = c.get_exon_coord_df(cov_df)
     exon_coord_df.to_csv(out_path, index=True)
     print("Written exon coordinate file to {0}\n".format(out_path))
+
+
+def make_exon_coord_files(cov_file, transcript_l, out_dir, chunksize=100000):
+    
+    '''Make exon coordinate files for many transcripts in a single pass over a coverage file. Each file is written to 
+    out_dir/<transcript>_exon_coord.csv as soon as the transcript's rows have been read, so the whole coverage file is never held in memory. 
+    As with make_exon_coord_file, each file also records the transcript's chromosome.
+    
+    Args:
+        | cov_file (str): path to coverage file.
+        | transcript_l (list of strs): list of Ensembl transcript IDs, or None for every transcript in the coverage file.
+        | out_dir (str): directory to write the exon coordinate files to.
+        | chunksize (int): number of coverage file rows to read at a time.
+    
+    Returns:
+        out_path_dict (dict): paths of the exon coordinate files written, indexed by transcript ID.
+    '''
+
+    print("make_exon_coord_files")
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    out_path_dict = {}
+    for transcript, cov_df in c.get_transcript_cov_df_chunker(cov_file, transcript_l, [], chunksize):
+        out_path_dict[transcript] = os.path.join(out_dir, "{0}_exon_coord.csv".format(transcript))
+        c.get_exon_coord_df(cov_df).to_csv(out_path_dict[transcript], index=True)
+    if transcript_l != None:
+        for transcript in transcript_l:
+            if transcript not in out_path_dict:
+                print("WARNING: {0} was not found in {1}".format(transcript, cov_file))
+    print("Written {0} exon coordinate files to {1}\n".format(len(out_path_dict), out_dir))
+    
+    return out_path_dict
+    
+
+def make_transcript_model_db(db_file, transcript_l, exon_coord_file_l, utr_file_l):
+
+    '''Make a transcript model database from exon coordinate and utr files. The database can then be passed to make_png, which loads
+    each transcript's exon and utr intervals from it by transcript ID instead of parsing the files.
+    
+    Args:
+        | db_file (str): path to the database file. Transcripts already in it are replaced.
+        | transcript_l (list of strs): Ensembl transcript IDs.
+        | exon_coord_file_l (list of strs): exon coordinate file path for each transcript.
+        | utr_file_l (list of strs): utr file path for each transcript.
+    '''
     
+    print("make_transcript_model_db")
+    transcript_model_record_iter = (get_transcript_model_record(transcript_l[i], exon_coord_file_l[i], utr_file_l[i]) for i in range(len(transcript_l)))
+    num_records = tdb.write_transcript_model_db(db_file, transcript_model_record_iter)
+    if num_records is False:
+        return False
+    print("Written {0} transcript models to {1}\n".format(num_records, db_file))
+
 
 def make_png(transcript_l, title_l, track_l, sample_ll, utr_file_l, exon_coord_file_l, cov_file_l,
-             variant_file_l, protein_domain_file_l, protein_domain_color_file, setting_dict, png_file):
+             variant_file_l, protein_domain_file_l, protein_domain_color_file, setting_dict, png_file, bp_window_l=None, chrom_l=None, 
+             transcript_model_db=None, stage_report_l=None):
     
     '''Make a png which contains coverage/variants/protein domain tracks for 1 or more transcripts, subject to space limitations.
     
@@ -52,21 +151,46 @@ def make_png(transcript_l, title_l, track_l, sample_ll, utr_file_l, exon_coord_f
         | transcript_l (list of strs): Ensembl transcript ID(s)
         | title_l (list of strs): title to use for each transcript.
         | track_l (list of strs): list of strings of length 3 which encode whether to generate each of the 3 tracks (coverage, variants, protein domains). 
-        | sample_ll (list of list of strs): list of lists of sample IDs.
+        | sample_ll (list of list of strs): list of lists of sample IDs. An entry may instead be a dictionary of lists of sample IDs indexed by
+          group name (e.g. cases and controls), in which case all groups are read at once and drawn in 1 coverage track.
         | utr_file_l (list of strs): list of utr file paths.
         | exon_coord_file_l (list of strs): list of exon coordinate file paths.
-        | cov_file_l (list of strs): list of coverage file paths.
-        | variant_file_l (list of strs): list of variant file paths.
+        | cov_file_l (list of strs): list of coverage file paths. A path may also be a columnar coverage store, a samtools depth file 
+          (.depth or .depth.txt, optionally gzipped) or a mosdepth per-base BED file (.bed or .bed.gz).
+        | variant_file_l (list of strs): list of variant file paths. A path may also be a VEP (CSQ) or SnpEff (ANN) annotated VCF file
+          (.vcf or .vcf.gz), of which only the records in the transcript's span are read (see vcf.get_vcf_variant_df).
         | protein_domain_file_l (list of strs): list of protein domain file paths.
         | protein_domain_color_file (str): protein domain color file.
         | setting_dict (dictionary): settings for making the png.
         | png_file (str): path to write the png file to.
+        | bp_window_l (list of lists of ints): for each transcript, None or a [bp_start, bp_end] window (region of interest) to zoom in on. 
+          Only the coverage rows in the window are read, and the variant, UTR and protein domain tracks are restricted to it.
+        | chrom_l (list of strs): chromosome of each transcript, used to read samtools depth and mosdepth files and to query VCF files. If None,
+          depth files must contain 1 chromosome, and VCF files are queried with the chromosome recorded in the exon coordinate file or
+          transcript model database, or read in full if there is none.
+        | transcript_model_db (str): path to a transcript model database made by make_transcript_model_db. Transcripts in it are
+          loaded from it instead of from their exon coordinate and utr files.
+        | stage_report_l (list): if not None, a dict with the wall time, CPU time and peak memory of each stage of making the png (reading
+          each input, mapping base pairs to transcript positions, drawing each track, layout and saving) is appended to it, for each
+          transcript. See profiling.write_stage_report. The inputs are read on a thread pool, so the read stages record the time spent
+          waiting for each input.
+    
+    If the v_key_file_format setting is "tsv" or "html", the full key of each variants track is also written next to the png, to 
+    <png_file without .png>.<transcript number>.<transcript>.key.tsv (or .html), where the transcripts are numbered from 1 in
+    transcript_l order, so that a transcript drawn twice in a png (e.g. for 2 windows) has 2 key files.
+    
+    Returns:
+        success (bool): True if the png was written, False if the parameters were invalid.
     '''
 
     print("make_png")
+    if bp_window_l == None:
+        bp_window_l = [None]*len(transcript_l)
+    if chrom_l == None:
+        chrom_l = [None]*len(transcript_l)
 
     #Check the parameters are well-formed.
-    if len(transcript_l) == len(title_l) == len(track_l) == len(sample_ll) == len(utr_file_l) == len(exon_coord_file_l) == len(cov_file_l) == len(variant_file_l) == len(protein_domain_file_l):
+    if len(transcript_l) == len(title_l) == len(track_l) == len(sample_ll) == len(utr_file_l) == len(exon_coord_file_l) == len(cov_file_l) == len(variant_file_l) == len(protein_domain_file_l) == len(bp_window_l) == len(chrom_l):
         True
     else:
         print("ERROR: Parameters of make_png function which are lists must all be the same length.\n")
@@ -89,95 +213,385 @@ def make_png(transcript_l, title_l, track_l, sample_ll, utr_file_l, exon_coord_f
     if num_rows > setting_dict["fig_num_rows"]:
         print("ERROR: PNG figure requires {0} rows but there are only {1}\n".format(num_rows,setting_dict["fig_num_rows"]))
         return False
+    if setting_dict["text_mode"] not in tm.text_mode_l:
+        print("ERROR: text_mode must be one of {0}.\n".format(", ".join(tm.text_mode_l)))
+        return False
+    if setting_dict["v_key_file_format"] not in [None] + v.key_file_format_l:
+        print("ERROR: v_key_file_format must be None or one of {0}.\n".format(", ".join(v.key_file_format_l)))
+        return False
+
+    #Initialise the figure on its own Agg canvas, so that no global pyplot state is used.
+    stage_timer_dict = pf.start_stage_timer(stage_report_l, png_file)
+    try:
+        pf.start_stage(stage_timer_dict, None, "layout")
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        grid_spec = GridSpec(setting_dict["fig_num_rows"], 1)
 
-    #Initialise the figure.
-    fig = plt.figure()
-    plt.rc('text', usetex=True)
+        #Start reading the inputs on a thread pool. Each transcript's inputs are read concurrently, and the next transcript's inputs are
+        #read while the current transcript is drawn. The messages which the reads report are printed when their inputs are collected.
+        thread_pool = r.get_read_thread_pool(setting_dict["read_num_threads"])
+        if any([track_s[2] == "1" for track_s in track_l]):
+            protein_domain_color_result = r.apply_read_async(thread_pool, ch.get_cached_input, (setting_dict["input_cache_max_mb"], [protein_domain_color_file],
+                                                                                               pds.get_protein_domain_color_s_from_file, protein_domain_color_file))
+        read_transcript_input_results = lambda i: read_transcript_inputs(thread_pool, transcript_l[i], track_l[i], sample_ll[i], utr_file_l[i], 
+                                                                         exon_coord_file_l[i], cov_file_l[i], variant_file_l[i], protein_domain_file_l[i],
+                                                                         bp_window_l[i], chrom_l[i], transcript_model_db, setting_dict)
+        next_input_result_dict = read_transcript_input_results(0) if len(transcript_l) > 0 else None
 
-    #Make the axes.
-    get_tp_from_exon_bp_l = lambda bp, exon_bp_l: exon_bp_l.index(int(bp)) + 1
-    num_rows = setting_dict["fig_num_rows"]
-    start_row = 0
-    title_1_coords = None
+        #Make the axes.
+        num_rows = setting_dict["fig_num_rows"]
+        start_row = 0
+        title_1_coords = None
 
-    for i in range(len(transcript_l)):
+        for i in range(len(transcript_l)):
         
-        print("Transcript: {0}".format(transcript_l[i]))
+            print("Transcript: {0}".format(transcript_l[i]))
+            input_result_dict = next_input_result_dict
+            if i + 1 < len(transcript_l):
+                next_input_result_dict = read_transcript_input_results(i+1)
         
-        #Read in the exon positions and the utrs.
-        exon_coord_df = pd.read_csv(exon_coord_file_l[i], index_col="exon")
-        strand = "+" if (exon_coord_df["end_bp"] > exon_coord_df["start_bp"]).all() else "-"
-        if strand == "+":
-            print("Transcription direction: forward")
-        elif strand == "-":
-            print("Transcript direction: reverse") 
-        exon_bp_l = []
-        for j in range(len(exon_coord_df.index)):
+            #Get the transcript model, loaded from the database or read from the exon positions and the utrs.
+            pf.start_stage(stage_timer_dict, transcript_l[i], "read_model")
+            transcript_model_record = r.get_read_result(input_result_dict["model"])
+            exon_coord_df, utr_df = transcript_model_record["exon_coord_df"], transcript_model_record["utr_df"]
+            transcript_model_dict = transcript_model_record["transcript_model_dict"]
+            strand = transcript_model_dict["strand"]
             if strand == "+":
-                exon_bp_l.extend(range(exon_coord_df["start_bp"].iloc[j],exon_coord_df["end_bp"].iloc[j]+1))
+                print("Transcription direction: forward")
             elif strand == "-":
-                exon_bp_l.extend(range(exon_coord_df["start_bp"].iloc[j],exon_coord_df["end_bp"].iloc[j]-1,-1))
-        utr_df = u.get_utr_df(utr_file_l[i], strand, transcript_l[i])
-        #Add the transcript positions to utr_df. 
-        utr_df["start_tp"] = utr_df["start_bp"].apply(func=get_tp_from_exon_bp_l, exon_bp_l=exon_bp_l)
-        utr_df["end_tp"] = utr_df["end_bp"].apply(func=get_tp_from_exon_bp_l, exon_bp_l=exon_bp_l)
+                print("Transcript direction: reverse") 
         
-        #Make the title track
-        if i == 0:
-            plt.figtext(setting_dict["title_1_fig_x"], setting_dict["title_1_fig_y"], title_l[i], fontsize=setting_dict["title_fontsize"])
-            title_1_coords = fig.transFigure.transform((setting_dict["title_1_fig_x"], setting_dict["title_1_fig_y"]))
-        else:
-            title_track = plt.subplot2grid((num_rows,1), (start_row,0))
-            title_track.set_axis_off()
-            inv = title_track.transData.inverted()
-            title_track.text(inv.transform(title_1_coords)[0], setting_dict["title_2_ax_y"], title_l[i], fontsize=setting_dict["title_fontsize"])
-            start_row += setting_dict["t_track_rows"]
+            #Work out the transcript position window if zooming in on a region of interest.
+            tp_window_l = None
+            if bp_window_l[i] != None:
+                tp_window_l = w.get_window_tp_l(transcript_model_dict, bp_window_l[i][0], bp_window_l[i][1])
+                if tp_window_l == None:
+                    print("ERROR: window {0}-{1} contains no exonic bases of {2}.\n".format(bp_window_l[i][0], bp_window_l[i][1], transcript_l[i]))
+                    return False
+                print("Window: transcript positions {0}-{1}".format(tp_window_l[0], tp_window_l[1]))
+        
+            #Make the title track
+            pf.start_stage(stage_timer_dict, transcript_l[i], "layout")
+            if i == 0:
+                fig.text(setting_dict["title_1_fig_x"], setting_dict["title_1_fig_y"], tm.get_text(title_l[i], setting_dict["text_mode"]), fontsize=setting_dict["title_fontsize"])
+                title_1_coords = fig.transFigure.transform((setting_dict["title_1_fig_x"], setting_dict["title_1_fig_y"]))
+            else:
+                title_track = fig.add_subplot(grid_spec[start_row,0])
+                title_track.set_axis_off()
+                inv = title_track.transData.inverted()
+                title_track.text(inv.transform(title_1_coords)[0], setting_dict["title_2_ax_y"], tm.get_text(title_l[i], setting_dict["text_mode"]), fontsize=setting_dict["title_fontsize"])
+                start_row += setting_dict["t_track_rows"]
         
-        #Make the coverage track.'''
-        if track_l[i][0] == "1":
-            print("Making coverage track.")
-            cov_df = c.get_cov_df(cov_file_l[i], transcript_l[i], None, None, sample_ll[i])
-            [bound_l, color_l, edge_color_l] = get_exon_bound_color_l(exon_coord_df, utr_df, strand)
-            coverage_track = plt.subplot2grid((num_rows,1), (start_row, 0), rowspan=setting_dict["c_track_rows"])
-            start_row += setting_dict["c_track_rows"]
-            c.make_track(coverage_track, cov_df, bound_l, color_l, edge_color_l, setting_dict)
-            start_row += setting_dict["c_track_gap_rows"]
+            #Make the coverage track.'''
+            if track_l[i][0] == "1":
+                print("Making coverage track.")
+                pf.start_stage(stage_timer_dict, transcript_l[i], "read_coverage")
+                cov_df = r.get_read_result(input_result_dict["cov_df"])
+                if d.get_depth_format(cov_file_l[i]) == None and tp_window_l != None:
+                    pf.start_stage(stage_timer_dict, transcript_l[i], "map_bp_tp")
+                    cov_df["tp"] = ts.get_tp_arr(transcript_model_dict, cov_df["bp"].values, snap_intronic=False)
+                    cov_df = cov_df[~cov_df["tp"].isnull()]
+                    cov_df["tp"] = cov_df["tp"].astype(int)
+                pf.start_stage(stage_timer_dict, transcript_l[i], "draw_coverage")
+                [bound_l, color_l, edge_color_l] = [list(l) for l in transcript_model_record["exon_bound_color_ll"]]
+                if tp_window_l != None:
+                    [bound_l, color_l, edge_color_l] = w.get_window_bound_color_ll(bound_l, [color_l, edge_color_l], tp_window_l[0], tp_window_l[1])
+                coverage_track = fig.add_subplot(grid_spec[start_row:start_row+setting_dict["c_track_rows"],0])
+                start_row += setting_dict["c_track_rows"]
+                c.make_track(coverage_track, cov_df, bound_l, color_l, edge_color_l, setting_dict)
+                if tp_window_l != None:
+                    coverage_track.set_xlim(tp_window_l)
+                start_row += setting_dict["c_track_gap_rows"]
         
-        #Make the variants track.'''
-        variant_track = None
-        if track_l[i][1] == "1": #Make the variants track.
-            print("Making variant track.")
-            variant_df = v.get_variant_df(transcript_l[i], variant_file_l[i])
-            variant_df.rename(columns={"pos":"bp"}, inplace=True)
-            variant_df["tp"] = variant_df["bp"].apply(func=get_tp_from_exon_bp_l, exon_bp_l=exon_bp_l)
-            #variant_df.drop_duplicates(subset=["GENE_prot_change","GENE_DNA_change"], inplace=True)
-            variant_df.sort_values(by="tp", inplace=True)
-            start_row += setting_dict["v_anns_top_rows"]
-            variant_track = plt.subplot2grid((num_rows,1), (start_row,0))
-            start_row += setting_dict["v_track_rows"]
-            start_row += setting_dict["v_anns_bot_rows"]
-            variant_key = plt.subplot2grid((num_rows,1), (start_row,0), rowspan=setting_dict["v_key_rows"])
-            start_row += setting_dict["v_key_rows"]
-            [bound_l, color_l, edge_color_l] = get_exon_bound_color_l(exon_coord_df, utr_df, strand)
-            v.make_track(variant_track, bound_l[-1], bound_l, color_l, edge_color_l, variant_df, setting_dict, variant_key)
-            start_row += setting_dict["v_track_gap_rows"]
+            #Make the variants track.'''
+            variant_track = None
+            if track_l[i][1] == "1": #Make the variants track.
+                print("Making variant track.")
+                pf.start_stage(stage_timer_dict, transcript_l[i], "read_variants")
+                variant_df = r.get_read_result(input_result_dict["variant_df"])
+                variant_df.rename(columns={"pos":"bp"}, inplace=True)
+                if tp_window_l != None:
+                    variant_df = variant_df[(variant_df["bp"] >= bp_window_l[i][0]) & (variant_df["bp"] <= bp_window_l[i][1])]
+                    variant_df.index = range(len(variant_df.index))
+                pf.start_stage(stage_timer_dict, transcript_l[i], "map_bp_tp")
+                variant_df["tp"] = ts.get_tp_arr(transcript_model_dict, variant_df["bp"].values)
+                variant_df = variant_df[~variant_df["tp"].isnull()]
+                variant_df["tp"] = variant_df["tp"].astype(int)
+                variant_df.index = range(len(variant_df.index))
+                #variant_df.drop_duplicates(subset=["GENE_prot_change","GENE_DNA_change"], inplace=True)
+                variant_df.sort_values(by="tp", inplace=True)
+                pf.start_stage(stage_timer_dict, transcript_l[i], "draw_variants")
+                start_row += setting_dict["v_anns_top_rows"]
+                variant_track = fig.add_subplot(grid_spec[start_row,0])
+                start_row += setting_dict["v_track_rows"]
+                start_row += setting_dict["v_anns_bot_rows"]
+                variant_key = fig.add_subplot(grid_spec[start_row:start_row+setting_dict["v_key_rows"],0])
+                start_row += setting_dict["v_key_rows"]
+                [bound_l, color_l, edge_color_l] = [list(l) for l in transcript_model_record["exon_bound_color_ll"]]
+                transcript_len = bound_l[-1]
+                if tp_window_l != None:
+                    [bound_l, color_l, edge_color_l] = w.get_window_bound_color_ll(bound_l, [color_l, edge_color_l], tp_window_l[0], tp_window_l[1])
+                    variant_df["tp"] = variant_df["tp"] - w.get_window_tp_offset(tp_window_l)
+                    transcript_len = w.get_window_len(tp_window_l)
+                key_file = None
+                if setting_dict["v_key_file_format"] != None:
+                    key_file = "{0}.{1}.{2}.key.{3}".format(os.path.splitext(png_file)[0], i+1, transcript_l[i], setting_dict["v_key_file_format"])
+                v.make_track(variant_track, transcript_len, bound_l, color_l, edge_color_l, variant_df, setting_dict, variant_key, key_file, 
+                             0 if tp_window_l == None else w.get_window_tp_offset(tp_window_l))
+                start_row += setting_dict["v_track_gap_rows"]
         
-        #Make the protein domain track.'''
-        if track_l[i][2] == "1": #Make the protein domains track.
-            print("Making protein domain track.")
-            protein_domain_df = pds.get_protein_domain_df(protein_domain_file_l[i], [transcript_l[i]], "Pfam", ["Start","End"])
-            protein_domain_track = plt.subplot2grid((num_rows,1), (start_row,0))
-            start_row += setting_dict["pd_track_rows"]
-            protein_domain_color_df = pd.read_csv(protein_domain_color_file, header=None, names=["Domain", "Color"], index_col="Domain")
-            protein_domain_color_s = pd.Series(data=protein_domain_color_df["Color"], index=protein_domain_color_df.index)
-            del protein_domain_color_df
-            protein_domain_color_s = protein_domain_color_s.apply(lambda x: x if "," not in x else tuple([float(f) for f in x.split(",")]))
-            pds.make_track(protein_domain_track, protein_domain_df, utr_df, protein_domain_color_s, setting_dict, variant_track)
-            start_row += setting_dict["pd_track_gap_rows"]
-
-    fig.set_size_inches(setting_dict["fig_width_inches"], setting_dict["fig_height_inches"])
-    plt.savefig(png_file, dpi=setting_dict["fig_dpi"])
-    print("Written {0}.\n".format(png_file)) 
+            #Make the protein domain track.'''
+            if track_l[i][2] == "1": #Make the protein domains track.
+                print("Making protein domain track.")
+                pf.start_stage(stage_timer_dict, transcript_l[i], "read_domains")
+                protein_domain_df = r.get_read_result(input_result_dict["protein_domain_df"])
+                protein_domain_color_s = r.get_read_result(protein_domain_color_result)
+                pf.start_stage(stage_timer_dict, transcript_l[i], "draw_domains")
+                protein_domain_track = fig.add_subplot(grid_spec[start_row,0])
+                start_row += setting_dict["pd_track_rows"]
+                pds.make_track(protein_domain_track, protein_domain_df, utr_df, protein_domain_color_s, setting_dict, variant_track, tp_window_l)
+                start_row += setting_dict["pd_track_gap_rows"]
+
+        pf.start_stage(stage_timer_dict, None, "layout")
+        fig.set_size_inches(setting_dict["fig_width_inches"], setting_dict["fig_height_inches"])
+        if setting_dict["text_mode"] == "latex":
+            #The cache directory is process-wide, so this only takes effect for the first png made with one (see textmode.set_tex_cache_dir).
+            tm.set_tex_cache_dir(setting_dict["tex_cache_dir"])
+        pf.start_stage(stage_timer_dict, None, "savefig")
+        save_fig(fig, png_file, setting_dict["fig_dpi"], setting_dict["text_mode"] == "latex")
+        fig.clf()
+        print("Written {0}.\n".format(png_file)) 
+    
+        return True
+    finally:
+        #Stop the timer (and tracemalloc, if it started it) however the png ends, including on an error.
+        pf.stop_stage_timer(stage_timer_dict)
+
+
+def read_transcript_inputs(thread_pool, transcript, track_s, sample_l, utr_file, exon_coord_file, cov_file, variant_file, protein_domain_file,
+                           bp_window, chrom, transcript_model_db, setting_dict):
+
+    '''Start reading the inputs of a transcript which its enabled tracks need, concurrently on a thread pool.
+    
+    Args:
+        | thread_pool (multiprocessing.pool.ThreadPool): the thread pool (see readers.get_read_thread_pool).
+        | transcript (str): Ensembl transcript ID.
+        | track_s (str): string of length 3 which encodes whether to generate each of the 3 tracks (coverage, variants, protein domains).
+        | sample_l (list of strs or dict): list of sample IDs, or lists of sample IDs indexed by group name.
+        | utr_file (str): utr file path.
+        | exon_coord_file (str): exon coordinate file path.
+        | cov_file (str): coverage file path.
+        | variant_file (str): variant file path.
+        | protein_domain_file (str): protein domain file path.
+        | bp_window (list of ints): None or a [bp_start, bp_end] window.
+        | chrom (str): chromosome of the transcript, or None.
+        | transcript_model_db (str): path to a transcript model database, or None.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        input_result_dict (dict): multiprocessing.pool.AsyncResult objects for the transcript model record and, for the enabled tracks, 
+        cov_df, variant_df and protein_domain_df, indexed by those names ("model" for the record). readers.get_read_result waits for an
+        input, prints the messages of its read and returns it, or raises the error raised while reading it.
+    '''
+    
+    max_mb, chunksize = setting_dict["input_cache_max_mb"], setting_dict["read_chunksize"]
+    input_result_dict = {"model":r.apply_read_async(thread_pool, load_transcript_model_record, (transcript, exon_coord_file, utr_file, transcript_model_db, 
+                                                                                               chunksize, max_mb))}
+    if track_s[0] == "1":
+        input_result_dict["cov_df"] = r.apply_read_async(thread_pool, read_transcript_cov_df, (input_result_dict["model"], transcript, cov_file, sample_l, 
+                                                                                              bp_window, chrom, setting_dict))
+    if track_s[1] == "1":
+        if vcf.is_vcf(variant_file):
+            input_result_dict["variant_df"] = r.apply_read_async(thread_pool, read_transcript_vcf_variant_df, (input_result_dict["model"], transcript, variant_file,
+                                                                                                              bp_window, chrom, setting_dict))
+        else:
+            input_result_dict["variant_df"] = r.apply_read_async(thread_pool, ch.get_cached_input, (max_mb, [variant_file], v.get_variant_df, transcript, 
+                                                                                                   variant_file, chunksize))
+    if track_s[2] == "1":
+        input_result_dict["protein_domain_df"] = r.apply_read_async(thread_pool, ch.get_cached_input, (max_mb, [protein_domain_file], pds.get_protein_domain_df, 
+                                                                                                      protein_domain_file, [transcript], "Pfam", ["Start","End"], chunksize))
+    
+    return input_result_dict
+
+
+def load_transcript_model_record(transcript, exon_coord_file, utr_file, transcript_model_db, chunksize=100000, max_mb=None):
+
+    '''Load the model of a transcript from a transcript model database or, if there is no database or the transcript is not in it, 
+    read it from the exon coordinate and utr files.
+    
+    Args:
+        | transcript (str): Ensembl transcript ID.
+        | exon_coord_file (str): exon coordinate file path.
+        | utr_file (str): utr file path.
+        | transcript_model_db (str): path to a transcript model database, or None.
+        | chunksize (int): number of utr file rows to read at a time.
+        | max_mb (float): memory budget of the input cache, or None to bypass it.
+    
+    Returns:
+        transcript_model_record (dict): the transcript model (see get_transcript_model_record), whose source_path is the database
+        or the exon coordinate file which the model was loaded from.
+    '''
+    
+    transcript_model_record = None
+    if transcript_model_db != None:
+        transcript_interval_df_l = tdb.get_transcript_interval_df_l(transcript_model_db, transcript)
+        if transcript_interval_df_l == None:
+            r.report("WARNING: {0} is not in {1}, so its exon coordinate and utr files are read.".format(transcript, transcript_model_db))
+        else:
+            transcript_model_record = make_transcript_model_record(transcript, transcript_interval_df_l[0], transcript_interval_df_l[1], transcript_model_db)
+    if transcript_model_record == None:
+        transcript_model_record = get_transcript_model_record(transcript, exon_coord_file, utr_file, chunksize, max_mb)
+    
+    return transcript_model_record
+
+
+def read_transcript_cov_df(model_result, transcript, cov_file, sample_l, bp_window, chrom, setting_dict):
+
+    '''Read the coverage data of a transcript, restricted to a window if there is one. samtools depth and mosdepth files are read
+    using the transcript's exon coordinates, so their reads wait for the transcript model, and are cached under the transcript ID
+    and the file the model was loaded from.
+    
+    Args:
+        | model_result (multiprocessing.pool.AsyncResult): the transcript model record being read (see read_transcript_inputs).
+        | transcript (str): Ensembl transcript ID.
+        | cov_file (str): coverage file path.
+        | sample_l (list of strs or dict): list of sample IDs, or lists of sample IDs indexed by group name.
+        | bp_window (list of ints): None or a [bp_start, bp_end] window.
+        | chrom (str): chromosome of the transcript, or None.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        cov_df (DataFrame): contains the coverage data.
+    '''
+    
+    max_mb = setting_dict["input_cache_max_mb"]
+    depth_format = d.get_depth_format(cov_file)
+    [bp_start, bp_end] = [None, None] if bp_window == None else bp_window
+    if depth_format != None:
+        transcript_model_record = model_result.get()
+        arg_l = [cov_file, depth_format, transcript_model_record["exon_coord_df"], chrom, bp_start, bp_end, sample_l, setting_dict["c_track_group_envelope"],
+                 setting_dict["read_chunksize"]]
+        key_arg_l = arg_l[:2] + [transcript] + arg_l[3:]
+        cov_df = ch.get_keyed_cached_input(max_mb, [cov_file, transcript_model_record["source_path"]], key_arg_l, d.get_cov_df_from_depth, *arg_l)
+    else:
+        cov_df = ch.get_cached_input(max_mb, [cov_file], c.get_cov_df, cov_file, transcript, bp_start, bp_end, sample_l, 
+                                     setting_dict["c_track_group_envelope"], setting_dict["read_chunksize"], max_mb)
+    
+    return cov_df
+
+
+def read_transcript_vcf_variant_df(model_result, transcript, vcf_file, bp_window, chrom, setting_dict):
+
+    '''Read the variants of a transcript from an annotated VCF file. Only the records in the transcript's span (or the window if there is 
+    one) are read, so the read waits for the transcript model. If no chromosome is given, the one recorded in the transcript model is used, 
+    so that an indexed VCF file can be queried.
+    
+    Args:
+        | model_result (multiprocessing.pool.AsyncResult): the transcript model record being read (see read_transcript_inputs).
+        | transcript (str): Ensembl transcript ID.
+        | vcf_file (str): VCF file path.
+        | bp_window (list of ints): None or a [bp_start, bp_end] window.
+        | chrom (str): chromosome of the transcript, or None.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        variant_df (DataFrame): contains the variant information.
+    '''
+    
+    if chrom == None:
+        chrom = model_result.get()["chrom"]
+    if bp_window != None:
+        [bp_start, bp_end] = bp_window
+    else:
+        transcript_model_dict = model_result.get()["transcript_model_dict"]
+        [bp_start, bp_end] = [int(transcript_model_dict["lo_bp_arr"].min()), int(transcript_model_dict["hi_bp_arr"].max())]
+    variant_df = ch.get_cached_input(setting_dict["input_cache_max_mb"], [vcf_file], vcf.get_vcf_variant_df, transcript, vcf_file, chrom, bp_start, 
+                                     bp_end, sorted(setting_dict["v_track_vars_t_or_b"].keys()))
+    
+    return variant_df
+
+
+def save_fig(fig, png_file, dpi, usetex):
+
+    '''Save a figure through its canvas, with the text rendering scoped to the figure. Where matplotlib supports it, usetex is set on each 
+    Text artist of the figure, so the global rc settings are untouched and figures can be saved concurrently from several threads. Older 
+    matplotlib versions only read text.usetex from the rc settings when drawing, so it is set in an rc_context for the duration of the save.
+    
+    Args:
+        | fig (matplotlib.figure.Figure): the figure.
+        | png_file (str): path to write the png file to.
+        | dpi (int): resolution in dots per inch.
+        | usetex (bool): whether to render the text with LaTeX.
+    '''
+    
+    text_l = fig.findobj(mpl.text.Text)
+    if all([hasattr(text, "set_usetex") for text in text_l]):
+        for text in text_l:
+            text.set_usetex(usetex)
+        fig.savefig(png_file, dpi=dpi)
+    else:
+        with mpl.rc_context({"text.usetex":usetex}):
+            fig.savefig(png_file, dpi=dpi)
+
+
+def get_transcript_model_record(transcript, exon_coord_file, utr_file, chunksize=100000, max_mb=None):
+
+    '''Read in the exon positions and the utrs of a transcript, and derive its exon interval model and the exon/utr bounds and colors.
+    
+    Args:
+        | transcript (str): Ensembl transcript ID.
+        | exon_coord_file (str): exon coordinate file path.
+        | utr_file (str): utr file path.
+        | chunksize (int): number of utr file rows to read at a time.
+        | max_mb (float): memory budget of the input cache, or None to bypass it.
+    
+    Returns:
+        transcript_model_record (dict): the transcript, chrom (None if the exon coordinate file does not record it), exon_coord_df, utr_df 
+        (with transcript positions), transcript_model_dict (see transcript.get_transcript_model_dict), exon_bound_color_ll 
+        (see get_exon_bound_color_l) and source_path (exon_coord_file).
+    '''
+
+    exon_coord_df = ch.get_cached_input(max_mb, [exon_coord_file], pd.read_csv, exon_coord_file, index_col="exon")
+    strand = ts.get_transcript_model_dict(exon_coord_df)["strand"]
+    utr_df = ch.get_cached_input(max_mb, [utr_file], u.get_utr_df, utr_file, strand, transcript, chunksize)
+    transcript_model_record = make_transcript_model_record(transcript, exon_coord_df, utr_df, exon_coord_file)
+    
+    return transcript_model_record
+
+
+def make_transcript_model_record(transcript, exon_coord_df, utr_df, source_path):
+
+    '''Derive the exon interval model and the exon/utr bounds and colors of a transcript from its exon and utr intervals.
+    
+    Args:
+        | transcript (str): Ensembl transcript ID.
+        | exon_coord_df (DataFrame): contains the exon base pair and transcript position coordinates, and optionally the chromosome.
+        | utr_df (DataFrame): contains the utr base pair coordinates.
+        | source_path (str): the exon coordinate file or transcript model database which the intervals were read from.
+    
+    Returns:
+        transcript_model_record (dict): the transcript model (see get_transcript_model_record).
+    '''
+
+    #Exon coordinate files made from a coverage file also record the chromosome.
+    chrom = None
+    if "chrom" in exon_coord_df.columns:
+        chrom = str(exon_coord_df["chrom"].iloc[0])
+        exon_coord_df = exon_coord_df.drop("chrom", axis=1)
+    transcript_model_dict = ts.get_transcript_model_dict(exon_coord_df)
+    strand = transcript_model_dict["strand"]
+    #Add the transcript positions to utr_df. 
+    utr_df["start_tp"] = ts.get_tp_arr(transcript_model_dict, utr_df["start_bp"].values)
+    utr_df["end_tp"] = ts.get_tp_arr(transcript_model_dict, utr_df["end_bp"].values)
+    utr_df = utr_df[~utr_df["start_tp"].isnull() & ~utr_df["end_tp"].isnull()]
+    utr_df[["start_tp","end_tp"]] = utr_df[["start_tp","end_tp"]].astype(int)
+    
+    transcript_model_record = {"transcript":transcript, "chrom":chrom, "exon_coord_df":exon_coord_df, "utr_df":utr_df, 
+                               "transcript_model_dict":transcript_model_dict, "exon_bound_color_ll":get_exon_bound_color_l(exon_coord_df, utr_df, strand), 
+                               "source_path":source_path}
+    
+    return transcript_model_record
 
 
 def get_exon_bound_color_l(exon_coord_df, utr_df, strand):
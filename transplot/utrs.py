@@ -1,10 +1,11 @@
 import pandas as pd
+import readers as r
 
 '''
 Functions for the UTRs file.
 '''
 
-def get_utr_df(utr_file, strand, transcript):
+def get_utr_df(utr_file, strand, transcript, chunksize=1000):
     
     '''Read the UTR information into a DataFrame.
     
@@ -12,16 +13,16 @@ def get_utr_df(utr_file, strand, transcript):
         | utr_file (str): path to file containing the utr information.
         | strand (str): whether the transcript is on the positive or negative strand.
         | transcript (str): Ensemble transcript ID.
+        | chunksize (int): number of rows to read at a time.
     
     Returns:
         utr_df: DataFrame
     '''
     
-    utr_df = pd.DataFrame([])
-    utr_df_chunker = pd.read_csv(utr_file,sep=",",chunksize=1000)
-    for utr_df_chunk in utr_df_chunker:
-        utr_df_chunk = utr_df_chunk[utr_df_chunk["Ensembl Transcript ID"] == transcript]
-        utr_df = pd.concat([utr_df, utr_df_chunk], ignore_index=True)
+    utr_col_l = ["Ensembl Transcript ID", "5' UTR Start", "5' UTR End", "3' UTR Start", "3' UTR End"]
+    utr_dtype_dict = {"Ensembl Transcript ID":"category", "5' UTR Start":"float64", "5' UTR End":"float64", "3' UTR Start":"float64", "3' UTR End":"float64"}
+    utr_df = r.read_filtered_csv(utr_file, lambda utr_df_chunk: utr_df_chunk[utr_df_chunk["Ensembl Transcript ID"] == transcript], chunksize,
+                                 usecols=utr_col_l, dtype=utr_dtype_dict, sep=",")
         
     utr_df = utr_df[~utr_df["5' UTR Start"].isnull() | ~utr_df["3' UTR Start"].isnull()]
     #Convert the 0-based start coordinates to 1-based.
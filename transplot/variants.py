@@ -1,37 +1,50 @@
 import matplotlib as mpl
-import matplotlib.pyplot as plt
+import matplotlib.artist
+import matplotlib.collections
+import matplotlib.colorbar
+import matplotlib.colors
+import matplotlib.textpath
+from matplotlib.font_manager import FontProperties
 import pandas as pd
+import numpy as np
 import regex as re
 import sys
+import heapq
+import readers as r
+import textmode as tm
+import os
 
 '''
 Functions specific to variants: reading in the variant information and creating a variants track.
 '''
 
-def get_variant_df(transcript, variant_file):
+key_file_format_l = ["tsv", "html"]
+
+def get_variant_df(transcript, variant_file, chunksize=1000):
     
     '''Read the variant information from a tsv file into a DataFrame.
     
     Args:
         | transcript (str): Ensembl transcript ID.
         | variant_file (str): path to file containing the variants.
+        | chunksize (int): number of rows to read at a time.
     
     Returns:
         variant_df (DataFrame): contains the variant information.
     '''
     
-    variant_df = pd.DataFrame([])
-    variant_df_chunker = pd.read_csv(variant_file, sep="\t", chunksize=1000)
-    for variant_df_chunk in variant_df_chunker:
-        variant_df_chunk = variant_df_chunk[variant_df_chunk["featureID"] == transcript]
-        variant_df = pd.concat([variant_df, variant_df_chunk], ignore_index=True)
+    variant_col_l = ["CHROM", "pos", "featureID", "effect", "dnachange", "prot_change"]
+    variant_dtype_dict = {"CHROM":str, "pos":"int64", "featureID":"category", "effect":str, "dnachange":str, "prot_change":str}
+    variant_df = r.read_filtered_csv(variant_file, lambda variant_df_chunk: variant_df_chunk[variant_df_chunk["featureID"] == transcript], chunksize,
+                                     usecols=variant_col_l, dtype=variant_dtype_dict, sep="\t")
+    variant_df["featureID"] = variant_df["featureID"].astype(str)
     
     variant_df.fillna("NULL", inplace=True)
     
     return variant_df
 
 
-def make_track(variant_track, transcript_len, bound_l, color_l, edge_color_l, variant_df, setting_dict, variant_key):
+def make_track(variant_track, transcript_len, bound_l, color_l, edge_color_l, variant_df, setting_dict, variant_key, key_file=None, key_tp_offset=0):
 
     '''Make the variants track.
     
@@ -44,6 +57,10 @@ def make_track(variant_track, transcript_len, bound_l, color_l, edge_color_l, va
         | variant_df (DataFrame): contains the variants information.
         | setting_dict (dictionary): settings for making the png.
         | variant_key (matplotlib.axes.Axes): axis for the variants key.
+        | key_file (str): if not None, path to write the full variant key to, as a tsv or html table depending on its extension (see 
+          write_variant_key_file).
+        | key_tp_offset (int): offset added to the tp column of variant_df in the key file, e.g. the offset of a window which the tps are
+          relative to (see window.get_window_tp_offset), so that the file reports transcript positions.
     '''
 
     #(1) Make the color bar.
@@ -51,15 +68,23 @@ def make_track(variant_track, transcript_len, bound_l, color_l, edge_color_l, va
     norm = mpl.colors.BoundaryNorm(bound_l, cmap.N)
     cb = mpl.colorbar.ColorbarBase(variant_track, cmap=cmap, norm=norm, boundaries=bound_l, spacing='proportional',
                                    orientation='horizontal', drawedges=False)
-    plt.setp(variant_track.get_xticklabels(), visible=False)
-    plt.rc('text', usetex=True)
-    variant_track.set_ylabel(setting_dict["v_track_y_axis_label"], rotation='horizontal', ha='right', va='center', size=setting_dict["v_track_fontsize"])
-    
-    #(2) Annotate variant track with variants.
-    annotate_track_with_variants(variant_track, variant_df, transcript_len, setting_dict)
+    mpl.artist.setp(variant_track.get_xticklabels(), visible=False)
+    variant_track.set_ylabel(tm.get_text(setting_dict["v_track_y_axis_label"], setting_dict["text_mode"]), rotation='horizontal', ha='right', va='center', size=setting_dict["v_track_fontsize"])
     
+    #(2) Annotate variant track with variants, or with their density if there are too many to annotate individually.
     #(3) Make the variant annotations key.
-    make_variant_annotations_key(variant_key, variant_df, setting_dict)
+    density_min_variants = setting_dict["v_track_density_min_variants"]
+    if density_min_variants != None and variant_df.shape[0] > 0 and variant_df.shape[0] >= density_min_variants:
+        print("Drawing the density of {0} variants.".format(variant_df.shape[0]))
+        variant_density_df = annotate_track_with_variant_density(variant_track, variant_df, transcript_len, setting_dict)
+        make_variant_density_key(variant_key, variant_df, variant_density_df, setting_dict)
+    else:
+        annotate_track_with_variants(variant_track, variant_df, transcript_len, setting_dict)
+        make_variant_annotations_key(variant_key, variant_df, setting_dict, key_file)
+    
+    #(4) Write the full variant key to a file.
+    if key_file != None:
+        write_variant_key_file(variant_df, key_file, setting_dict, key_tp_offset)
 
 
 def annotate_track_with_variants(variant_track, variant_df, transcript_len, setting_dict):
@@ -79,43 +104,68 @@ def annotate_track_with_variants(variant_track, variant_df, transcript_len, sett
     if variant_df.shape[0] == 0:
         return variant_track
     
-    #Add columns to variant_df for annotating variants with arrows: ID, axes x coordinates, arrow bin.
-    variant_df["id"] = pd.Series([str(i) for i in range(1,variant_df.shape[0]+1)], index=variant_df.index)
-    variant_df["top"] = variant_df.apply(lambda x: 1 if setting_dict["v_track_vars_t_or_b"][x["effect"]] == "T" else 0,
-                                         axis=1) #Column for whether variant should be annotated with a top or bottom arrow.
-    #Add column to determine whether each arrow should be merged with the previous.
-    variant_df["trans_pos_pc"] = variant_df["tp"]/transcript_len #axes x coordinates.
-    get_display_from_axes_coords = lambda axes_x_coord: variant_track.transAxes.transform((axes_x_coord,0))[0] - variant_track.transAxes.transform((0,0))[0]
-    variant_df["num_pixels_diff"] = variant_df["trans_pos_pc"].diff().apply(get_display_from_axes_coords)
-    variant_df["merge_wt_prev"] = variant_df["num_pixels_diff"] <= setting_dict["v_track_merge_pixel_thresh"]
-    variant_df["arrow_bin"] = [0]*len(variant_df.index)
-    arrow_bin = 1
-    variant_df.at[0,"arrow_bin"] = arrow_bin
-    for i in range(1,len(variant_df.index)):
-        if variant_df.iloc[i]["merge_wt_prev"] == False or variant_df.iloc[i]["top"] != variant_df.iloc[i-1]["top"]:
-            arrow_bin += 1
-        variant_df.at[i,"arrow_bin"] = arrow_bin
-    
     #Create new dataframe where each row corresponds to 1 arrow.
-    x_pos_s = variant_df.groupby("arrow_bin")["trans_pos_pc"].mean()
-    text_s = variant_df.groupby("arrow_bin").apply(lambda x: ",".join(x["id"].tolist())) #Make the annotation text string for a variant arrow.
-    top_s = variant_df.groupby("arrow_bin").apply(lambda x: x["top"].tolist()[0]) #Get whether the arrow is a top or bottom arrow.   
-    heights_s = get_arrow_height_s(top_s, setting_dict)
-    variant_annotation_df = pd.concat([x_pos_s, text_s, top_s, heights_s],axis=1)
-    variant_annotation_df.rename(columns={"trans_pos_pc":"x", 0:"text", 1:"top", 2:"height"}, inplace=True)
+    variant_annotation_df = get_variant_annotation_df(variant_track, variant_df, transcript_len, setting_dict)
 
     #Annotate the variants.
     variant_annotation_df.apply(axis=1, func=annotate_track_with_arrow, variant_track=variant_track, setting_dict=setting_dict)    
 
     #Add text to indicate which variants types are annotated above and below the colorbar.
-    variant_track.text(setting_dict["v_track_vars_text_top_x"], setting_dict["v_track_vars_text_top_y"], setting_dict["v_track_vars_text_top"],
-                        ha='center', va='bottom', size=setting_dict["v_track_fontsize"])
-    variant_track.text(setting_dict["v_track_vars_text_bot_x"], setting_dict["v_track_vars_text_bot_y"], setting_dict["v_track_vars_text_bot"],
-                        ha='center', va='top', size=setting_dict["v_track_fontsize"])
+    add_vars_text(variant_track, setting_dict)
     
     return variant_track
 
 
+def get_variant_annotation_df(variant_track, variant_df, transcript_len, setting_dict):
+
+    '''Bin the variants into arrows. Consecutive variants which are annotated on the same side of the colorbar and are within
+    v_track_merge_pixel_thresh pixels of each other share an arrow. The arrow heights are assigned so that labels do not overlap
+    if v_track_arrow_height_mode is "sweep" (see get_swept_arrow_height_s), or cycle through v_track_num_arrow_heights if it is
+    "cycle". The binning is done with array operations: the distances between consecutive variants are converted to pixels with 1
+    affine transform, a new arrow starts wherever a variant is not merged with the previous one, so the arrow bins are a
+    cumulative sum, and the arrows are made with 1 grouped aggregation.
+    
+    Args:
+        | variant_track (matplotlib.axes.Axes): axis for the variant track.
+        | variant_df (DataFrame): contains the variant information, sorted by tp and indexed from 0. The id, top, trans_pos_pc, 
+          num_pixels_diff, merge_wt_prev and arrow_bin columns are added to it.
+        | transcript_len (int): transcript length.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        variant_annotation_df (DataFrame): 1 row per arrow, indexed by arrow bin, with the columns x (axes x coordinate), text (the 
+        comma-separated IDs of its variants), top (1 for a top arrow, 0 for a bottom arrow) and height.
+    '''
+
+    #Add columns to variant_df for annotating variants with arrows: ID, axes x coordinates, arrow bin.
+    variant_df["id"] = np.arange(1, variant_df.shape[0]+1).astype(str)
+    top_or_bot_s = variant_df["effect"].map(setting_dict["v_track_vars_t_or_b"])
+    if top_or_bot_s.isnull().any():
+        print("WARNING: no v_track_vars_t_or_b setting for {0}, so annotated below the colorbar.".format(", ".join(variant_df.loc[top_or_bot_s.isnull(),"effect"].unique())))
+    variant_df["top"] = (top_or_bot_s == "T").astype(int) #Column for whether variant should be annotated with a top or bottom arrow.
+    #Add column to determine whether each arrow should be merged with the previous.
+    variant_df["trans_pos_pc"] = variant_df["tp"]/transcript_len #axes x coordinates.
+    trans_pos_pc_diff_arr = variant_df["trans_pos_pc"].diff().values
+    variant_df["num_pixels_diff"] = (variant_track.transAxes.transform(np.column_stack([trans_pos_pc_diff_arr, np.zeros(len(trans_pos_pc_diff_arr))]))[:,0] - 
+                                     variant_track.transAxes.transform((0,0))[0])
+    variant_df["merge_wt_prev"] = variant_df["num_pixels_diff"] <= setting_dict["v_track_merge_pixel_thresh"]
+    new_bin_s = ~variant_df["merge_wt_prev"] | (variant_df["top"] != variant_df["top"].shift(1))
+    new_bin_s.iloc[0] = True
+    variant_df["arrow_bin"] = new_bin_s.astype(int).cumsum()
+    
+    variant_annotation_df = variant_df.groupby("arrow_bin").agg({"trans_pos_pc":"mean", "id":",".join, "top":"first"})
+    variant_annotation_df = variant_annotation_df.rename(columns={"trans_pos_pc":"x", "id":"text"})[["x","text","top"]]
+    if setting_dict["v_track_arrow_height_mode"] == "sweep":
+        #An arrow whose label is left out is drawn without its label, at the lowest height.
+        height_s = get_swept_arrow_height_s(variant_annotation_df, variant_track, setting_dict)
+        variant_annotation_df.loc[height_s.isnull(), "text"] = ""
+        variant_annotation_df["height"] = height_s.fillna(0).astype(int)
+    else:
+        variant_annotation_df["height"] = get_arrow_height_s(variant_annotation_df["top"], setting_dict)
+    
+    return variant_annotation_df
+
+
 def get_arrow_height_s(top_s, setting_dict):
     
     '''Get the height of the arrow.
@@ -142,6 +192,63 @@ def get_arrow_height_s(top_s, setting_dict):
     
     return height_s
 
+
+
+def get_swept_arrow_height_s(variant_annotation_df, variant_track, setting_dict):
+
+    '''Get arrow heights at which the labels on each side of the colorbar do not overlap. The width of a label character is measured
+    once, and each label spans its number of characters, plus v_track_arrow_label_pad_chars, centred on its arrow. The labels are
+    swept in order of their left edges, and each takes the lowest height whose previous label ends before it starts; the heights in use
+    are kept in a heap ordered by where their last label ends, so placing n labels takes O(n log n) time and uses the fewest heights.
+    At most v_track_num_arrow_heights heights are used: a label which does not fit in any of them is left out, rather than placed
+    where it would overlap another label. Its variants are still listed in the key.
+    
+    Args:
+        | variant_annotation_df (DataFrame): 1 row per arrow, with the columns x (axes x coordinate), text and top.
+        | variant_track (matplotlib.axes.Axes): axis for the variant track.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        height_s (Series): the height of each arrow, from 0 (nearest the colorbar) to v_track_num_arrow_heights - 1, or NaN if its label
+        is left out.
+    '''
+    
+    #Convert the label widths from points to axes coordinates, using the width of the figure when it is saved.
+    digit_str = "0123456789,"
+    char_points = mpl.textpath.TextToPath().get_text_width_height_descent(digit_str, FontProperties(size=setting_dict["v_track_arrow_fontsize"]), 
+                                                                           ismath=False)[0]/len(digit_str)
+    char_width = char_points/(72.0*setting_dict["fig_width_inches"]*variant_track.get_position().width)
+    half_width_arr = (variant_annotation_df["text"].str.len().values + setting_dict["v_track_arrow_label_pad_chars"])*char_width/2.0
+    start_arr = variant_annotation_df["x"].values - half_width_arr
+    end_arr = variant_annotation_df["x"].values + half_width_arr
+    
+    top_arr = variant_annotation_df["top"].values
+    height_arr = np.full(len(top_arr), np.nan)
+    for top in [0,1]:
+        idx_arr = np.where(top_arr == top)[0]
+        idx_arr = idx_arr[np.argsort(start_arr[idx_arr], kind="mergesort")]
+        busy_heap, free_heap, num_heights = [], [], 0
+        for idx in idx_arr:
+            #Free the heights whose last label ends before this label starts.
+            while len(busy_heap) > 0 and busy_heap[0][0] < start_arr[idx]:
+                heapq.heappush(free_heap, heapq.heappop(busy_heap)[1])
+            if len(free_heap) > 0:
+                height = heapq.heappop(free_heap)
+            elif num_heights < setting_dict["v_track_num_arrow_heights"]:
+                height, num_heights = num_heights, num_heights + 1
+            else:
+                continue
+            heapq.heappush(busy_heap, (end_arr[idx], height))
+            height_arr[idx] = height
+    num_left_out = int(np.isnan(height_arr).sum())
+    if num_left_out > 0:
+        print("WARNING: {0} of {1} arrow labels do not fit in {2} arrow heights, so they are left out. Raise v_track_num_arrow_heights, or lower v_track_density_min_variants to draw the variant density.".format(
+              num_left_out, len(height_arr), setting_dict["v_track_num_arrow_heights"]))
+    
+    height_s = pd.Series(height_arr, index=variant_annotation_df.index)
+    
+    return height_s
+
     
 def annotate_track_with_arrow(arrow_bin, variant_track, setting_dict):
 
@@ -156,27 +263,151 @@ def annotate_track_with_arrow(arrow_bin, variant_track, setting_dict):
     if arrow_bin["top"] == 1:
         variant_track.annotate(arrow_bin["text"], xy=(arrow_bin["x"], setting_dict["v_track_t_arrow_head"]), xycoords='data',
                                 xytext=(arrow_bin["x"], setting_dict["v_track_t_start"]+arrow_bin["height"]*setting_dict["v_track_t_inc"]), textcoords='data',
-                                ha='center', arrowprops=dict(arrowstyle=setting_dict["v_track_arrow_style"], alpha=0.75), fontsize=8)
+                                ha='center', arrowprops=dict(arrowstyle=setting_dict["v_track_arrow_style"], alpha=0.75), fontsize=setting_dict["v_track_arrow_fontsize"])
     else:
         variant_track.annotate(arrow_bin["text"], xy=(arrow_bin["x"], setting_dict["v_track_b_arrow_head"]), xycoords='data',
                                 xytext=(arrow_bin["x"], setting_dict["v_track_b_start"]-arrow_bin["height"]*setting_dict["v_track_b_inc"]), textcoords='data',
-                                ha='center', arrowprops=dict(arrowstyle=setting_dict["v_track_arrow_style"], alpha=0.75), fontsize=8)
+                                ha='center', arrowprops=dict(arrowstyle=setting_dict["v_track_arrow_style"], alpha=0.75), fontsize=setting_dict["v_track_arrow_fontsize"])
+    
+
+def annotate_track_with_variant_density(variant_track, variant_df, transcript_len, setting_dict):
+
+    '''Annotate the variants track with the density of the variants, as stacked bars above and below the colorbar. The variants are 
+    binned by transcript position at v_track_density_pixels_per_bin pixels per bin, and the bars of every bin and consequence are drawn
+    as 1 collection, so the drawing time does not grow with the number of variants.
+    
+    Args:
+        | variant_track (matplotlib.axes.Axes): axis for the variant track.
+        | variant_df (DataFrame): contains the variant information.
+        | transcript_len (int): transcript length.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        variant_density_df (DataFrame): the bars (see get_variant_density_df), with a color column.
+    '''
+    
+    track_width_pixels = setting_dict["fig_width_inches"] * setting_dict["fig_dpi"] * variant_track.get_position().width
+    num_bins = int(max(1, min(transcript_len, np.ceil(track_width_pixels/setting_dict["v_track_density_pixels_per_bin"]))))
+    variant_density_df = get_variant_density_df(variant_df, transcript_len, num_bins, setting_dict)
+    color_l = setting_dict["v_track_density_color_l"]
+    effect_l = get_density_effect_l(variant_df, setting_dict)
+    variant_density_df["color"] = variant_density_df["effect"].map(dict([(effect_l[i], color_l[i % len(color_l)]) for i in range(len(effect_l))]))
+    
+    #The bars rise from the top of the colorbar to the highest top arrow, and fall from the bottom to the lowest bottom arrow.
+    max_count = float(variant_density_df["count_end"].max())
+    t_len = setting_dict["v_track_t_start"] + (setting_dict["v_track_num_arrow_heights"]-1)*setting_dict["v_track_t_inc"] - 1
+    b_len = -(setting_dict["v_track_b_start"] - (setting_dict["v_track_num_arrow_heights"]-1)*setting_dict["v_track_b_inc"])
+    top_arr = variant_density_df["top"].values == 1
+    [y_start_arr, y_end_arr] = [np.where(top_arr, 1 + t_len*variant_density_df[col].values/max_count, -b_len*variant_density_df[col].values/max_count)
+                                for col in ["count_start","count_end"]]
+    x_start_arr = variant_density_df["bin"].values/float(num_bins)
+    x_end_arr = (variant_density_df["bin"].values + 1)/float(num_bins)
+    vert_arr = np.stack([np.column_stack([x_start_arr, y_start_arr]), np.column_stack([x_start_arr, y_end_arr]), 
+                         np.column_stack([x_end_arr, y_end_arr]), np.column_stack([x_end_arr, y_start_arr])], axis=1)
+    bar_collection = mpl.collections.PolyCollection(vert_arr, facecolors=variant_density_df["color"].tolist(), edgecolors="none", 
+                                                    transform=variant_track.transAxes, clip_on=False)
+    variant_track.add_collection(bar_collection, autolim=False)
+    
+    #Add text to indicate which variants types are drawn above and below the colorbar.
+    add_vars_text(variant_track, setting_dict)
+    
+    return variant_density_df
+
+
+def add_vars_text(variant_track, setting_dict):
+
+    '''Add text to the variants track to indicate which variant types are annotated above and below the colorbar.'''
+
+    variant_track.text(setting_dict["v_track_vars_text_top_x"], setting_dict["v_track_vars_text_top_y"], 
+                       tm.get_text(setting_dict["v_track_vars_text_top"], setting_dict["text_mode"]),
+                        ha='center', va='bottom', size=setting_dict["v_track_fontsize"])
+    variant_track.text(setting_dict["v_track_vars_text_bot_x"], setting_dict["v_track_vars_text_bot_y"], 
+                       tm.get_text(setting_dict["v_track_vars_text_bot"], setting_dict["text_mode"]),
+                        ha='center', va='top', size=setting_dict["v_track_fontsize"])
+
+
+def get_density_effect_l(variant_df, setting_dict):
+
+    '''Get the consequences in the order in which their bars are stacked and colored: those in v_track_vars_t_or_b, then any others.'''
+    
+    effect_l = sorted(setting_dict["v_track_vars_t_or_b"].keys())
+    
+    return effect_l + sorted(set(variant_df["effect"].unique()) - set(effect_l))
+
+
+def get_variant_density_df(variant_df, transcript_len, num_bins, setting_dict):
+
+    '''Count the variants of each consequence in equal-width bins of transcript position, and stack the counts of each bin on each
+    side of the colorbar.
+    
+    Args:
+        | variant_df (DataFrame): contains the variant information.
+        | transcript_len (int): transcript length.
+        | num_bins (int): number of bins.
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        variant_density_df (DataFrame): 1 row per bin and consequence, with the columns bin, effect, count, top (1 for a bar above the 
+        colorbar, 0 for below), and count_start and count_end, the extent of the bar in its stack.
+    '''
+    
+    bin_arr = np.clip(np.floor(variant_df["tp"].values*num_bins/float(transcript_len)), 0, num_bins-1).astype(int)
+    variant_density_df = pd.DataFrame({"bin":bin_arr, "effect":variant_df["effect"].values}).groupby(["bin","effect"]).size().reset_index(name="count")
+    variant_density_df["top"] = (variant_density_df["effect"].map(setting_dict["v_track_vars_t_or_b"]) == "T").astype(int)
+    effect_l = get_density_effect_l(variant_df, setting_dict)
+    variant_density_df["effect_idx"] = variant_density_df["effect"].map(dict(zip(effect_l, range(len(effect_l)))))
+    variant_density_df.sort_values(by=["bin","top","effect_idx"], inplace=True)
+    variant_density_df["count_end"] = variant_density_df.groupby(["bin","top"])["count"].cumsum()
+    variant_density_df["count_start"] = variant_density_df["count_end"] - variant_density_df["count"]
+    variant_density_df.index = range(len(variant_density_df.index))
+    
+    return variant_density_df[["bin","effect","count","top","count_start","count_end"]]
+
+
+def make_variant_density_key(variant_key, variant_df, variant_density_df, setting_dict):
+
+    '''Make the key of a variant density track: the number of variants of each consequence, in the color of its bars, and the number 
+    of variants in the highest bar.
+    
+    Args:
+        | variant_key (matplotlib.axes.Axes): axis for the variant key.
+        | variant_df (DataFrame): contains the variant information.
+        | variant_density_df (DataFrame): the bars, with their colors (see annotate_track_with_variant_density).
+        | setting_dict (dictionary): settings for making the png.
+    
+    Returns:
+        variant_key (matplotlib.axes.Axes): axis for the variant key.
+    '''
     
+    variant_key.set_axis_off()
+    count_s = variant_df["effect"].value_counts()
+    color_s = variant_density_df.drop_duplicates(subset=["effect"]).set_index("effect")["color"]
+    abbrev_dict = setting_dict["v_track_var_abbrevs"] if "v_track_var_abbrevs" in setting_dict.keys() else {}
+    effect_l = [effect for effect in get_density_effect_l(variant_df, setting_dict) if effect in count_s.index]
+    var_txt_str_l = ["{0} ({1}): {2}".format(effect, abbrev_dict[effect], count_s[effect]) if effect in abbrev_dict else "{0}: {1}".format(effect, count_s[effect])
+                     for effect in effect_l]
+    var_txt_str_l.append("Highest bar: {0} variants".format(variant_density_df["count_end"].max()))
+    if setting_dict["text_mode"] == "latex":
+        var_txt_str_l = [mark_up_special_chars(var_txt_str) for var_txt_str in var_txt_str_l]
+    
+    return make_variant_annotations_key_grid(variant_key, var_txt_str_l, setting_dict, [color_s[effect] for effect in effect_l] + ["black"])
 
-def make_variant_annotations_key(variant_key, variant_df, setting_dict):
+
+def make_variant_annotations_key(variant_key, variant_df, setting_dict, key_file=None):
     
-    '''Make a variant annotations key.
+    '''Make a variant annotations key. In latex text mode the key is 1 LaTeX tabular, otherwise it is a grid of plain text entries.
+    The key shows at most v_key_max_entries variants, followed by an entry for the number of variants left out.
     
     Args:
         | variant_key (matplotlib.axes.Axes): axis for the variant key.
         | variant_df (DataFrame): contains the variant information.
         | setting_dict (dictionary): settings for making the png.
+        | key_file (str): path of the file the full key is written to, which the entry for the variants left out refers to, or None.
     
     Returns:
         variant_key (matplotlib.axes.Axes): axis for the variant key.
     '''
     
-    plt.rc('text',usetex=True)
     variant_key.set_axis_off()
     variant_key_txt = r'''\begin{tabular}{''' + 'l'*setting_dict["v_key_num_cols"] + '''} \\\\ ''' 
     #variant_df["var_type_abbrev"] = variant_df.apply(lambda x: setting_dict["v_track_var_abbrevs"][x["effect"]] 
@@ -184,10 +415,19 @@ def make_variant_annotations_key(variant_key, variant_df, setting_dict):
     variant_df["var_type_abbrev"] = variant_df.apply(lambda x: setting_dict["v_track_var_abbrevs"][x["effect"]] 
                                                      if "v_track_var_abbrevs" in setting_dict.keys() else "", axis=1) #Abbreviate a variant type.
     variant_df["variant_txt_str"] = variant_df["id"] + ": " + variant_df["dnachange"] + ", " + variant_df["prot_change"] + ", (" + variant_df["var_type_abbrev"] + ")"
-    variant_df["variant_txt_str"] = variant_df["variant_txt_str"].map(mark_up_special_chars)    
-    add_multicol = lambda cell_txt: "\multicolumn{2}{l}{" + cell_txt + "}" if len(cell_txt) > setting_dict["v_key_max_chars_per_col"] else cell_txt
-    variant_df["variant_txt_str"] = variant_df["variant_txt_str"].map(add_multicol)
     var_txt_str_l = variant_df["variant_txt_str"].tolist()
+    max_entries = setting_dict["v_key_max_entries"]
+    if max_entries != None and len(var_txt_str_l) > max_entries:
+        num_left_out = len(var_txt_str_l) - max_entries
+        if key_file != None:
+            var_txt_str_l = var_txt_str_l[:max_entries] + ["... {0} more (see {1})".format(num_left_out, os.path.basename(key_file))]
+        else:
+            print("WARNING: the variant key shows {0} of {1} variants. Set v_key_file_format to write the full key to a file.".format(max_entries, len(variant_df.index)))
+            var_txt_str_l = var_txt_str_l[:max_entries] + ["... {0} more".format(num_left_out)]
+    if setting_dict["text_mode"] != "latex":
+        return make_variant_annotations_key_grid(variant_key, var_txt_str_l, setting_dict)
+    add_multicol = lambda cell_txt: "\multicolumn{2}{l}{" + cell_txt + "}" if len(cell_txt) > setting_dict["v_key_max_chars_per_col"] else cell_txt
+    var_txt_str_l = [add_multicol(mark_up_special_chars(var_txt_str)) for var_txt_str in var_txt_str_l]
     col_idx = 0
     for var_txt_str in var_txt_str_l:
         cols_for_str = 1
@@ -210,6 +450,76 @@ def make_variant_annotations_key(variant_key, variant_df, setting_dict):
     return variant_key
 
 
+def write_variant_key_file(variant_df, key_file, setting_dict, tp_offset=0):
+
+    '''Write the full variant key to a tsv file or, if its name ends in .html, an html table. Each row is a variant, with its ID, the
+    label of the arrow it is annotated by (the comma-separated IDs of the arrow's variants), and its position, consequence and changes.
+    
+    Args:
+        | variant_df (DataFrame): contains the variant information. In the variant density mode there are no arrows, so the IDs are the
+          row numbers and the arrow column is empty.
+        | key_file (str): path to write the key to.
+        | setting_dict (dictionary): settings for making the png.
+        | tp_offset (int): offset added to the tp column, for variant_df whose tps are relative to a window.
+    '''
+    
+    key_df = variant_df.copy()
+    if "tp" in key_df.columns:
+        key_df["tp"] = key_df["tp"] + tp_offset
+    if "id" not in key_df.columns:
+        key_df["id"] = np.arange(1, key_df.shape[0]+1).astype(str)
+    key_df["arrow"] = key_df["arrow_bin"].map(key_df.groupby("arrow_bin")["id"].agg(",".join)) if "arrow_bin" in key_df.columns else ""
+    abbrev_dict = setting_dict["v_track_var_abbrevs"] if "v_track_var_abbrevs" in setting_dict.keys() else {}
+    key_df["effect_abbrev"] = key_df["effect"].map(lambda effect: abbrev_dict[effect] if effect in abbrev_dict else "")
+    key_df = key_df[[col for col in ["id","arrow","CHROM","bp","tp","effect","effect_abbrev","dnachange","prot_change"] if col in key_df.columns]]
+    if key_file.endswith(".html"):
+        key_df.to_html(key_file, index=False)
+    else:
+        key_df.to_csv(key_file, sep="\t", index=False)
+    print("Written variant key to {0}".format(key_file))
+
+
+def make_variant_annotations_key_grid(variant_key, var_txt_str_l, setting_dict, color_l=None):
+
+    '''Make a variant annotations key as a grid of plain text entries, laid out like the LaTeX tabular: v_key_num_cols left-aligned
+    columns as wide as their longest entry, where an entry longer than v_key_max_chars_per_col spans 2 columns, a blank first row, and
+    the grid centred on v_key_x. Widths are estimated from the number of characters.
+    
+    Args:
+        | variant_key (matplotlib.axes.Axes): axis for the variant key.
+        | var_txt_str_l (list of strs): the text of each entry.
+        | setting_dict (dictionary): settings for making the png.
+        | color_l (list of strs): the color of each entry, or None for black.
+    
+    Returns:
+        variant_key (matplotlib.axes.Axes): axis for the variant key.
+    '''
+    
+    if color_l == None:
+        color_l = ["black"]*len(var_txt_str_l)
+    num_cols = setting_dict["v_key_num_cols"]
+    #Place the entries in rows and columns.
+    cell_l, row_idx, col_idx = [], 1, 0
+    for var_txt_str in var_txt_str_l:
+        cols_for_str = 2 if len(var_txt_str) > setting_dict["v_key_max_chars_per_col"] else 1
+        if col_idx + cols_for_str > num_cols:
+            row_idx, col_idx = row_idx + 1, 0
+        cell_l.append([row_idx, col_idx, cols_for_str, var_txt_str])
+        col_idx += cols_for_str
+    col_chars_l = [max([len(cell[3]) for cell in cell_l if cell[1] == i and cell[2] == 1] + [0]) + 2 for i in range(num_cols)]
+    
+    #Convert character counts and rows to axes coordinates.
+    fig_width_inches, fig_height_inches = setting_dict["fig_width_inches"], setting_dict["fig_height_inches"]
+    char_width = 0.55*setting_dict["v_key_fontsize"]/72.0/(fig_width_inches*variant_key.get_position().width)
+    row_height = 1.2*setting_dict["v_key_fontsize"]/72.0/(fig_height_inches*variant_key.get_position().height)
+    x_l = [setting_dict["v_key_x"] - char_width*sum(col_chars_l)/2.0 + char_width*sum(col_chars_l[:i]) for i in range(num_cols)]
+    for [row_idx, col_idx, cols_for_str, var_txt_str], color in zip(cell_l, color_l):
+        variant_key.text(x_l[col_idx], setting_dict["v_key_y"] - row_idx*row_height, var_txt_str, va='top', ha='left', color=color,
+                         size=setting_dict["v_key_fontsize"], transform=variant_key.transAxes)
+
+    return variant_key
+
+
 def mark_up_special_chars(some_text):
     
     '''Mark up special characters for latex text.
@@ -0,0 +1,195 @@
+import pandas as pd
+import gzip
+import os
+import readers as r
+try:
+    from urllib.parse import unquote
+except ImportError:
+    from urllib import unquote
+try:
+    import pysam
+except ImportError:
+    pysam = None
+
+
+'''
+Functions for reading the variants of a transcript from an annotated VCF file (plain or bgzipped), as an alternative to the variant
+tsv file. The consequence annotations of Ensembl VEP (the CSQ INFO field) or SnpEff (ANN) are parsed into the columns of the variant
+tsv file. If pysam is installed and the VCF has a tabix or CSI index, only the records in the transcript's span are fetched;
+otherwise the file is streamed and reading stops once it has passed the span, so the VCF should be sorted. Either way, a record is in
+the span if its reference allele overlaps it, e.g. a deletion whose anchor base lies just before the first exon.
+'''
+
+variant_col_l = ["CHROM", "pos", "featureID", "effect", "dnachange", "prot_change"]
+#The annotation subfields which hold the transcript, consequence, HGVS c. and HGVS p. notation, for VEP and SnpEff.
+ann_field_dict = {"CSQ":["Feature", "Consequence", "HGVSc", "HGVSp"], "ANN":["Feature_ID", "Annotation", "HGVS.c", "HGVS.p"]}
+
+
+def is_vcf(variant_file):
+
+    '''Get whether a variant file is a VCF file, from its name (.vcf or .vcf.gz).'''
+
+    return variant_file.endswith(".vcf") or variant_file.endswith(".vcf.gz")
+
+
+def get_ann_format_dict(header_line_l):
+
+    '''Get the consequence annotation fields declared in a VCF header.
+
+    Args:
+        header_line_l (list of strs): the ## lines of the header.
+
+    Returns:
+        ann_format_dict (dict): the names of the subfields of each annotation field (CSQ and/or ANN), indexed by field.
+    '''
+
+    ann_format_dict = {}
+    for header_line in header_line_l:
+        for field in ann_field_dict.keys():
+            if header_line.startswith("##INFO=<ID={0},".format(field)):
+                description = header_line.split("Description=", 1)[1]
+                format_str = description.split("Format:", 1)[1] if "Format:" in description else description.split(":", 1)[1]
+                ann_format_dict[field] = [name.strip(" '\"<>") for name in format_str.strip().rstrip(">").strip("\"'").split("|")]
+
+    return ann_format_dict
+
+
+def get_info_ann_l(info_str, field):
+
+    '''Get the annotations in a field of an INFO column, e.g. the comma-separated CSQ annotations.'''
+
+    for info in info_str.split(";"):
+        if info.startswith(field + "="):
+            return info[len(field)+1:].split(",")
+
+    return []
+
+
+def get_transcript_ann_row_l(chrom, pos, ann_l, subfield_l, transcript, effect_l):
+
+    '''Get a variant row for each annotation of a record which is on a transcript.
+
+    Args:
+        | chrom (str): chromosome of the record.
+        | pos (int): position of the record.
+        | ann_l (list of strs): the record's annotations, with |-separated subfields.
+        | subfield_l (list of strs): names of the subfields.
+        | transcript (str): Ensembl transcript ID. Annotations of versioned IDs (e.g. ENST00000457016.6) match it too.
+        | effect_l (list of strs): consequences to keep, or None for every consequence.
+
+    Returns:
+        row_l (list of lists): rows with the columns CHROM, pos, featureID, effect, dnachange and prot_change.
+    '''
+
+    [feature_idx, effect_idx, dnachange_idx, prot_change_idx] = [subfield_l.index(name) for name in ann_field_dict["CSQ" if "Feature" in subfield_l else "ANN"]]
+    row_l = []
+    for ann in ann_l:
+        value_l = ann.split("|")
+        if len(value_l) < len(subfield_l) or transcript not in [value_l[feature_idx], value_l[feature_idx].split(".")[0]]:
+            continue
+        #Multiple consequences are joined by &, most severe first.
+        effect_l_for_ann = value_l[effect_idx].split("&")
+        if effect_l != None:
+            effect_l_for_ann = [effect for effect in effect_l_for_ann if effect in effect_l]
+            if len(effect_l_for_ann) == 0:
+                continue
+        #HGVS notation is prefixed by the feature ID (e.g. ENST00000457016.6:c.4478C>T), and VEP escapes = as %3D.
+        [dnachange, prot_change] = [unquote(value_l[idx].split(":")[-1]) if value_l[idx] != "" else "NULL" for idx in [dnachange_idx, prot_change_idx]]
+        row_l.append([chrom, pos, transcript, effect_l_for_ann[0], dnachange, prot_change])
+
+    return row_l
+
+
+def get_vcf_variant_df(transcript, vcf_file, chrom, bp_start, bp_end, effect_l=None):
+
+    '''Read the variants of a transcript from an annotated VCF file, in the form returned by variants.get_variant_df.
+
+    Args:
+        | transcript (str): Ensembl transcript ID.
+        | vcf_file (str): path to the VCF file, which may be bgzipped.
+        | chrom (str): chromosome of the transcript. If None, the whole file is read.
+        | bp_start (int): first base pair of the transcript's span. Records whose reference allele overlaps the span are read.
+        | bp_end (int): last base pair of the transcript's span.
+        | effect_l (list of strs): consequences to keep (e.g. the keys of the v_track_vars_t_or_b setting), or None for every consequence.
+
+    Returns:
+        variant_df (DataFrame): contains the variant information, 1 row per annotated allele.
+    '''
+
+    r.report("Reading in variants for {0} from {1}...".format(transcript, vcf_file))
+    if pysam != None and chrom != None and (os.path.exists(vcf_file + ".tbi") or os.path.exists(vcf_file + ".csi")):
+        row_l = get_indexed_vcf_row_l(transcript, vcf_file, chrom, bp_start, bp_end, effect_l)
+    else:
+        row_l = get_streamed_vcf_row_l(transcript, vcf_file, chrom, bp_start, bp_end, effect_l)
+    if row_l == None:
+        r.report("WARNING: {0} has no CSQ or ANN annotations.".format(vcf_file))
+        row_l = []
+
+    variant_df = pd.DataFrame(row_l, columns=variant_col_l).drop_duplicates()
+    variant_df["pos"] = variant_df["pos"].astype("int64")
+    variant_df.index = range(len(variant_df.index))
+
+    return variant_df
+
+
+def get_indexed_vcf_row_l(transcript, vcf_file, chrom, bp_start, bp_end, effect_l):
+
+    '''Get the variant rows of a transcript by fetching the records in its span from an indexed VCF file with pysam.'''
+
+    variant_fh = pysam.VariantFile(vcf_file)
+    try:
+        ann_format_dict = get_ann_format_dict(str(variant_fh.header).split("\n"))
+        if len(ann_format_dict) == 0:
+            return None
+        field = "CSQ" if "CSQ" in ann_format_dict else "ANN"
+        #The chromosome may be named with or without a chr prefix.
+        chrom_l = [str(chrom), "chr" + str(chrom)] + ([str(chrom)[3:]] if str(chrom).startswith("chr") else [])
+        vcf_chrom = ([contig for contig in chrom_l if contig in variant_fh.header.contigs] + [str(chrom)])[0]
+        row_l = []
+        for record in variant_fh.fetch(vcf_chrom, bp_start - 1, bp_end):
+            if field in record.info:
+                row_l.extend(get_transcript_ann_row_l(str(chrom), record.pos, list(record.info[field]), ann_format_dict[field], transcript, effect_l))
+    finally:
+        variant_fh.close()
+
+    return row_l
+
+
+def get_streamed_vcf_row_l(transcript, vcf_file, chrom, bp_start, bp_end, effect_l):
+
+    '''Get the variant rows of a transcript by streaming a VCF file, stopping once it has passed the transcript's span. As with a
+    tabix fetch, the records whose reference allele overlaps the span are kept.'''
+
+    open_func = gzip.open if vcf_file.endswith(".gz") else open
+    chrom = None if chrom == None else str(chrom)
+    row_l, header_line_l, ann_format_dict, chrom_seen = [], [], None, False
+    with open_func(vcf_file, "rt") as vcf_fh:
+        for line in vcf_fh:
+            if line.startswith("#"):
+                header_line_l.append(line.rstrip("\n"))
+                continue
+            if ann_format_dict == None:
+                ann_format_dict = get_ann_format_dict(header_line_l)
+                if len(ann_format_dict) == 0:
+                    return None
+                field = "CSQ" if "CSQ" in ann_format_dict else "ANN"
+            value_l = line.rstrip("\n").split("\t", 8)
+            [record_chrom, pos_str, ref, info_str] = [value_l[0], value_l[1], value_l[3], value_l[7]]
+            if chrom != None:
+                if record_chrom != chrom and record_chrom != "chr" + chrom and "chr" + record_chrom != chrom:
+                    if chrom_seen:
+                        break
+                    continue
+                chrom_seen = True
+                pos = int(pos_str)
+                if pos + len(ref) - 1 < bp_start:
+                    continue
+                if pos > bp_end:
+                    break
+            #Only parse the annotations of records which mention the transcript.
+            if transcript.split(".")[0] not in info_str:
+                continue
+            row_l.extend(get_transcript_ann_row_l(chrom or record_chrom, int(pos_str), get_info_ann_l(info_str, field), ann_format_dict[field],
+                                                  transcript, effect_l))
+
+    return row_l
@@ -0,0 +1,92 @@
+import numpy as np
+import transcript as ts
+
+
+'''
+Functions for restricting the tracks to a window (region of interest) of the transcript.
+'''
+
+def get_window_tp_l(transcript_model_dict, bp_start, bp_end):
+
+    '''Get the transcript position window which corresponds to a base pair window.
+
+    Args:
+        | transcript_model_dict (dict): the exon interval model of the transcript (see transcript.get_transcript_model_dict).
+        | bp_start (int): base pair start coordinate.
+        | bp_end (int): base pair end coordinate.
+
+    Returns:
+        window_tp_l (list of ints): the first and last transcript positions in the window, or None if the window contains no exonic bases.
+    '''
+
+    lo_bp_arr, hi_bp_arr = transcript_model_dict["lo_bp_arr"], transcript_model_dict["hi_bp_arr"]
+    overlap_arr = (lo_bp_arr <= bp_end) & (hi_bp_arr >= bp_start)
+    if not overlap_arr.any():
+        return None
+    #The ends of the exonic part of the window are exonic, so each maps to a transcript position.
+    tp_arr = ts.get_tp_arr(transcript_model_dict, np.concatenate([np.maximum(lo_bp_arr[overlap_arr], bp_start), np.minimum(hi_bp_arr[overlap_arr], bp_end)]))
+    window_tp_l = [int(tp_arr.min()), int(tp_arr.max())]
+
+    return window_tp_l
+
+
+def get_window_tp_offset(tp_window_l):
+
+    '''Get the offset which converts transcript positions into positions within a transcript position window. Positions within a
+    window are numbered from 1, like the positions of a whole transcript, so a track drawn for a window is drawn exactly as it 
+    would be for a transcript made of the bases in the window.
+
+    Args:
+        tp_window_l (list of ints): the first and last transcript positions in the window.
+
+    Returns:
+        tp_offset (int): the offset, to be subtracted from transcript positions (or added to positions within the window).
+    '''
+
+    tp_offset = tp_window_l[0] - 1
+
+    return tp_offset
+
+
+def get_window_len(tp_window_l):
+
+    '''Get the number of transcript positions in a transcript position window, which the tracks use as the transcript length.
+
+    Args:
+        tp_window_l (list of ints): the first and last transcript positions in the window.
+
+    Returns:
+        window_len (int): the number of positions, including the first and last.
+    '''
+
+    window_len = tp_window_l[1] - tp_window_l[0] + 1
+
+    return window_len
+
+
+def get_window_bound_color_ll(bound_l, color_ll, tp_start, tp_end):
+
+    '''Clip the bounds of a color bar, and the corresponding color lists, to a transcript position window.
+
+    Args:
+        | bound_l (list of numbers): bounds of the color bar segments, i.e. the start of each segment followed by the end of the last.
+        | color_ll (list of lists): lists (e.g. of colors and edge colors) with 1 entry per segment.
+        | tp_start (int): transcript position start coordinate.
+        | tp_end (int): transcript position end coordinate.
+
+    Returns:
+        window_bound_color_ll (list of lists): the clipped bounds followed by the clipped version of each list in color_ll.
+    '''
+
+    window_bound_l, window_color_ll = [], [[] for color_l in color_ll]
+    for i in range(len(bound_l)-1):
+        if bound_l[i+1] <= tp_start or bound_l[i] >= tp_end:
+            continue
+        window_bound_l.append(max(bound_l[i], tp_start))
+        for j in range(len(color_ll)):
+            window_color_ll[j].append(color_ll[j][i])
+    window_bound_l.append(tp_end)
+
+    window_bound_color_ll = [window_bound_l] + window_color_ll
+
+    return window_bound_color_ll